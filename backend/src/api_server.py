@@ -0,0 +1,150 @@
+import gzip
+import hashlib
+import queue
+import threading
+import zlib
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+# Responses smaller than this are not worth compressing
+MIN_COMPRESS_SIZE = 1024
+
+
+def negotiate_encoding(accept_encoding):
+    """Pick "gzip", "deflate" or None (identity) from an Accept-Encoding header"""
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name] = quality
+
+    # Highest q wins; max() keeps the first of equals, so ties go to gzip
+    quality, encoding = max(
+        ((accepted.get(encoding, accepted.get("*", 0.0)), encoding) for encoding in ("gzip", "deflate")),
+        key=lambda choice: choice[0]
+    )
+    return encoding if quality > 0 else None
+
+
+def compress(body, encoding, level=5):
+    if encoding == "gzip":
+        return gzip.compress(body, level)
+    if encoding == "deflate":
+        return zlib.compress(body, level)
+    return body
+
+
+def make_etag(body):
+    """Strong validator for a response body"""
+    return '"%s"' % hashlib.blake2b(body, digest_size=12).hexdigest()
+
+
+def variant_etag(etag, encoding):
+    """Each content coding is a different representation, so gets its own ETag"""
+    if not encoding:
+        return etag
+    return etag[:-1] + "-" + encoding + '"'
+
+
+class PooledHTTPServer(HTTPServer):
+    """HTTPServer that hands connections to a fixed pool of worker threads.
+
+    Accepted connections wait in a bounded queue; when it is full the
+    connection is closed rather than spawning more threads. Workers are
+    daemon threads so a blocked client never delays process exit.
+    """
+
+    def __init__(self, server_address, handler_class, workers=32, backlog=256):
+        self.workers = workers
+        self._connections = queue.Queue(backlog)
+        self.stats = {"accepted": 0, "rejected": 0}
+        super().__init__(server_address, handler_class)
+        for i in range(workers):
+            thread = threading.Thread(target=self._worker, name=f"http-{i}")
+            thread.daemon = True
+            thread.start()
+
+    def process_request(self, request, client_address):
+        try:
+            self._connections.put_nowait((request, client_address))
+            self.stats["accepted"] += 1
+        except queue.Full:
+            self.stats["rejected"] += 1
+            self.shutdown_request(request)
+
+    def _worker(self):
+        while True:
+            request, client_address = self._connections.get()
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    def get_stats(self):
+        return dict(self.stats, workers=self.workers, queued=self._connections.qsize())
+
+
+class JsonRequestHandler(BaseHTTPRequestHandler):
+    """Keep-alive request handler with content negotiation and conditional GETs"""
+
+    protocol_version = "HTTP/1.1"
+    # Idle keep-alive connections are closed after this many seconds
+    timeout = 15
+
+    def send_body(self, body, content_type="application/json", etag=None, encoded=None):
+        """Send a 200 (or 304) response for body.
+
+        encoded maps content codings to pre-compressed bodies (e.g. from a
+        published snapshot); other codings are compressed on the fly.
+        """
+        encoding = negotiate_encoding(self.headers.get("Accept-Encoding"))
+        if len(body) < MIN_COMPRESS_SIZE:
+            encoding = None
+        if etag is None:
+            etag = make_etag(body)
+        etag = variant_etag(etag, encoding)
+
+        if self.matches_etag(etag):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Vary", "Accept-Encoding")
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        if encoding:
+            body = (encoded or {}).get(encoding) or compress(body, encoding)
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.send_header("Vary", "Accept-Encoding")
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def matches_etag(self, etag):
+        header = self.headers.get("If-None-Match")
+        if not header:
+            return False
+        candidates = [candidate.strip() for candidate in header.split(",")]
+        return "*" in candidates or etag in candidates
+
+    def send_empty(self, status):
+        self.send_response(status)
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
@@ -0,0 +1,112 @@
+import threading
+from collections import deque
+
+
+class CapturePipeline:
+    """Bounded ring between the capture thread and a batch worker.
+
+    The capture side only appends frames to the ring. A worker thread drains
+    it in batches of up to batch_size frames, or whatever arrived within
+    batch_interval seconds, and hands each batch to process_batch. When the
+    ring is full new frames are dropped and counted instead of blocking
+    capture.
+    """
+
+    def __init__(self, process_batch, max_queue=65536, batch_size=512, batch_interval=0.05):
+        self.process_batch = process_batch
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self._ring = deque()
+        self._batch_ready = threading.Event()
+        self._stopping = threading.Event()
+        self._worker = None
+        self.stats = {
+            "enqueued": 0,
+            "dropped": 0,
+            "processed": 0,
+            "batches": 0,
+            "last_batch_size": 0,
+            "max_batch_size": 0,
+            "max_queue_depth": 0
+        }
+
+    def start(self):
+        self._stopping.clear()
+        self._worker = threading.Thread(target=self._run, name="capture-pipeline")
+        self._worker.daemon = True
+        self._worker.start()
+        return self
+
+    def stop(self, timeout=5):
+        """Process everything still queued, then stop the worker"""
+        self._stopping.set()
+        self._batch_ready.set()
+        if self._worker is not None:
+            self._worker.join(timeout)
+            self._worker = None
+
+    def submit(self, frame):
+        """Enqueue one frame from the capture thread; returns False if dropped"""
+        ring = self._ring
+        depth = len(ring)
+        if depth >= self.max_queue:
+            self.stats["dropped"] += 1
+            return False
+
+        ring.append(frame)
+        self.stats["enqueued"] += 1
+        if depth >= self.batch_size:
+            self._batch_ready.set()
+            if depth > self.stats["max_queue_depth"]:
+                self.stats["max_queue_depth"] = depth
+        return True
+
+    def submit_many(self, frames):
+        """Enqueue a batch of frames (e.g. one ring block); returns how many were accepted"""
+        room = self.max_queue - len(self._ring)
+        accepted = frames[:max(room, 0)]
+        self._ring.extend(accepted)
+        self.stats["enqueued"] += len(accepted)
+        self.stats["dropped"] += len(frames) - len(accepted)
+        depth = len(self._ring)
+        if depth > self.stats["max_queue_depth"]:
+            self.stats["max_queue_depth"] = depth
+        if depth >= self.batch_size:
+            self._batch_ready.set()
+        return len(accepted)
+
+    def _drain(self):
+        ring = self._ring
+        popleft = ring.popleft
+        count = min(len(ring), self.batch_size)
+        return [popleft() for _ in range(count)]
+
+    def _run(self):
+        while True:
+            self._batch_ready.wait(self.batch_interval)
+            self._batch_ready.clear()
+
+            while self._ring:
+                batch = self._drain()
+                try:
+                    self.process_batch(batch)
+                except Exception as e:
+                    print(f"Pipeline batch error: {str(e)}")
+
+                size = len(batch)
+                self.stats["processed"] += size
+                self.stats["batches"] += 1
+                self.stats["last_batch_size"] = size
+                if size > self.stats["max_batch_size"]:
+                    self.stats["max_batch_size"] = size
+                if size < self.batch_size:
+                    break
+
+            if self._stopping.is_set() and not self._ring:
+                return
+
+    def get_stats(self):
+        stats = dict(self.stats, queue_depth=len(self._ring), max_queue=self.max_queue)
+        stats["avg_batch_size"] = round(stats["processed"] / stats["batches"], 1) if stats["batches"] else 0.0
+        return stats
@@ -0,0 +1,122 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class DNSCache:
+    """Size-capped LRU cache of IP -> domain with separate TTLs.
+
+    Successful lookups live for positive_ttl seconds, failed lookups
+    (stored as "") for negative_ttl seconds. When the cache is full the
+    least recently used entry is evicted.
+    """
+
+    def __init__(self, max_size=10000, positive_ttl=3600, negative_ttl=300):
+        self.max_size = max_size
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self._entries = OrderedDict()  # ip -> (domain, expires_at)
+        self._lock = threading.Lock()
+        self.stats = {
+            "hits": 0,
+            "negative_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0
+        }
+
+    def get(self, ip):
+        """Return the cached domain ("" for a cached failure) or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(ip)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+
+            domain, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[ip]
+                self.stats["expirations"] += 1
+                self.stats["misses"] += 1
+                return None
+
+            self._entries.move_to_end(ip)
+            if domain:
+                self.stats["hits"] += 1
+            else:
+                self.stats["negative_hits"] += 1
+            return domain
+
+    def put(self, ip, domain, ttl=None):
+        """Store a lookup result; an empty domain is cached as a negative entry"""
+        if ttl is None:
+            ttl = self.positive_ttl if domain else self.negative_ttl
+        with self._lock:
+            self._entries[ip] = (domain, time.monotonic() + ttl)
+            self._entries.move_to_end(ip)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_stats(self):
+        """Return counters, current size and hit rate"""
+        with self._lock:
+            stats = dict(self.stats, size=len(self._entries), max_size=self.max_size)
+        lookups = stats["hits"] + stats["negative_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["hits"] + stats["negative_hits"]) / lookups, 4) if lookups else 0.0
+        return stats
+
+    def save(self, path):
+        """Persist unexpired entries to a JSON file"""
+        now_mono = time.monotonic()
+        now_wall = time.time()
+        with self._lock:
+            entries = [
+                [ip, domain, now_wall + (expires_at - now_mono)]
+                for ip, (domain, expires_at) in self._entries.items()
+                if expires_at > now_mono
+            ]
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(entries, f)
+        os.replace(tmp_path, path)
+        return len(entries)
+
+    def load(self, path, merge=False):
+        """Load entries saved by save(), skipping ones that have expired.
+
+        With merge, cached entries win and loaded ones only fill free space,
+        as the least recently used.
+        """
+        if not os.path.exists(path):
+            return 0
+        try:
+            with open(path, 'r') as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Failed to load DNS cache from {path}: {str(e)}")
+            return 0
+
+        now_wall = time.time()
+        loaded = 0
+        for ip, domain, expires_wall in entries:
+            ttl = expires_wall - now_wall
+            if ttl <= 0:
+                continue
+            if not merge:
+                self.put(ip, domain, ttl)
+                loaded += 1
+                continue
+            with self._lock:
+                if ip in self._entries or len(self._entries) >= self.max_size:
+                    continue
+                self._entries[ip] = (domain, time.monotonic() + ttl)
+                self._entries.move_to_end(ip, last=False)
+            loaded += 1
+        return loaded
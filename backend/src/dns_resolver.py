@@ -0,0 +1,96 @@
+import socket
+import threading
+import queue
+
+from dns_cache import DNSCache
+
+
+class DNSResolver:
+    """Bounded pool of background threads doing reverse DNS lookups.
+
+    Lookups never run on the caller's thread. Requests for an IP that is
+    already being resolved are coalesced, so only one query per IP is in
+    flight and every waiting callback gets the same answer.
+    """
+
+    def __init__(self, workers=4, max_pending=1024, cache=None):
+        self.cache = cache if cache is not None else DNSCache()
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._workers = workers
+        self._started = False
+        self.stats = {
+            "lookups": 0,
+            "coalesced": 0,
+            "dropped": 0,
+            "failures": 0
+        }
+
+    def start(self):
+        """Start the worker threads (idempotent)"""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+
+        for i in range(self._workers):
+            thread = threading.Thread(target=self._worker, name=f"dns-resolver-{i}")
+            thread.daemon = True
+            thread.start()
+
+    def resolve(self, ip, callback):
+        """Queue a reverse lookup for ip and call callback(ip, domain) when done.
+
+        Returns immediately. The callback runs on a resolver thread and
+        receives "" when the lookup fails. If the pool is saturated the
+        request is dropped and the callback gets None at once, on the
+        caller's thread, so the caller can try again later.
+        """
+        if not self._started:
+            self.start()
+
+        with self._lock:
+            if ip in self._pending:
+                self._pending[ip].append(callback)
+                self.stats["coalesced"] += 1
+                return
+            self._pending[ip] = [callback]
+
+        try:
+            self._queue.put_nowait(ip)
+        except queue.Full:
+            with self._lock:
+                callbacks = self._pending.pop(ip, [])
+            self.stats["dropped"] += 1
+            for callback in callbacks:
+                callback(ip, None)
+
+    def _lookup(self, ip):
+        try:
+            return socket.gethostbyaddr(ip)[0]
+        except (socket.herror, socket.gaierror, OSError):
+            self.stats["failures"] += 1
+            return ""
+
+    def _worker(self):
+        while True:
+            ip = self._queue.get()
+            self.stats["lookups"] += 1
+            domain = self._lookup(ip)
+            self.cache.put(ip, domain)
+
+            with self._lock:
+                callbacks = self._pending.pop(ip, [])
+
+            for callback in callbacks:
+                try:
+                    callback(ip, domain)
+                except Exception as e:
+                    print(f"DNS callback error for {ip}: {str(e)}")
+
+    def get_stats(self):
+        """Return resolver counters plus current queue depth"""
+        with self._lock:
+            in_flight = len(self._pending)
+        return dict(self.stats, queued=self._queue.qsize(), in_flight=in_flight)
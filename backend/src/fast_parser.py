@@ -0,0 +1,210 @@
+import socket
+import struct
+import time
+
+# Link-layer header types (pcap DLT/LINKTYPE values, as used by scapy's conf.l2types)
+LINKTYPE_NULL = 0
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW_BSD = 12
+LINKTYPE_RAW = 101
+LINKTYPE_LOOP = 108
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_IPV4 = 228
+LINKTYPE_IPV6 = 229
+LINKTYPE_LINUX_SLL2 = 276
+
+ETHERTYPE_IPV4 = 0x0800
+ETHERTYPE_IPV6 = 0x86DD
+ETHERTYPE_VLAN = (0x8100, 0x88A8, 0x9100)
+
+IPPROTO_ICMP = 1
+IPPROTO_TCP = 6
+IPPROTO_UDP = 17
+IPPROTO_ICMPV6 = 58
+
+# Default kernel-side capture filter (tcpdump syntax): only what parse_frame
+# and the flow tracker understand, including 802.1Q-tagged frames
+DEFAULT_BPF_FILTER = (
+    "tcp or udp or icmp or icmp6 or "
+    "(vlan and (tcp or udp or icmp or icmp6))"
+)
+
+# IPv6 extension headers we can skip over to reach the transport header
+IPV6_EXTENSION_HEADERS = (0, 43, 60)
+IPV6_FRAGMENT_HEADER = 44
+
+_unpack_ports = struct.Struct("!HH").unpack_from
+_unpack_u16 = struct.Struct("!H").unpack_from
+_inet_ntoa = socket.inet_ntoa
+_inet_ntop = socket.inet_ntop
+_AF_INET6 = socket.AF_INET6
+
+
+def _network_offset(data, linktype):
+    """Return (ethertype, offset of the network header) or (None, None)"""
+    if linktype == LINKTYPE_ETHERNET:
+        if len(data) < 14:
+            return None, None
+        ethertype = _unpack_u16(data, 12)[0]
+        offset = 14
+        while ethertype in ETHERTYPE_VLAN:
+            if len(data) < offset + 4:
+                return None, None
+            ethertype = _unpack_u16(data, offset + 2)[0]
+            offset += 4
+        return ethertype, offset
+
+    if linktype == LINKTYPE_LINUX_SLL:
+        if len(data) < 16:
+            return None, None
+        return _unpack_u16(data, 14)[0], 16
+
+    if linktype == LINKTYPE_LINUX_SLL2:
+        if len(data) < 20:
+            return None, None
+        return _unpack_u16(data, 0)[0], 20
+
+    if linktype in (LINKTYPE_RAW, LINKTYPE_RAW_BSD, LINKTYPE_IPV4, LINKTYPE_IPV6):
+        if not data:
+            return None, None
+        version = data[0] >> 4
+        if version == 4:
+            return ETHERTYPE_IPV4, 0
+        if version == 6:
+            return ETHERTYPE_IPV6, 0
+        return None, None
+
+    if linktype in (LINKTYPE_NULL, LINKTYPE_LOOP):
+        # 4-byte address family header in host (NULL) or network (LOOP) order
+        if len(data) < 5:
+            return None, None
+        version = data[4] >> 4
+        if version == 4:
+            return ETHERTYPE_IPV4, 4
+        if version == 6:
+            return ETHERTYPE_IPV6, 4
+        return None, None
+
+    return None, None
+
+
+def parse_frame(data, linktype=LINKTYPE_ETHERNET):
+    """Parse the headers of a raw frame without Scapy.
+
+    Returns (ip_proto, src_ip, dst_ip, src_port, dst_port, length,
+    payload_offset, tcp_flags) for TCP, UDP, ICMP and ICMPv6 over IPv4/IPv6,
+    or None for anything else (non-IP frames, truncated headers, non-first
+    fragments, unknown link types) so the caller can fall back to Scapy.
+    Ports are 0 for ICMP, tcp_flags is 0 for non-TCP, and payload_offset is
+    the offset of the transport payload within data.
+    """
+    ethertype, offset = _network_offset(data, linktype)
+    if ethertype is None:
+        return None
+
+    if ethertype == ETHERTYPE_IPV4:
+        if len(data) < offset + 20:
+            return None
+        ihl = (data[offset] & 0x0F) * 4
+        if ihl < 20:
+            return None
+        # Skip non-first fragments: they carry no transport header
+        if _unpack_u16(data, offset + 6)[0] & 0x1FFF:
+            return None
+        ip_proto = data[offset + 9]
+        src_ip = _inet_ntoa(data[offset + 12:offset + 16])
+        dst_ip = _inet_ntoa(data[offset + 16:offset + 20])
+        offset += ihl
+
+    elif ethertype == ETHERTYPE_IPV6:
+        if len(data) < offset + 40:
+            return None
+        ip_proto = data[offset + 6]
+        src_ip = _inet_ntop(_AF_INET6, data[offset + 8:offset + 24])
+        dst_ip = _inet_ntop(_AF_INET6, data[offset + 24:offset + 40])
+        offset += 40
+        while ip_proto in IPV6_EXTENSION_HEADERS or ip_proto == IPV6_FRAGMENT_HEADER:
+            if len(data) < offset + 8:
+                return None
+            if ip_proto == IPV6_FRAGMENT_HEADER:
+                if _unpack_u16(data, offset + 2)[0] & 0xFFF8:
+                    return None
+                next_offset = offset + 8
+            else:
+                next_offset = offset + (data[offset + 1] + 1) * 8
+            ip_proto = data[offset]
+            offset = next_offset
+
+    else:
+        return None
+
+    if ip_proto == IPPROTO_TCP:
+        if len(data) < offset + 20:
+            return None
+        src_port, dst_port = _unpack_ports(data, offset)
+        payload_offset = offset + (data[offset + 12] >> 4) * 4
+        tcp_flags = data[offset + 13]
+    elif ip_proto == IPPROTO_UDP:
+        if len(data) < offset + 8:
+            return None
+        src_port, dst_port = _unpack_ports(data, offset)
+        payload_offset = offset + 8
+        tcp_flags = 0
+    elif ip_proto == IPPROTO_ICMP or ip_proto == IPPROTO_ICMPV6:
+        src_port = dst_port = 0
+        payload_offset = offset
+        tcp_flags = 0
+    else:
+        return None
+
+    return ip_proto, src_ip, dst_ip, src_port, dst_port, len(data), payload_offset, tcp_flags
+
+
+def dissect(data, linktype=LINKTYPE_ETHERNET, timestamp=None):
+    """Build a Scapy packet from a raw frame (the slow fallback path)"""
+    import scapy.all as scapy
+
+    cls = scapy.conf.l2types.num2layer.get(linktype, scapy.conf.raw_layer)
+    packet = cls(bytes(data))
+    if timestamp is not None:
+        packet.time = timestamp
+    return packet
+
+
+def sniff_raw(callback, iface=None, count=0, timeout=None, promisc=True, bpf_filter=None):
+    """Capture frames without dissecting them.
+
+    Opens Scapy's native listen socket and calls callback(data, timestamp,
+    linktype) with the raw frame bytes. Stops after count frames (0 for no
+    limit) or timeout seconds. bpf_filter is compiled and attached to the
+    socket in the kernel, so rejected frames never reach Python.
+    """
+    import scapy.all as scapy
+
+    sock = scapy.conf.L2listen(iface=iface, promisc=promisc, filter=bpf_filter or None)
+    captured = 0
+    deadline = time.time() + timeout if timeout else None
+    try:
+        while not count or captured < count:
+            wait = 1.0
+            if deadline is not None:
+                wait = deadline - time.time()
+                if wait <= 0:
+                    break
+                wait = min(wait, 1.0)
+
+            # Use the socket's own select so this also works with pcap sockets
+            ready = sock.select([sock], wait)
+            if not ready:
+                continue
+
+            cls, data, timestamp = sock.recv_raw(65535)
+            if data is None:
+                continue
+            linktype = scapy.conf.l2types.layer2num.get(cls, LINKTYPE_ETHERNET)
+            callback(data, timestamp if timestamp is not None else time.time(), linktype)
+            captured += 1
+    finally:
+        sock.close()
+
+    return captured
@@ -0,0 +1,90 @@
+import itertools
+from collections import OrderedDict
+
+# Approximate memory held by one flow once apply_record has added it: key
+# tuple, IP strings, slotted record, its table slot, expiry heap entry and
+# FlowIndex set memberships. flow_memory_benchmark.py measured 1,180 bytes
+# per flow at 1,000,000 flows (more when few flows share each address).
+FLOW_RECORD_BYTES = 1200
+
+# Destination address of the aggregate flow that absorbs a flooding source
+OVERFLOW_ADDR = "overflow"
+
+
+class FlowAdmission:
+    """Admission control and eviction policy for a bounded flow table.
+
+    New flows are rate limited per source IP with a token bucket (rate new
+    flows per second, bursts of up to burst); a source over its rate has
+    its extra flows folded into one aggregate overflow flow. When the table
+    holds max_flows entries, the smallest of the least recently seen
+    sample_size flows is evicted to make room.
+
+    The table must be an OrderedDict kept in last-seen order (move_to_end on
+    every update). Not thread safe: the caller holds the table's lock.
+    """
+
+    def __init__(self, max_flows=200000, rate=100, burst=500, sample_size=8, max_sources=65536):
+        self.max_flows = max_flows
+        self.rate = rate
+        self.burst = burst
+        self.sample_size = sample_size
+        self.max_sources = max_sources
+        self._buckets = OrderedDict()  # source ip -> (tokens, last_refill)
+        self.stats = {
+            "admitted": 0,
+            "overflowed": 0,
+            "evicted": 0
+        }
+
+    @classmethod
+    def from_budget(cls, max_flows, memory_mb=None, **kwargs):
+        """Build a policy from a flow count and/or a memory budget in MiB"""
+        if memory_mb:
+            max_flows = min(max_flows, int(memory_mb * 2**20 // FLOW_RECORD_BYTES))
+        return cls(max(max_flows, 1), **kwargs)
+
+    def admit(self, source_ip, now):
+        """Charge a new flow to source_ip; False means fold it into the overflow flow"""
+        if not self.rate:
+            self.stats["admitted"] += 1
+            return True
+
+        buckets = self._buckets
+        bucket = buckets.pop(source_ip, None)
+        if bucket is None:
+            tokens = self.burst
+            if len(buckets) >= self.max_sources:
+                buckets.popitem(last=False)
+        else:
+            tokens, last_refill = bucket
+            tokens = min(self.burst, tokens + (now - last_refill) * self.rate)
+
+        admitted = tokens >= 1
+        buckets[source_ip] = (tokens - 1 if admitted else tokens, now)
+        if admitted:
+            self.stats["admitted"] += 1
+        else:
+            self.stats["overflowed"] += 1
+        return admitted
+
+    def is_full(self, table):
+        return len(table) >= self.max_flows
+
+    def pick_victim(self, table):
+        """Key of the flow to evict: the smallest among the least recently seen"""
+        sample = itertools.islice(table.items(), self.sample_size)
+        victim = min(sample, key=lambda item: item[1].packets_sent + item[1].packets_received, default=None)
+        if victim is None:
+            return None
+        self.stats["evicted"] += 1
+        return victim[0]
+
+    def get_stats(self):
+        return dict(
+            self.stats,
+            max_flows=self.max_flows,
+            source_rate=self.rate,
+            source_burst=self.burst,
+            tracked_sources=len(self._buckets)
+        )
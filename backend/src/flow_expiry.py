@@ -0,0 +1,90 @@
+import heapq
+import itertools
+
+from tcp_state import is_closed, is_half_open
+
+
+class FlowExpiry:
+    """Idle-flow expiry scheduler backed by a lazy-deletion min-heap.
+
+    Each flow has one heap entry keyed on the deadline computed when it was
+    scheduled. Packets never touch the heap: when an entry comes due, the
+    flow's current last_seen is checked, and a flow that saw traffic in the
+    meantime is simply pushed back with its new deadline. Expiry work is
+    done in bounded slices so the flow table lock is never held for long.
+
+    TCP flows get shorter timeouts once closed (linger) or while half-open
+    (SYN without a completed handshake).
+    """
+
+    DEFAULT_TIMEOUTS = {"TCP": 900, "UDP": 120, "ICMP": 30, "TCP_CLOSED": 10, "TCP_HALF_OPEN": 20}
+
+    def __init__(self, timeouts=None):
+        self.timeouts = dict(self.DEFAULT_TIMEOUTS, **(timeouts or {}))
+        self._heap = []
+        self._sequence = itertools.count()
+        self.stats = {
+            "expired": 0,
+            "expired_by_protocol": {"TCP": 0, "UDP": 0, "ICMP": 0},
+            "expired_closed": 0,
+            "expired_half_open": 0,
+            "rescheduled": 0,
+            "slices": 0
+        }
+
+    def timeout_for(self, conn):
+        """Idle timeout in seconds for a connection"""
+        protocol = conn.protocol
+        if protocol == "TCP":
+            if is_closed(conn.tcp_state):
+                return self.timeouts["TCP_CLOSED"]
+            if is_half_open(conn.tcp_state):
+                return self.timeouts["TCP_HALF_OPEN"]
+        return self.timeouts.get(protocol, self.timeouts["TCP"])
+
+    def schedule(self, conn_id, conn):
+        """Track a connection; call again when its timeout gets shorter (e.g. on close)"""
+        deadline = conn.last_seen + self.timeout_for(conn)
+        heapq.heappush(self._heap, (deadline, next(self._sequence), conn_id, conn))
+
+    def expire(self, table, now, budget=1000):
+        """Pop up to budget due entries and return the expired (conn_id, conn) pairs.
+
+        The caller must hold the table's lock and remove the returned flows.
+        Entries for flows that already left the table are dropped silently.
+        """
+        heap = self._heap
+        expired = []
+        examined = 0
+        while heap and heap[0][0] <= now and examined < budget:
+            examined += 1
+            _, _, conn_id, conn = heapq.heappop(heap)
+            if table.get(conn_id) is not conn:
+                continue  # Removed or replaced since it was scheduled
+
+            deadline = conn.last_seen + self.timeout_for(conn)
+            if deadline <= now:
+                expired.append((conn_id, conn))
+                self.stats["expired"] += 1
+                by_protocol = self.stats["expired_by_protocol"]
+                by_protocol[conn.protocol] = by_protocol.get(conn.protocol, 0) + 1
+                if conn.protocol == "TCP":
+                    if is_closed(conn.tcp_state):
+                        self.stats["expired_closed"] += 1
+                    elif is_half_open(conn.tcp_state):
+                        self.stats["expired_half_open"] += 1
+            else:
+                heapq.heappush(heap, (deadline, next(self._sequence), conn_id, conn))
+                self.stats["rescheduled"] += 1
+
+        self.stats["slices"] += 1
+        return expired
+
+    def has_due(self, now):
+        return bool(self._heap) and self._heap[0][0] <= now
+
+    def __len__(self):
+        return len(self._heap)
+
+    def get_stats(self):
+        return dict(self.stats, scheduled=len(self._heap), timeouts=self.timeouts)
@@ -0,0 +1,192 @@
+import heapq
+import ipaddress
+import socket
+
+SORT_KEYS = {
+    "lastSeen": lambda conn: conn.last_seen,
+    "firstSeen": lambda conn: conn.first_seen,
+    "bytes": lambda conn: conn.bytes_sent + conn.bytes_received,
+    "packets": lambda conn: conn.packets_sent + conn.packets_received
+}
+
+
+class FlowIndex:
+    """Secondary indexes over the connections table.
+
+    Maps protocol, service and IP address (either end of the flow) to the
+    set of Connection objects having that value, so a filtered query only
+    touches matching flows. Maintained by the table's owner on insert and
+    removal; callers hold the table's lock.
+    """
+
+    def __init__(self):
+        self.by_protocol = {}
+        self.by_service = {}
+        self.by_ip = {}
+
+    def add(self, conn):
+        self.by_protocol.setdefault(conn.protocol, set()).add(conn)
+        self.by_service.setdefault(conn.service, set()).add(conn)
+        self.by_ip.setdefault(conn.src_ip, set()).add(conn)
+        self.by_ip.setdefault(conn.dst_ip, set()).add(conn)
+
+    def remove(self, conn):
+        self._discard(self.by_protocol, conn.protocol, conn)
+        self._discard(self.by_service, conn.service, conn)
+        self._discard(self.by_ip, conn.src_ip, conn)
+        self._discard(self.by_ip, conn.dst_ip, conn)
+
+    @staticmethod
+    def _discard(index, key, conn):
+        members = index.get(key)
+        if members is not None:
+            members.discard(conn)
+            if not members:
+                del index[key]
+
+    def candidates(self, query):
+        """Connections that may match query, or None if no indexed filter applies.
+
+        Each indexed filter narrows to a set; sets are intersected smallest
+        first so the cost tracks the most selective filter.
+        """
+        sets = []
+        if query.protocol:
+            sets.append(self.by_protocol.get(query.protocol, ()))
+        if query.service:
+            sets.append(self.by_service.get(query.service, ()))
+        if query.network is not None:
+            if query.network.num_addresses == 1:
+                sets.append(self.by_ip.get(str(query.network.network_address), ()))
+            else:
+                # Distinct addresses are far fewer than flows: scan the keys
+                merged = set()
+                for ip, members in self.by_ip.items():
+                    if query.contains(ip):
+                        merged.update(members)
+                sets.append(merged)
+        if not sets:
+            return None
+
+        sets.sort(key=len)
+        smallest, rest = sets[0], sets[1:]
+        return [conn for conn in smallest if all(conn in members for members in rest)]
+
+    def get_stats(self):
+        return {
+            "protocols": len(self.by_protocol),
+            "services": len(self.by_service),
+            "addresses": len(self.by_ip)
+        }
+
+
+class FlowQuery:
+    """Filter, sort and page parameters for /connections.
+
+    Built from parsed query string values; raises ValueError on bad input.
+    """
+
+    PARAMS = ("protocol", "service", "ip", "port", "min_bytes", "active", "sort", "order", "limit", "offset")
+
+    def __init__(self, params):
+        def first(name, default=None):
+            values = params.get(name)
+            return values[0] if values else default
+
+        self.protocol = (first("protocol") or "").upper() or None
+        self.service = first("service") or None
+        ip = first("ip")
+        self.network = ipaddress.ip_network(ip, strict=False) if ip else None
+        if self.network is not None:
+            # contains() compares integers: ipaddress objects are too slow per flow
+            self._family = socket.AF_INET if self.network.version == 4 else socket.AF_INET6
+            self._first = int(self.network.network_address)
+            self._last = int(self.network.broadcast_address)
+        port = first("port")
+        self.port = int(port) if port else None
+        self.min_bytes = int(first("min_bytes", 0))
+        self.active_only = first("active", "").lower() in ("1", "true", "yes")
+        self.sort = first("sort", "lastSeen")
+        if self.sort not in SORT_KEYS:
+            raise ValueError(f"unknown sort key {self.sort}")
+        self.descending = first("order", "desc").lower() != "asc"
+        limit = first("limit")
+        self.limit = int(limit) if limit else None
+        self.offset = int(first("offset", 0))
+        if self.offset < 0 or (self.limit is not None and self.limit < 0):
+            raise ValueError("limit and offset must not be negative")
+
+    @classmethod
+    def requested(cls, params):
+        """True if any query parameter is present"""
+        return any(name in params for name in cls.PARAMS)
+
+    def contains(self, ip):
+        family = socket.AF_INET6 if ":" in ip else socket.AF_INET
+        if family != self._family:
+            return False
+        try:
+            value = int.from_bytes(socket.inet_pton(family, ip), "big")
+        except OSError:
+            return False
+        return self._first <= value <= self._last
+
+    def matches(self, conn):
+        """Check every filter (for a full scan)"""
+        if self.protocol and conn.protocol != self.protocol:
+            return False
+        if self.service and conn.service != self.service:
+            return False
+        if self.network is not None and not (self.contains(conn.src_ip) or self.contains(conn.dst_ip)):
+            return False
+        return self.matches_unindexed(conn)
+
+    def matches_unindexed(self, conn):
+        """Check the filters FlowIndex.candidates() doesn't apply"""
+        if self.port is not None and self.port != conn.src_port and self.port != conn.dst_port:
+            return False
+        if self.min_bytes and conn.bytes_sent + conn.bytes_received < self.min_bytes:
+            return False
+        if self.active_only and not conn.active:
+            return False
+        return True
+
+    def page(self, conns):
+        """Sort and slice matching connections; returns (total, page)"""
+        total = len(conns)
+        key = SORT_KEYS[self.sort]
+        if self.limit is not None:
+            # Only the requested window has to be ordered
+            wanted = self.offset + self.limit
+            select = heapq.nlargest if self.descending else heapq.nsmallest
+            ordered = select(wanted, conns, key=key)
+        else:
+            ordered = sorted(conns, key=key, reverse=self.descending)
+        end = None if self.limit is None else self.offset + self.limit
+        return total, ordered[self.offset:end]
+
+
+class ConnectionView:
+    """Connection-like wrapper around a to_dict() result, for querying merged shard data"""
+
+    __slots__ = ("data",)
+
+    def __init__(self, data):
+        self.data = data
+
+    protocol = property(lambda self: self.data["protocol"])
+    service = property(lambda self: self.data["service"])
+    src_ip = property(lambda self: self.data["srcAddr"])
+    dst_ip = property(lambda self: self.data["dstAddr"])
+    src_port = property(lambda self: self.data["srcPort"])
+    dst_port = property(lambda self: self.data["dstPort"])
+    bytes_sent = property(lambda self: self.data["bytes"])
+    packets_sent = property(lambda self: self.data["packets"])
+    bytes_received = packets_received = 0
+    active = property(lambda self: self.data["active"])
+    # Fixed-format ISO strings order the same way as the timestamps
+    first_seen = property(lambda self: self.data["firstSeen"])
+    last_seen = property(lambda self: self.data["lastSeen"])
+
+    def to_dict(self):
+        return self.data
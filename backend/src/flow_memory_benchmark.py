@@ -0,0 +1,74 @@
+import argparse
+import gc
+import time
+import tracemalloc
+
+import real_traffic_capture as rtc
+from flow_admission import FLOW_RECORD_BYTES, FlowAdmission
+from tcp_state import TCP_SYN
+
+
+UNCOUNTED = ("timeseries.py", "top_talkers.py")
+
+
+def build_flows(count):
+    """Fill the live flow table through apply_record, as packet_handler does"""
+    now = time.time()
+    for i in range(count):
+        src_ip = f"10.{(i >> 16) & 0xFF}.{(i >> 8) & 0xFF}.{i & 0xFF}"
+        dst_ip = f"93.184.{(i >> 8) & 0xFF}.{i & 0xFF}"
+        src_port = 1024 + i % 60000
+        protocol = "TCP" if i % 3 else "UDP"
+        conn_id = (src_ip, dst_ip, src_port, 443, protocol)
+        with rtc.connection_lock:
+            rtc.apply_record((conn_id, True, 1500, now, None, TCP_SYN if protocol == "TCP" else 0))
+    return rtc.connections
+
+
+def run_benchmark(count):
+    # No per-flow debug output, no admission limit, and no reverse lookups
+    # (the DNS cache has its own bound); all restored afterwards
+    saved = rtc.DEBUG, rtc.flow_admission, rtc.Connection.resolve_domain
+    rtc.DEBUG = False
+    rtc.flow_admission = FlowAdmission(max_flows=count + 1, rate=0)
+    rtc.Connection.resolve_domain = lambda conn: None
+    try:
+        measure(count)
+    finally:
+        with rtc.connection_lock:
+            for conn_id in list(rtc.connections):
+                rtc.remove_connection(conn_id)
+        rtc.DEBUG, rtc.flow_admission, rtc.Connection.resolve_domain = saved
+
+
+def measure(count):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    table = build_flows(count)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    # Time series and top-talker sketches are bounded and not per flow
+    snapshot = tracemalloc.take_snapshot().filter_traces(
+        [tracemalloc.Filter(False, f"*{name}") for name in UNCOUNTED]
+    )
+    current = sum(stat.size for stat in snapshot.statistics("filename"))
+    tracemalloc.stop()
+    per_flow = current / max(len(table), 1)
+
+    print(f"Flows:          {len(table):,}")
+    print(f"Build time:     {elapsed:.2f} s")
+    print(f"Memory (total): {current / 2**20:.1f} MiB (peak {peak / 2**20:.1f} MiB)")
+    print(f"Memory / flow:  {per_flow:.0f} bytes (key tuple, IP strings, record, table slot, "
+          f"expiry entry and index sets)")
+    print(f"FLOW_RECORD_BYTES = {FLOW_RECORD_BYTES} ({FLOW_RECORD_BYTES / per_flow:.0%} of measured)")
+
+    start = time.perf_counter()
+    gc.collect()
+    print(f"Full GC pass:   {(time.perf_counter() - start) * 1000:.0f} ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure flow table memory usage")
+    parser.add_argument("--flows", type=int, default=1_000_000, help="Number of flows to create (default: 1000000)")
+    args = parser.parse_args()
+    run_benchmark(args.flows)
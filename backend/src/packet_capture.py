@@ -8,15 +8,19 @@ import argparse
 # Import system_check using absolute path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from system_check import run_all_checks
+from fast_parser import DEFAULT_BPF_FILTER, IPPROTO_TCP, IPPROTO_UDP, dissect, parse_frame, sniff_raw
 
 # Add project root to Python path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+from storage.capture_writer import parse_time
+from storage.catalog import SORT_COLUMNS
+from storage.record_analysis import summarize
 from storage.utils import StorageManager
 
 class PacketCapture:
     def __init__(self):
         self.storage = StorageManager()
-        self.captured_packets = []
+        self.capture_path = None
         self.validate_system()
 
     def validate_system(self):
@@ -38,27 +42,58 @@ class PacketCapture:
                 "Please check the setup guide for requirements."
             )
 
-    def capture_packets(self, interface=None, count=10):
-        """Capture network packets"""
+    def capture_packets(self, interface=None, count=10, bpf_filter=DEFAULT_BPF_FILTER, save=True, name=None):
+        """Capture network packets matching a kernel-side BPF filter.
+
+        Packets are printed as they arrive and, with save, streamed to
+        storage instead of being kept in memory. Returns the number of
+        packets captured.
+        """
         try:
             self.validate_system()  # Re-check before capture
             
-            packets = []
-            def packet_callback(packet):
-                packet_info = self.analyze_packet(packet)
-                packets.append(packet_info)
+            writer = self.storage.open_capture_writer(name) if save else None
+            captured = 0
+            def frame_callback(data, timestamp, linktype):
+                nonlocal captured
+                packet_info = self.analyze_frame(data, timestamp, linktype)
+                captured += 1
+                if writer is not None:
+                    writer.write(packet_info)
                 # Print each packet as JSON for real-time processing
                 print(json.dumps(packet_info, default=str))
                 sys.stdout.flush()  # Ensure output is sent immediately
                 
-            scapy.sniff(prn=packet_callback, iface=interface, count=count, store=False)
-            self.captured_packets = packets
-            return packets
+            try:
+                sniff_raw(frame_callback, iface=interface, count=count, bpf_filter=bpf_filter)
+            finally:
+                if writer is not None:
+                    writer.close()
+                    self.capture_path = str(writer.capture_dir)
+            return captured
             
         except Exception as e:
             print(f"ERROR: {str(e)}", file=sys.stderr)
             raise RuntimeError(f"Packet capture failed: {str(e)}")
 
+    def analyze_frame(self, data, timestamp, linktype):
+        """Extract key information from a raw frame, using Scapy only as a fallback"""
+        parsed = parse_frame(data, linktype)
+        if parsed is None:
+            return self.analyze_packet(dissect(data, linktype, timestamp))
+
+        ip_proto, src_ip, dst_ip, src_port, dst_port, length, _, _ = parsed
+        has_ports = ip_proto in (IPPROTO_TCP, IPPROTO_UDP)
+        return {
+            'time': timestamp,
+            'length': length,
+            'protocol': ip_proto,
+            'src_ip': src_ip,
+            'dst_ip': dst_ip,
+            'src_port': src_port if has_ports else None,
+            'dst_port': dst_port if has_ports else None
+        }
+
     def analyze_packet(self, packet):
         """Extract key information from a packet"""
         packet_info = {
@@ -88,35 +123,67 @@ class PacketCapture:
         return packet_info
 
     def save_capture(self, filename=None):
-        """Save the current capture to storage"""
-        if not self.captured_packets:
-            return None
-        return self.storage.save_capture(self.captured_packets, filename)
+        """Path of the last capture (captures are streamed to storage as they run)"""
+        return self.capture_path
+
+    def load_capture(self, filename, start=None, end=None, offset=0, limit=None):
+        """Load a previous capture (or a time range / page of it) from storage"""
+        return self.storage.load_capture(filename, start=start, end=end, offset=offset, limit=limit)
 
-    def load_capture(self, filename):
-        """Load a previous capture from storage"""
-        return self.storage.load_capture(filename)
+    def analyze_capture(self, filename, top=10, bin_seconds=60.0):
+        """Vectorized summary of a stored capture (needs numpy)"""
+        return summarize(self.storage.load_records(filename), top=top, bin_seconds=bin_seconds)
 
-    def list_captures(self):
-        """List all available captures"""
-        return self.storage.list_captures()
+    def list_captures(self, **query):
+        """List available captures with their summary statistics"""
+        return self.storage.list_captures(**query)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Network packet capture")
     parser.add_argument("--count", type=int, default=10, help="Number of packets to capture")
     parser.add_argument("--interface", type=str, help="Network interface to use")
-    parser.add_argument("--list-captures", action="store_true", help="List available captures")
+    parser.add_argument("--list-captures", action="store_true",
+                        help="List available captures with size, packet count, time span and protocol mix")
+    parser.add_argument("--sort", choices=SORT_COLUMNS, default="created", help="With --list-captures: sort key")
+    parser.add_argument("--order", choices=("asc", "desc"), default="desc", help="With --list-captures: sort order")
+    parser.add_argument("--protocol", type=str,
+                        help="With --list-captures: only captures containing this protocol (number or tcp/udp/icmp)")
+    parser.add_argument("--match", type=str, help="With --list-captures: only captures whose name contains this")
     parser.add_argument("--load", type=str, help="Load a specific capture by filename")
+    parser.add_argument("--analyze", type=str,
+                        help="Summarise a capture: bytes per protocol/IP/port, peers and a time histogram")
+    parser.add_argument("--top", type=int, default=10, help="With --analyze: entries per ranking")
+    parser.add_argument("--bin-seconds", type=float, default=60.0, help="With --analyze: histogram bin width")
+    parser.add_argument("--from", dest="start", type=str,
+                        help="Only packets (or captures overlapping) at or after this time (epoch seconds or ISO 8601)")
+    parser.add_argument("--to", dest="end", type=str,
+                        help="Only packets (or captures overlapping) at or before this time (epoch seconds or ISO 8601)")
+    parser.add_argument("--offset", type=int, default=0, help="Skip this many matching packets or captures")
+    parser.add_argument("--limit", type=int, help="Return at most this many packets or captures")
+    parser.add_argument("--filter", type=str, default=DEFAULT_BPF_FILTER,
+                        help='BPF capture filter in tcpdump syntax (pass "" to capture everything)')
+    parser.add_argument("--name", type=str, help="Name of the stored capture (default: capture_<timestamp>)")
+    parser.add_argument("--no-save", action="store_true", help="Print packets without storing the capture")
     args = parser.parse_args()
     
+    start = parse_time(args.start) if args.start else None
+    end = parse_time(args.end) if args.end else None
+    if (args.start and start is None) or (args.end and end is None):
+        parser.error("--from/--to take epoch seconds or an ISO 8601 time")
+
     capture = PacketCapture()
     
     if args.list_captures:
-        captures = capture.list_captures()
+        captures = capture.list_captures(match=args.match, protocol=args.protocol, start=start, end=end,
+                                         sort=args.sort, order=args.order, limit=args.limit,
+                                         offset=args.offset)
         print(json.dumps(captures))
+    elif args.analyze:
+        print(json.dumps(capture.analyze_capture(args.analyze, top=args.top, bin_seconds=args.bin_seconds)))
     elif args.load:
-        data = capture.load_capture(args.load)
+        data = capture.load_capture(args.load, start=start, end=end, offset=args.offset, limit=args.limit)
         print(json.dumps(data, default=str))
     else:
         # Capture packets and print them (happens inside the callback)
-        capture.capture_packets(interface=args.interface, count=args.count)
+        capture.capture_packets(interface=args.interface, count=args.count, bpf_filter=args.filter,
+                                save=not args.no_save, name=args.name)
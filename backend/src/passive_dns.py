@@ -0,0 +1,163 @@
+import socket
+import struct
+
+from dns_cache import DNSCache
+
+DNS_TYPE_A = 1
+DNS_TYPE_CNAME = 5
+DNS_TYPE_AAAA = 28
+
+TLS_HANDSHAKE = 0x16
+TLS_CLIENT_HELLO = 0x01
+TLS_EXT_SERVER_NAME = 0x0000
+
+
+def _read_dns_name(data, offset):
+    """Decode a (possibly compressed) DNS name; returns (name, offset after it)"""
+    labels = []
+    end_offset = None
+    jumps = 0
+
+    while True:
+        if offset >= len(data):
+            raise ValueError("truncated name")
+        length = data[offset]
+
+        if length & 0xC0 == 0xC0:
+            # Compression pointer
+            if offset + 1 >= len(data):
+                raise ValueError("truncated pointer")
+            if end_offset is None:
+                end_offset = offset + 2
+            offset = ((length & 0x3F) << 8) | data[offset + 1]
+            jumps += 1
+            if jumps > 16:
+                raise ValueError("pointer loop")
+            continue
+
+        offset += 1
+        if length == 0:
+            break
+        labels.append(bytes(data[offset:offset + length]).decode('ascii', 'replace'))
+        offset += length
+
+    return ".".join(labels), (end_offset if end_offset is not None else offset)
+
+
+def parse_dns_answers(data):
+    """Extract (ip, name, ttl) tuples from the A/AAAA answers of a DNS response.
+
+    Every address is attributed to the queried name rather than the end of
+    any CNAME chain, since that is the name the client asked for.
+    """
+    if len(data) < 12:
+        return []
+
+    _, flags, qdcount, ancount = struct.unpack_from("!HHHH", data, 0)
+    if not flags & 0x8000 or flags & 0x000F or ancount == 0:
+        return []  # Not a response, an error response, or no answers
+
+    results = []
+    try:
+        offset = 12
+        query_name = None
+        for _ in range(qdcount):
+            name, offset = _read_dns_name(data, offset)
+            offset += 4  # qtype, qclass
+            if query_name is None:
+                query_name = name
+
+        for _ in range(ancount):
+            name, offset = _read_dns_name(data, offset)
+            rtype, _, ttl, rdlength = struct.unpack_from("!HHIH", data, offset)
+            offset += 10
+            rdata = data[offset:offset + rdlength]
+            offset += rdlength
+            if len(rdata) < rdlength:
+                break
+
+            if rtype == DNS_TYPE_A and rdlength == 4:
+                ip = socket.inet_ntop(socket.AF_INET, bytes(rdata))
+            elif rtype == DNS_TYPE_AAAA and rdlength == 16:
+                ip = socket.inet_ntop(socket.AF_INET6, bytes(rdata))
+            else:
+                continue
+            results.append((ip, query_name or name, ttl))
+    except (ValueError, struct.error):
+        pass
+
+    return results
+
+
+def parse_tls_sni(data):
+    """Return the server_name of a TLS ClientHello, or None"""
+    try:
+        if len(data) < 43 or data[0] != TLS_HANDSHAKE or data[5] != TLS_CLIENT_HELLO:
+            return None
+
+        # Record header (5) + handshake header (4) + version (2) + random (32)
+        offset = 43
+        session_id_length = data[offset]
+        offset += 1 + session_id_length
+        cipher_suites_length = struct.unpack_from("!H", data, offset)[0]
+        offset += 2 + cipher_suites_length
+        compression_length = data[offset]
+        offset += 1 + compression_length
+        extensions_length = struct.unpack_from("!H", data, offset)[0]
+        offset += 2
+        extensions_end = min(offset + extensions_length, len(data))
+
+        while offset + 4 <= extensions_end:
+            ext_type, ext_length = struct.unpack_from("!HH", data, offset)
+            offset += 4
+            if ext_type == TLS_EXT_SERVER_NAME:
+                # server_name_list length (2), name_type (1), name length (2)
+                name_type = data[offset + 2]
+                name_length = struct.unpack_from("!H", data, offset + 3)[0]
+                if name_type != 0:
+                    return None
+                name = bytes(data[offset + 5:offset + 5 + name_length])
+                return name.decode('ascii', 'replace') or None
+            offset += ext_length
+    except (IndexError, struct.error):
+        pass
+
+    return None
+
+
+class PassiveDNS:
+    """IP -> domain index learned from observed DNS answers and TLS SNI"""
+
+    def __init__(self, max_size=50000, sni_ttl=3600, min_ttl=60):
+        self.index = DNSCache(max_size=max_size, positive_ttl=sni_ttl, negative_ttl=0)
+        self.min_ttl = min_ttl
+        self.stats = {
+            "dns_responses": 0,
+            "dns_answers": 0,
+            "sni_names": 0
+        }
+
+    def learn_dns(self, payload):
+        """Record the address answers of a DNS response payload"""
+        answers = parse_dns_answers(payload)
+        if answers:
+            self.stats["dns_responses"] += 1
+        for ip, name, ttl in answers:
+            self.index.put(ip, name, max(ttl, self.min_ttl))
+            self.stats["dns_answers"] += 1
+        return len(answers)
+
+    def learn_sni(self, server_ip, payload):
+        """Record the SNI of a ClientHello sent to server_ip; returns the name"""
+        name = parse_tls_sni(payload)
+        if name:
+            self.index.put(server_ip, name)
+            self.stats["sni_names"] += 1
+        return name
+
+    def lookup(self, ip):
+        """Return the learned name for ip, or None"""
+        return self.index.get(ip) or None
+
+    def get_stats(self):
+        return dict(self.stats, index=self.index.get_stats())
@@ -4,23 +4,119 @@ import json
 import time
 import threading
 import argparse
+import fcntl
 import os
 import sys
 from datetime import datetime
 import psutil
 import signal
 import socket
-from collections import defaultdict
+import sqlite3
+import hashlib
+import ipaddress
+import math
+from collections import OrderedDict, defaultdict, deque
+from urllib.parse import parse_qs, urlparse
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from dns_cache import DNSCache
+from dns_resolver import DNSResolver
+from passive_dns import PassiveDNS
+from fast_parser import (
+    DEFAULT_BPF_FILTER, IPPROTO_ICMP, IPPROTO_ICMPV6, IPPROTO_TCP, IPPROTO_UDP,
+    dissect, parse_frame, sniff_raw
+)
+from tpacket_ring import TPacketRing
+from capture_pipeline import CapturePipeline
+from shard_coordinator import ShardCoordinator
+from flow_expiry import FlowExpiry
+from flow_admission import OVERFLOW_ADDR, FlowAdmission
+from snapshot import SnapshotPublisher
+from api_server import JsonRequestHandler, PooledHTTPServer
+from flow_index import ConnectionView, FlowIndex, FlowQuery
+from top_talkers import TopTalkers
+from timeseries import RESOLUTIONS, TimeSeriesStore
+
+# Add project root to Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+from storage.flow_history import FlowHistory
+from storage.pcap_ring import PcapRing, extract, locate
+from tcp_state import STATE_NEW, advance, is_closed, state_name
 
 # Add debug mode
 DEBUG = True
 
-# Store active connections
-connections = {}
+# Store active connections, least recently seen first
+connections = OrderedDict()
 connection_lock = threading.Lock()
 
-# Store DNS resolution cache
-dns_cache = {}
+# Store DNS resolution cache (bounded, with TTLs and negative caching)
+dns_cache = DNSCache()
+
+# Background reverse DNS lookups, kept off the packet path
+dns_resolver = DNSResolver(cache=dns_cache)
+
+# IP -> domain learned from DNS answers and TLS SNI seen on the wire
+passive_dns = PassiveDNS()
+
+# Only look for a TLS ClientHello in the first few outgoing packets of a flow
+SNI_SCAN_PACKETS = 8
+
+# TPACKET_V3 ring when capturing with --backend tpacket
+capture_ring = None
+
+# Queue between the capture thread and the batch worker that updates connections
+capture_pipeline = None
+
+# Merges per-process flow tables when running with --workers
+shard_coordinator = None
+
+# Schedules idle connections for removal (per-protocol timeouts)
+flow_expiry = FlowExpiry()
+
+# Connections by protocol, service and IP, for filtered /connections queries
+flow_index = FlowIndex()
+
+# Decayed heavy-hitter sketches for /top (bounded size, independent of flow count)
+top_talkers = TopTalkers()
+
+# Per-second/minute/hour byte and packet history for /timeseries
+timeseries = TimeSeriesStore()
+
+# Per-flow rates are exponentially weighted with this half-life (seconds)
+RATE_HALF_LIFE = 10.0
+RATE_DECAY = math.log(2) / RATE_HALF_LIFE
+
+# Flow table budget, per-source new-flow rate limit and eviction policy
+flow_admission = FlowAdmission()
+
+# Serialized /connections responses, rebuilt off the request path (--serve)
+snapshot_publisher = None
+
+# Change version of the most recent flow update; each connection records the
+# version of its last change and the table is kept in that order, so a delta
+# since a cursor is a walk from the newest end
+flow_version = 0
+
+# (version, flow id) of recently removed connections, for delta clients
+TOMBSTONE_LIMIT = 100000
+flow_tombstones = deque(maxlen=TOMBSTONE_LIMIT)
+tombstone_floor = 0  # Newest version dropped from flow_tombstones
+
+# (version, conn_id) of changes made off the packet path (mark_changed).
+# Those leave the flow where it is, so the table stays in last-seen order.
+late_changes = deque(maxlen=TOMBSTONE_LIMIT)
+late_change_floor = 0  # Newest version dropped from late_changes
+
+# SQLite history of expired, evicted and checkpointed flows (--history-db)
+flow_history = None
+history_checkpoint_version = 0  # flow_version covered by the last checkpoint
+
+# Full-packet pcapng ring with a per-segment flow index (--pcap-ring)
+pcap_ring = None
+
+# Connections removed from the table, by reason
+flow_removals = defaultdict(int)
 
 # Add diagnostics
 packet_stats = {
@@ -32,88 +128,163 @@ packet_stats = {
     "last_packet_time": None
 }
 
+# Well-known ports
+COMMON_PORTS = {
+    80: "HTTP",
+    443: "HTTPS",
+    53: "DNS",
+    22: "SSH",
+    21: "FTP",
+    25: "SMTP",
+    110: "POP3",
+    143: "IMAP",
+    3306: "MySQL",
+    5432: "PostgreSQL",
+    27017: "MongoDB",
+    6379: "Redis",
+    8080: "HTTP-ALT",
+    8443: "HTTPS-ALT"
+}
+
+# Protocol and service names are stored per connection as small integer codes
+PROTOCOL_NAMES = ("TCP", "UDP", "ICMP")
+PROTOCOL_CODES = {name: code for code, name in enumerate(PROTOCOL_NAMES)}
+SERVICE_NAMES = ("Unknown", "ICMP") + tuple(sorted(set(COMMON_PORTS.values())))
+SERVICE_CODES = {name: code for code, name in enumerate(SERVICE_NAMES)}
+PORT_SERVICE_CODES = {port: SERVICE_CODES[name] for port, name in COMMON_PORTS.items()}
+
+def flow_id(src_ip, dst_ip, src_port, dst_port, protocol):
+    """Stable 48-bit flow identifier, the same in every process and across restarts.
+
+    48 bits keeps the id exactly representable as a JavaScript number.
+    """
+    key = f"{src_ip}|{dst_ip}|{src_port}|{dst_port}|{protocol}".encode()
+    return int.from_bytes(hashlib.blake2b(key, digest_size=6).digest(), "big")
+
 # Class to represent a network connection
 class Connection:
-    def __init__(self, src_ip, dst_ip, src_port, dst_port, protocol):
+    # Slots keep each flow record compact: no per-instance __dict__
+    __slots__ = (
+        "src_ip", "dst_ip", "src_port", "dst_port", "protocol_code", "service_code",
+        "bytes_sent", "bytes_received", "packets_sent", "packets_received",
+        "first_seen", "last_seen", "domain", "domain_pending", "active", "id",
+        "tcp_state", "version", "byte_rate", "packet_rate", "rate_time"
+    )
+
+    country = "Unknown"  # Would need GeoIP lookup
+    asn = "Unknown"      # Would need ASN lookup
+
+    def __init__(self, src_ip, dst_ip, src_port, dst_port, protocol, timestamp=None):
+        if timestamp is None:
+            timestamp = time.time()
         self.src_ip = src_ip
         self.dst_ip = dst_ip
         self.src_port = src_port
         self.dst_port = dst_port
-        self.protocol = protocol
-        self.service = self.determine_service()
+        self.protocol_code = PROTOCOL_CODES[protocol]
+        self.service_code = self.determine_service()
         self.bytes_sent = 0
         self.bytes_received = 0
         self.packets_sent = 0
         self.packets_received = 0
-        self.first_seen = datetime.now()
-        self.last_seen = datetime.now()
-        self.country = "Unknown"  # Would need GeoIP lookup
-        self.asn = "Unknown"      # Would need ASN lookup
-        self.domain = self.resolve_domain()
+        # Timestamps are epoch floats (packet.time), not datetime objects
+        self.first_seen = timestamp
+        self.last_seen = timestamp
+        self.domain = ""
+        # True while a lookup is queued, None if the resolver dropped it (retried on a later packet)
+        self.domain_pending = False
         self.active = True
-        self.id = hash((src_ip, dst_ip, src_port, dst_port, protocol))
+        self.id = flow_id(src_ip, dst_ip, src_port, dst_port, protocol)
+        self.tcp_state = STATE_NEW
+        self.version = 0
+        # EWMA bytes/packets per second as of rate_time
+        self.byte_rate = 0.0
+        self.packet_rate = 0.0
+        self.rate_time = timestamp
+
+    def key(self):
+        """This connection's key in the connections table"""
+        return (self.src_ip, self.dst_ip, self.src_port, self.dst_port, self.protocol)
+
+    @property
+    def protocol(self):
+        return PROTOCOL_NAMES[self.protocol_code]
+
+    @property
+    def service(self):
+        return SERVICE_NAMES[self.service_code]
 
     def determine_service(self):
-        if self.protocol == "ICMP":
-            return "ICMP"
-        
-        # Well-known ports
-        common_ports = {
-            80: "HTTP",
-            443: "HTTPS",
-            53: "DNS",
-            22: "SSH",
-            21: "FTP",
-            25: "SMTP",
-            110: "POP3",
-            143: "IMAP",
-            3306: "MySQL",
-            5432: "PostgreSQL",
-            27017: "MongoDB",
-            6379: "Redis",
-            8080: "HTTP-ALT",
-            8443: "HTTPS-ALT"
-        }
+        """Return the service code for this connection's ports"""
+        if self.protocol_code == PROTOCOL_CODES["ICMP"]:
+            return SERVICE_CODES["ICMP"]
         
         # Check if destination port is a common service
-        if self.dst_port in common_ports:
-            return common_ports[self.dst_port]
+        if self.dst_port in PORT_SERVICE_CODES:
+            return PORT_SERVICE_CODES[self.dst_port]
         
         # Check if source port is a common service
-        if self.src_port in common_ports:
-            return common_ports[self.src_port]
+        if self.src_port in PORT_SERVICE_CODES:
+            return PORT_SERVICE_CODES[self.src_port]
         
-        return "Unknown"
+        return SERVICE_CODES["Unknown"]
 
     def resolve_domain(self):
-        """Resolve IP address to domain name using DNS reverse lookup"""
-        global dns_cache
-        
-        # Check cache for destination IP
-        if self.dst_ip in dns_cache:
-            return dns_cache[self.dst_ip]
-        
-        try:
-            # Try to resolve destination IP to hostname
-            domain = socket.gethostbyaddr(self.dst_ip)[0]
-            dns_cache[self.dst_ip] = domain
-            return domain
-        except (socket.herror, socket.gaierror):
-            # No domain found, check for source IP
-            if self.src_ip in dns_cache:
-                return dns_cache[self.src_ip]
-            
-            try:
-                domain = socket.gethostbyaddr(self.src_ip)[0]
-                dns_cache[self.src_ip] = domain
-                return domain
-            except (socket.herror, socket.gaierror):
-                dns_cache[self.dst_ip] = ""
-                dns_cache[self.src_ip] = ""
-                return ""
-
-    def update(self, packet_size, is_outgoing):
-        self.last_seen = datetime.now()
+        """Fill in the domain from passively learned names, the DNS cache, or
+        schedule a background lookup.
+
+        Never blocks: uncached IPs are handed to the resolver pool and the
+        domain stays empty (domain_pending) until the answer arrives.
+        """
+        # Names seen in DNS answers or SNI beat PTR records and cost nothing
+        for ip in (self.dst_ip, self.src_ip):
+            domain = passive_dns.lookup(ip)
+            if domain:
+                self.domain = domain
+                return
+
+        # Prefer the destination IP, fall back to the source IP
+        for ip in (self.dst_ip, self.src_ip):
+            domain = dns_cache.get(ip)
+            if domain is None:
+                self.domain_pending = True
+                dns_resolver.resolve(ip, self._on_domain_resolved)
+                return
+            if domain:
+                self.domain = domain
+                return
+        self.domain_pending = False
+
+    def _on_domain_resolved(self, ip, domain):
+        # Runs on a resolver thread; don't overwrite a domain set elsewhere
+        if self.domain:
+            self.domain_pending = False
+            return
+        if domain is None:
+            # Dropped by a saturated resolver
+            self.domain_pending = None
+            return
+        if domain:
+            self.domain = domain
+            self.domain_pending = False
+            mark_changed(self)
+        elif ip == self.dst_ip:
+            self.resolve_domain()
+        else:
+            self.domain_pending = False
+
+    def update(self, packet_size, is_outgoing, timestamp=None):
+        self.last_seen = timestamp if timestamp is not None else time.time()
+
+        # Decay the rates to this packet, then add it in
+        elapsed = self.last_seen - self.rate_time
+        if elapsed > 0:
+            decay = math.exp(-elapsed * RATE_DECAY)
+            self.byte_rate *= decay
+            self.packet_rate *= decay
+            self.rate_time = self.last_seen
+        self.byte_rate += packet_size * RATE_DECAY
+        self.packet_rate += RATE_DECAY
         
         if is_outgoing:
             self.bytes_sent += packet_size
@@ -123,6 +294,9 @@ class Connection:
             self.packets_received += 1
 
     def to_dict(self):
+        # Rates as of the last packet (rate_time), not decayed to now: the
+        # dict must not change while the flow is idle, or neither would the
+        # snapshot body and its ETag. /top serves live decayed rates.
         return {
             "id": self.id,
             "srcAddr": self.src_ip,
@@ -136,9 +310,12 @@ class Connection:
             "domain": self.domain,
             "country": self.country,
             "asn": self.asn,
-            "firstSeen": self.first_seen.isoformat(),
-            "lastSeen": self.last_seen.isoformat(),
-            "active": self.active
+            "firstSeen": datetime.fromtimestamp(self.first_seen).isoformat(),
+            "lastSeen": datetime.fromtimestamp(self.last_seen).isoformat(),
+            "active": self.active,
+            "bytesPerSec": round(self.byte_rate, 1),
+            "packetsPerSec": round(self.packet_rate, 2),
+            "state": state_name(self.tcp_state) if self.protocol_code == PROTOCOL_CODES["TCP"] else None
         }
 
 # Get local IP addresses
@@ -148,13 +325,88 @@ def get_local_ips():
         for addr in addrs:
             if addr.family == socket.AF_INET:  # IPv4
                 local_ips.add(addr.address)
+            elif addr.family == socket.AF_INET6:  # IPv6, without any %scope suffix
+                local_ips.add(addr.address.split('%')[0])
     return local_ips
 
-# Packet handler function
+# Map IP protocol numbers from the fast-path parser to tracker protocol names
+IP_PROTOCOL_NAMES = {
+    IPPROTO_TCP: "TCP",
+    IPPROTO_UDP: "UDP",
+    IPPROTO_ICMP: "ICMP",
+    IPPROTO_ICMPV6: "ICMP"
+}
+PROTOCOL_STAT_KEYS = {
+    "TCP": "tcp_packets",
+    "UDP": "udp_packets",
+    "ICMP": "icmp_packets"
+}
+
+# Fast-path frame handler: parses raw bytes, Scapy only for frames it doesn't understand
+def frame_handler(data, timestamp, linktype, local_ips):
+    record = frame_record(data, timestamp, linktype, local_ips)
+    if record is not None:
+        with connection_lock:
+            apply_record(record)
+
+# Packet handler function (Scapy path)
 def packet_handler(packet, local_ips):
+    record = packet_record(packet, local_ips)
+    if record is not None:
+        with connection_lock:
+            apply_record(record)
+
+def process_frames(frames, local_ips):
+    """Handle a batch of (data, timestamp, linktype, length) frames.
+
+    length is the frame's length on the wire, which the captured data may
+    fall short of. Parsing and domain learning happen without the lock; the
+    flow table is then updated for the whole batch under a single lock
+    acquisition.
+    """
+    records = [frame_record(data, timestamp, linktype, local_ips, length)
+               for data, timestamp, linktype, length in frames]
+    flows = [None] * len(records)
+
+    with connection_lock:
+        for i, record in enumerate(records):
+            if record is not None:
+                flows[i] = apply_record(record).id
+
+    ring = pcap_ring
+    if ring is not None:
+        # Indexed under the id of the connection the packet was counted in
+        # (the aggregate flow for an overflowing source), as in /connections
+        for (data, timestamp, linktype, length), flow in zip(frames, flows):
+            ring.write(data, timestamp, linktype, flow, length)
+
+def frame_record(data, timestamp, linktype, local_ips, length=None):
+    """Parse a raw frame into a flow update record, or None to skip it.
+
+    length is the frame's length on the wire if data was truncated by the
+    capture; bytes are counted from it.
+    """
+    parsed = parse_frame(data, linktype)
+    if parsed is None:
+        record = packet_record(dissect(data, linktype, timestamp), local_ips)
+        if record is not None and length is not None:
+            record = record[:2] + (length,) + record[3:]
+        return record
+
+    ip_proto, src_ip, dst_ip, src_port, dst_port, packet_size, payload_offset, tcp_flags = parsed
+    if length is not None:
+        packet_size = length
+    packet_stats["total_packets"] += 1
+    packet_stats["last_packet_time"] = timestamp
+    return flow_record(IP_PROTOCOL_NAMES[ip_proto], src_ip, dst_ip, src_port, dst_port,
+                       packet_size, memoryview(data)[payload_offset:], timestamp, local_ips, tcp_flags)
+
+def packet_record(packet, local_ips):
+    """Turn a Scapy packet into a flow update record, or None to skip it"""
     # Update diagnostics
     packet_stats["total_packets"] += 1
-    packet_stats["last_packet_time"] = datetime.now()
+    timestamp = float(packet.time)
+    packet_stats["last_packet_time"] = timestamp
     
     if DEBUG:
         print(f"Received packet: {packet.summary()}")
@@ -162,40 +414,50 @@ def packet_handler(packet, local_ips):
     if scapy.IP not in packet:
         if DEBUG:
             print("Not an IP packet, skipping")
-        return
+        return None
     
     ip_packet = packet[scapy.IP]
-    src_ip = ip_packet.src
-    dst_ip = ip_packet.dst
     
     # Determine protocol and ports
     if scapy.TCP in packet:
-        packet_stats["tcp_packets"] += 1
         protocol = "TCP"
-        src_port = packet[scapy.TCP].sport
-        dst_port = packet[scapy.TCP].dport
-        if DEBUG:
-            print(f"TCP: {src_ip}:{src_port} -> {dst_ip}:{dst_port}")
+        layer = packet[scapy.TCP]
+        src_port, dst_port, payload = layer.sport, layer.dport, bytes(layer.payload)
+        tcp_flags = int(layer.flags)
     elif scapy.UDP in packet:
-        packet_stats["udp_packets"] += 1
         protocol = "UDP"
-        src_port = packet[scapy.UDP].sport
-        dst_port = packet[scapy.UDP].dport
-        if DEBUG:
-            print(f"UDP: {src_ip}:{src_port} -> {dst_ip}:{dst_port}")
+        layer = packet[scapy.UDP]
+        src_port, dst_port, payload = layer.sport, layer.dport, bytes(layer.payload)
+        tcp_flags = 0
     elif scapy.ICMP in packet:
-        packet_stats["icmp_packets"] += 1
         protocol = "ICMP"
-        src_port = 0
-        dst_port = 0
-        if DEBUG:
-            print(f"ICMP: {src_ip} -> {dst_ip}")
+        src_port, dst_port, payload = 0, 0, b""
+        tcp_flags = 0
     else:
         # Skip other protocols
         packet_stats["other_packets"] += 1
         if DEBUG:
             print(f"Other protocol: {ip_packet.proto}")
-        return
+        return None
+
+    return flow_record(protocol, ip_packet.src, ip_packet.dst, src_port, dst_port,
+                       len(packet), payload, timestamp, local_ips, tcp_flags)
+
+def flow_record(protocol, src_ip, dst_ip, src_port, dst_port, packet_size, payload, timestamp, local_ips, tcp_flags=0):
+    """Work out the connection a parsed packet belongs to.
+
+    Returns (conn_id, is_outgoing, packet_size, timestamp, sni, tcp_flags)
+    for apply_record(). Runs without connection_lock held.
+    """
+    packet_stats[PROTOCOL_STAT_KEYS[protocol]] += 1
+    if DEBUG:
+        if protocol == "ICMP":
+            print(f"ICMP: {src_ip} -> {dst_ip}")
+        else:
+            print(f"{protocol}: {src_ip}:{src_port} -> {dst_ip}:{dst_port}")
+
+    if protocol == "UDP" and src_port == 53:
+        passive_dns.learn_dns(payload)
 
     # Determine if packet is outgoing or incoming
     is_outgoing = src_ip in local_ips
@@ -205,32 +467,185 @@ def packet_handler(packet, local_ips):
         conn_id = (src_ip, dst_ip, src_port, dst_port, protocol)
     else:
         conn_id = (dst_ip, src_ip, dst_port, src_port, protocol)
+
+    # Learn the server name from a TLS ClientHello early in the flow
+    sni = None
+    if protocol == "TCP" and is_outgoing and payload:
+        conn = connections.get(conn_id)
+        if conn is None or conn.packets_sent < SNI_SCAN_PACKETS:
+            sni = passive_dns.learn_sni(dst_ip, payload)
+
+    return conn_id, is_outgoing, packet_size, timestamp, sni, tcp_flags
+
+def apply_record(record):
+    """Create or update the connection for a record and return it; caller holds connection_lock"""
+    conn_id, is_outgoing, packet_size, timestamp, sni, tcp_flags = record
+    # The packet's own endpoints: conn_id is local side first
+    local_ip, peer_ip = conn_id[0], conn_id[1]
+    conn = connections.get(conn_id)
+    if conn is None:
+        # A source opening flows faster than its rate is folded into one
+        # aggregate flow (source, OVERFLOW_ADDR) per protocol
+        source_ip = conn_id[0] if is_outgoing else conn_id[1]
+        if not flow_admission.admit(source_ip, timestamp):
+            conn_id = (source_ip, OVERFLOW_ADDR, 0, 0, conn_id[4])
+            conn = connections.get(conn_id)
+
+    is_new = conn is None
+    if is_new:
+        if flow_admission.is_full(connections):
+            evict_flows()
+        # Create new connection (conn_id is already local-side first)
+        src_ip, dst_ip, src_port, dst_port, protocol = conn_id
+        conn = Connection(src_ip, dst_ip, src_port, dst_port, protocol, timestamp)
+        if dst_ip != OVERFLOW_ADDR:
+            conn.resolve_domain()
+        connections[conn_id] = conn
+        flow_index.add(conn)
+        if DEBUG:
+            print(f"New connection: {conn_id}")
+    else:
+        # Keep the table in last-seen order for eviction
+        connections.move_to_end(conn_id)
+        if conn.domain_pending is None:
+            conn.resolve_domain()
     
-    # Get packet size
-    packet_size = len(packet)
-    
-    with connection_lock:
-        if conn_id not in connections:
-            # Create new connection
-            if is_outgoing:
-                conn = Connection(src_ip, dst_ip, src_port, dst_port, protocol)
-            else:
-                conn = Connection(dst_ip, src_ip, dst_port, src_port, protocol)
-            connections[conn_id] = conn
+    # Update existing connection
+    conn.update(packet_size, is_outgoing, timestamp)
+    remote_ip = conn.src_ip if conn.dst_ip == OVERFLOW_ADDR else conn.dst_ip
+    timeseries.record(timestamp, packet_size, conn.service, conn.protocol, remote_ip)
+    if is_outgoing:
+        top_talkers.record(conn_id, local_ip, peer_ip, conn.service, packet_size, timestamp)
+    else:
+        top_talkers.record(conn_id, peer_ip, local_ip, conn.service, packet_size, timestamp)
+    if sni:
+        conn.domain = sni
+
+    if conn.protocol_code == PROTOCOL_CODES["TCP"] and conn.dst_ip != OVERFLOW_ADDR:
+        was_closed = is_closed(conn.tcp_state)
+        conn.tcp_state = advance(conn.tcp_state, tcp_flags, is_outgoing)
+        closed = is_closed(conn.tcp_state)
+        conn.active = not closed
+        if closed and not was_closed and not is_new:
+            # FIN/RST: bring the deadline forward to the short linger timeout
+            flow_expiry.schedule(conn_id, conn)
             if DEBUG:
-                print(f"New connection: {conn_id}")
-        
-        # Update existing connection
-        connections[conn_id].update(packet_size, is_outgoing)
+                print(f"Connection closed: {conn_id}")
+
+    if is_new:
+        # Scheduled after the first packet so the timeout reflects its TCP state
+        flow_expiry.schedule(conn_id, conn)
+
+    global flow_version
+    flow_version += 1
+    conn.version = flow_version
+    return conn
+
+def mark_changed(conn):
+    """Record a change made outside the packet path (e.g. a resolved domain)"""
+    global flow_version, late_change_floor
+    with connection_lock:
+        conn_id = conn.key()
+        if connections.get(conn_id) is conn:
+            flow_version += 1
+            conn.version = flow_version
+            if len(late_changes) == TOMBSTONE_LIMIT:
+                late_change_floor = late_changes[0][0]
+            late_changes.append((flow_version, conn_id))
+
+def changed_since(since):
+    """Connections with a version after since, most recently seen first.
+
+    Returns None if changes that old are no longer tracked. Packets move a
+    flow to the newest end of the table, so those changes are found by
+    walking back from it; mark_changed() changes come from late_changes.
+    Caller holds connection_lock.
+    """
+    if since < late_change_floor:
+        return None
+    changed = []
+    for conn in reversed(connections.values()):
+        if conn.version <= since:
+            break
+        changed.append(conn)
+    late = []
+    seen = set(changed)
+    for version, conn_id in reversed(late_changes):
+        if version <= since:
+            break
+        conn = connections.get(conn_id)
+        if conn is not None and conn.version > since and conn not in seen:
+            seen.add(conn)
+            late.append(conn)
+    # Late changes sit before the walked part of the table: they were seen less recently
+    late.sort(key=lambda conn: conn.last_seen, reverse=True)
+    return changed + late
+
+def usable_bpf_filter(bpf_filter, interface=None):
+    """Check that a BPF filter compiles; without libpcap, capture unfiltered"""
+    if not bpf_filter:
+        return None
+    from scapy.arch.common import compile_filter
+    try:
+        compile_filter(bpf_filter, interface or scapy.conf.iface)
+    except ImportError as e:
+        print(f"Cannot compile capture filter ({str(e)}), capturing unfiltered")
+        return None
+    print(f"Kernel capture filter: {bpf_filter}")
+    return bpf_filter
+
+def run_tpacket_capture(interface, duration, pipeline, bpf_filter=None, fanout_group=None):
+    """Capture through a TPACKET_V3 mmap ring; returns False if it can't be opened"""
+    global capture_ring
+    try:
+        ring = TPacketRing(interface, bpf_filter=bpf_filter, fanout_group=fanout_group).open()
+    except (OSError, AttributeError) as e:
+        if fanout_group is not None:
+            # A sharded worker without fanout would see every flow; don't fall back
+            raise
+        print(f"TPACKET_V3 ring unavailable ({str(e)}), falling back to Scapy capture")
+        return False
+
+    capture_ring = ring
+    print(f"Starting TPACKET_V3 ring capture on {'all interfaces' if interface is None else interface}")
+
+    def handle_batch(frames):
+        # Copy frames out of the ring: the block is returned to the kernel
+        # as soon as this callback returns
+        pipeline.submit_many([(bytes(data), timestamp, linktype, length)
+                              for data, timestamp, linktype, length in frames])
+
+    try:
+        ring.run(handle_batch, timeout=duration)
+    finally:
+        ring.close()
+    return True
+
+def start_capture(interface=None, duration=None, backend="scapy", bpf_filter=DEFAULT_BPF_FILTER,
+                  batch_size=512, batch_interval=0.05, queue_size=65536, fanout_group=None):
+    global capture_pipeline
 
-def start_capture(interface=None, duration=None):
     # Get local IP addresses
     local_ips = get_local_ips()
     print(f"Local IPs: {local_ips}")
+
+    # The capture thread only enqueues frames; a worker parses and applies them in batches
+    pipeline = CapturePipeline(
+        lambda frames: process_frames(frames, local_ips),
+        max_queue=queue_size,
+        batch_size=batch_size,
+        batch_interval=batch_interval
+    ).start()
+    capture_pipeline = pipeline
     
     # Start packet capture in a separate thread
     def capture_thread():
+        nonlocal interface, bpf_filter
         try:
+            bpf_filter = usable_bpf_filter(bpf_filter, interface)
+            if backend == "tpacket" and run_tpacket_capture(interface, duration, pipeline, bpf_filter, fanout_group):
+                return
+
             # Try to create a test packet to verify capture works
             test_packet = scapy.IP(dst="8.8.8.8")/scapy.ICMP()
             if DEBUG:
@@ -252,16 +667,20 @@ def start_capture(interface=None, duration=None):
                         print(f"Interface {iface_name} error: {str(e)}")
             
             print(f"Starting packet capture on {'all interfaces' if interface is None else interface}")
-            # Use promisc=True to capture all packets
-            scapy.sniff(
+            # Read raw frames and parse headers directly; Scapy only dissects
+            # frames the fast-path parser can't handle
+            sniff_raw(
+                lambda data, timestamp, linktype: pipeline.submit((data, timestamp, linktype, len(data))),
                 iface=interface,
-                prn=lambda pkt: packet_handler(pkt, local_ips),
-                store=False,
                 timeout=duration,
-                promisc=True
+                promisc=True,
+                bpf_filter=bpf_filter
             )
         except Exception as e:
             print(f"Capture error: {str(e)}")
+        finally:
+            # Apply whatever is still queued before the capture is reported done
+            pipeline.stop()
     
     thread = threading.Thread(target=capture_thread)
     thread.daemon = True
@@ -271,30 +690,184 @@ def start_capture(interface=None, duration=None):
     return thread
 
 def get_connections_json():
-    with connection_lock:
+    if shard_coordinator is not None:
+        conn_list = shard_coordinator.connections()
+        stats = shard_coordinator.packet_stats()
+    else:
+        with connection_lock:
+            # The table is kept in last-seen order, so copying it most recent
+            # first is all the work done under the lock
+            conns = list(reversed(connections.values()))
         # Convert connections to list of dictionaries
-        conn_list = [conn.to_dict() for conn in connections.values()]
-    
-    # Sort by last seen time (most recent first)
-    conn_list.sort(key=lambda x: x["lastSeen"], reverse=True)
+        conn_list = [conn.to_dict() for conn in conns]
+        stats = packet_stats
     
     # Add diagnostics
     if DEBUG:
-        diagnostics = {
-            "total_packets": packet_stats["total_packets"],
-            "tcp_packets": packet_stats["tcp_packets"],
-            "udp_packets": packet_stats["udp_packets"],
-            "icmp_packets": packet_stats["icmp_packets"],
-            "other_packets": packet_stats["other_packets"],
-            "last_packet_time": packet_stats["last_packet_time"].isoformat() if packet_stats["last_packet_time"] else None
-        }
         return json.dumps({
             "connections": conn_list,
-            "diagnostics": diagnostics
+            "diagnostics": get_diagnostics(stats)
         })
         
     return json.dumps(conn_list)
 
+def connections_version():
+    """A value that changes whenever get_connections_json() would"""
+    if shard_coordinator is not None:
+        return shard_coordinator.version
+    # Packets that update no flow still move the diagnostics counters
+    return flow_version, packet_stats["total_packets"]
+
+def get_diagnostics(stats=None):
+    """Packet counters in the form sent to the dashboard"""
+    if stats is None:
+        stats = shard_coordinator.packet_stats() if shard_coordinator is not None else packet_stats
+    return {
+        "total_packets": stats.get("total_packets", 0),
+        "tcp_packets": stats.get("tcp_packets", 0),
+        "udp_packets": stats.get("udp_packets", 0),
+        "icmp_packets": stats.get("icmp_packets", 0),
+        "other_packets": stats.get("other_packets", 0),
+        "last_packet_time": datetime.fromtimestamp(stats["last_packet_time"]).isoformat() if stats.get("last_packet_time") else None
+    }
+
+def get_connections_delta(since):
+    """JSON form of connections_delta()"""
+    return json.dumps(connections_delta(since))
+
+def connections_delta(since):
+    """Connections changed and removed after version cursor since.
+
+    Returns {"cursor", "reset", "connections", "removed"}: connections are
+    created or updated flows (most recent first), removed are ids of flows
+    that expired or were evicted. A client whose cursor is unknown or too
+    old for the retained tombstones gets reset=true and the full list.
+    Start with since=0 and pass the returned cursor on the next poll.
+    """
+    if shard_coordinator is not None:
+        # Sharded tables have no shared version sequence: the cursor is the
+        # coordinator's, and any change resends the full merged list
+        cursor, merged = shard_coordinator.connections_since(since)
+        if merged is None:
+            return {"cursor": cursor, "reset": False, "connections": [], "removed": []}
+        return {"cursor": cursor, "reset": True, "connections": merged, "removed": []}
+
+    with connection_lock:
+        cursor = flow_version
+        # since=0 asks for a full list; other unusable cursors force one
+        reset = since <= 0 or since < tombstone_floor or since > cursor
+        changed = None if reset else changed_since(since)
+        removed = []
+        if changed is None:
+            reset = True
+            changed = list(reversed(connections.values()))
+        else:
+            # A flow removed and then recreated since the cursor keeps its
+            # (stable) id: report it as changed, not removed
+            live = {conn.id for conn in changed}
+            for version, conn_id in reversed(flow_tombstones):
+                if version <= since:
+                    break
+                if conn_id not in live:
+                    removed.append(conn_id)
+
+    return {
+        "cursor": cursor,
+        "reset": reset,
+        "connections": [conn.to_dict() for conn in changed],
+        "removed": removed
+    }
+
+def query_connections(params):
+    """Filtered, sorted and paged connections for /connections?<filters> as JSON.
+
+    Indexed filters (protocol, service, ip) pick the candidate flows under
+    the lock; the remaining filters, sorting and serialization of the
+    requested page happen after it is released. Raises ValueError for bad
+    parameters.
+    """
+    query = FlowQuery(params)
+    matches = query.matches
+    if shard_coordinator is not None:
+        candidates = [ConnectionView(conn) for conn in shard_coordinator.connections()]
+    else:
+        with connection_lock:
+            candidates = flow_index.candidates(query)
+            if candidates is None:
+                candidates = list(connections.values())
+            else:
+                matches = query.matches_unindexed
+
+    total, page = query.page([conn for conn in candidates if matches(conn)])
+    return json.dumps({
+        "total": total,
+        "offset": query.offset,
+        "limit": query.limit,
+        "connections": [conn.to_dict() for conn in page]
+    })
+
+def get_top(k=10, dimensions=None):
+    """Heaviest flows, sources, destinations and services right now, as JSON.
+
+    Rates are decayed byte and packet rates from the heavy-hitter
+    sketches; "error" is the sketch's overestimate bound. Flow entries
+    also carry the flow's details when it is still in the table.
+    """
+    if shard_coordinator is not None:
+        return json.dumps(shard_coordinator.top(k, dimensions))
+
+    with connection_lock:
+        top = top_talkers.top(k, dimensions)
+        for entry in top.get("flows", ()):
+            conn = connections.get(entry["key"])
+            entry["key"] = flow_id(*entry["key"])
+            entry["connection"] = conn.to_dict() if conn is not None else None
+    return json.dumps(top)
+
+def get_timeseries(key="global", resolution="1s", start=None, end=None):
+    """History for one series as JSON, or None if the key has no data.
+
+    key is "global", "service:<name>", "protocol:<name>" or "host:<ip>".
+    Points are [slot start (epoch seconds), bytes, packets], oldest first.
+    """
+    points = timeseries.query(key, resolution, start, end, now=time.time())
+    if points is None:
+        return None
+    return json.dumps({"key": key, "resolution": resolution, "points": points})
+
+# Number of clients currently connected to /stream
+stream_clients = 0
+stream_clients_lock = threading.Lock()
+
+def stream_updates(wfile, interval=1.0, since=0):
+    """Push coalesced flow changes to one /stream client as Server-Sent Events.
+
+    Every interval seconds the client gets a "connections" event with the
+    delta since the last one it received (same shape as
+    /connections?since=) and a "stats" event with packet diagnostics. The
+    client's cursor is the only per-client state: nothing is queued, so a
+    slow client blocks only its own write and then receives a larger,
+    coalesced delta. Returns when the client disconnects.
+    """
+    global stream_clients
+    with stream_clients_lock:
+        stream_clients += 1
+    try:
+        wfile.write(b"retry: 2000\n\n")
+        while True:
+            delta = connections_delta(since)
+            if delta["reset"] or delta["connections"] or delta["removed"]:
+                wfile.write(b"event: connections\ndata: " + json.dumps(delta).encode() + b"\n\n")
+            since = delta["cursor"]
+            wfile.write(b"event: stats\ndata: " + json.dumps(get_diagnostics()).encode() + b"\n\n")
+            wfile.flush()
+            time.sleep(interval)
+    except (BrokenPipeError, ConnectionResetError, socket.timeout):
+        pass
+    finally:
+        with stream_clients_lock:
+            stream_clients -= 1
+
 # Generate simulated traffic for testing
 def generate_simulated_traffic():
     print("Generating simulated traffic for testing")
@@ -358,40 +931,266 @@ def generate_simulated_traffic():
         
         # Store the connection
         with connection_lock:
+            replaced = connections.get(conn_id)
+            if replaced is not None:
+                flow_index.remove(replaced)
             connections[conn_id] = conn
+            flow_index.add(conn)
+            flow_expiry.schedule(conn_id, conn)
+        mark_changed(conn)
             
     print(f"Created {simulated_count} simulated connections")
 
-def cleanup_old_connections(max_age_seconds=3600):  # Default 1 hour
-    """Remove inactive connections older than max_age_seconds"""
+def remove_connection(conn_id, reason="expired"):
+    """Drop a connection from the table; caller holds connection_lock"""
+    global flow_version, tombstone_floor
+    conn = connections.pop(conn_id, None)
+    if conn is not None:
+        flow_index.remove(conn)
+        flow_removals[reason] += 1
+        if flow_history is not None:
+            flow_history.record(history_row(conn, reason))
+        flow_version += 1
+        if len(flow_tombstones) == TOMBSTONE_LIMIT:
+            tombstone_floor = flow_tombstones[0][0]
+        flow_tombstones.append((flow_version, conn.id))
+    return conn
+
+def history_row(conn, reason):
+    """A connection as a flow history row (storage.flow_history.COLUMNS order)"""
+    return (
+        conn.id, conn.first_seen, conn.last_seen, conn.src_ip, conn.src_port,
+        conn.dst_ip, conn.dst_port, conn.protocol, conn.service, conn.domain,
+        conn.bytes_sent, conn.bytes_received, conn.packets_sent, conn.packets_received,
+        state_name(conn.tcp_state) if conn.protocol == "TCP" else None, reason
+    )
+
+def checkpoint_history():
+    """Queue every flow changed since the last checkpoint for the history store"""
+    global history_checkpoint_version
+    if flow_history is None:
+        return 0
+    count = 0
     with connection_lock:
-        current_time = datetime.now()
-        conn_ids_to_remove = []
-        
-        for conn_id, conn in connections.items():
-            age = (current_time - conn.last_seen).total_seconds()
-            if age > max_age_seconds:
-                conn_ids_to_remove.append(conn_id)
-        
-        # Remove old connections
-        for conn_id in conn_ids_to_remove:
-            del connections[conn_id]
-        
-        return len(conn_ids_to_remove)
+        changed = changed_since(history_checkpoint_version)
+        if changed is None:
+            changed = connections.values()
+        for conn in changed:
+            flow_history.record(history_row(conn, "checkpoint"))
+            count += 1
+        history_checkpoint_version = flow_version
+    return count
+
+def run_history_thread(checkpoint_interval=60):
+    """Periodically checkpoint live flows so a crash loses at most one interval"""
+    def history_thread():
+        while True:
+            time.sleep(checkpoint_interval)
+            count = checkpoint_history()
+            if count and DEBUG:
+                print(f"Checkpointed {count} flows to history")
 
-def run_cleanup_thread(cleanup_interval=300):  # Clean every 5 minutes
-    """Run a background thread to clean up old connections"""
+    thread = threading.Thread(target=history_thread)
+    thread.daemon = True
+    thread.start()
+
+def configure_history(path, checkpoint_interval=60):
+    """Start writing flow history to the SQLite database at path"""
+    global flow_history
+    flow_history = FlowHistory(path).start()
+    run_history_thread(checkpoint_interval)
+    print(f"Writing flow history to {flow_history.path}")
+
+def close_history():
+    """Checkpoint the remaining flows and wait for the writer to finish"""
+    if flow_history is not None:
+        checkpoint_history()
+        flow_history.close()
+
+def configure_pcap_ring(directory, budget_mb=1024, segment_mb=64):
+    """Record every captured frame to a ring of pcapng segments in directory"""
+    global pcap_ring
+    pcap_ring = PcapRing(directory, budget_bytes=int(budget_mb * 2**20), segment_bytes=int(segment_mb * 2**20))
+    print(f"Recording packets to {pcap_ring.directory} (ring of {budget_mb} MiB)")
+
+def close_pcap_ring():
+    if pcap_ring is not None:
+        pcap_ring.close()
+
+def evict_flows():
+    """Make room for a new flow when the table is at its budget; caller holds connection_lock"""
+    while flow_admission.is_full(connections):
+        victim = flow_admission.pick_victim(connections)
+        if victim is None:
+            break
+        remove_connection(victim, "evicted")
+
+def expire_idle_connections(budget=1000):
+    """Expire at most budget due flows under one short lock hold; returns the count"""
+    with connection_lock:
+        expired = flow_expiry.expire(connections, time.time(), budget)
+        for conn_id, _ in expired:
+            remove_connection(conn_id, "expired")
+    return len(expired)
+
+def run_cleanup_thread(cleanup_interval=1.0, slice_budget=1000):
+    """Run a background thread that expires idle connections incrementally"""
     def cleanup_thread():
         while True:
-            removed = cleanup_old_connections()
-            if removed > 0:
-                print(f"Removed {removed} old connections")
+            removed = 0
+            # Work in small slices, releasing the lock between them
+            while True:
+                count = expire_idle_connections(slice_budget)
+                removed += count
+                if count < slice_budget or not flow_expiry.has_due(time.time()):
+                    break
+                time.sleep(0)
+            if removed > 0 and DEBUG:
+                print(f"Expired {removed} idle connections")
+            if pcap_ring is not None:
+                # Keep recorded packets extractable even when traffic stops
+                pcap_ring.flush()
             time.sleep(cleanup_interval)
     
     thread = threading.Thread(target=cleanup_thread)
     thread.daemon = True
     thread.start()
 
+def get_stats():
+    """Diagnostics for /stats (merged over all workers when sharded)"""
+    if shard_coordinator is not None:
+        stats = shard_coordinator.stats()
+    else:
+        stats = local_stats()
+    stats["snapshot"] = snapshot_publisher.get_stats() if snapshot_publisher else None
+    return stats
+
+def local_stats():
+    """This process's own counters"""
+    return {
+        "connections": len(connections),
+        "packets": packet_stats,
+        "dns_resolver": dns_resolver.get_stats(),
+        "capture_ring": capture_ring.get_stats() if capture_ring else None,
+        "pipeline": capture_pipeline.get_stats() if capture_pipeline else None,
+        "dns_cache": dns_cache.get_stats(),
+        "passive_dns": passive_dns.get_stats(),
+        "expiry": flow_expiry.get_stats(),
+        "admission": flow_admission.get_stats(),
+        "index": flow_index.get_stats(),
+        "top": top_talkers.get_stats(),
+        "timeseries": timeseries.get_stats(),
+        "history": flow_history.get_stats() if flow_history else None,
+        "pcap_ring": pcap_ring.get_stats() if pcap_ring else None,
+        "removals": dict(flow_removals),
+        "flow_version": flow_version,
+        "tombstones": len(flow_tombstones),
+        "stream_clients": stream_clients
+    }
+
+# Entries per dimension each worker reports for the merged /top
+SHARD_TOP_K = 50
+
+def shard_snapshot(shard, final=False):
+    """This process's flow table and stats, for the coordinator"""
+    with connection_lock:
+        version = flow_version
+        conn_list = [conn.to_dict() for conn in connections.values()]
+    return {
+        "shard": shard,
+        "version": version,
+        "time": time.time(),
+        "connections": conn_list,
+        "stats": local_stats(),
+        "top": json.loads(get_top(SHARD_TOP_K)),
+        "final": final
+    }
+
+def configure_dns(workers=4, cache_size=10000, ttl=3600, negative_ttl=300, cache_file=None):
+    """Replace the DNS cache and resolver pool, loading the cache from cache_file"""
+    global dns_cache, dns_resolver
+    dns_cache = DNSCache(cache_size, ttl, negative_ttl)
+    if cache_file:
+        loaded = dns_cache.load(cache_file)
+        print(f"Loaded {loaded} DNS cache entries from {cache_file}")
+    dns_resolver = DNSResolver(workers=workers, cache=dns_cache)
+    dns_resolver.start()
+
+def write_dns_cache(path, merge=False):
+    """Save the DNS cache to path, if set.
+
+    With merge, entries other processes saved there are folded in first,
+    under a lock file, so --workers processes do not overwrite each other.
+    """
+    if not path:
+        return
+    try:
+        if merge:
+            with open(f"{path}.lock", 'w') as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                dns_cache.load(path, merge=True)
+                saved = dns_cache.save(path)
+        else:
+            saved = dns_cache.save(path)
+        print(f"Saved {saved} DNS cache entries to {path}")
+    except OSError as e:
+        print(f"Failed to save DNS cache: {str(e)}")
+
+def configure_expiry(timeouts):
+    """Replace the expiry scheduler with one using the given per-protocol and TCP-state timeouts"""
+    global flow_expiry
+    with connection_lock:
+        flow_expiry = FlowExpiry(timeouts)
+        for conn_id, conn in connections.items():
+            flow_expiry.schedule(conn_id, conn)
+
+def configure_admission(max_flows, memory_mb=None, rate=100, burst=500):
+    """Replace the flow table budget and per-source rate limit"""
+    global flow_admission
+    with connection_lock:
+        flow_admission = FlowAdmission.from_budget(max_flows, memory_mb, rate=rate, burst=burst)
+    print(f"Flow table budget: {flow_admission.max_flows} flows")
+
+def run_shard_worker(shard, options, snapshot_queue):
+    """Entry point of one --workers capture process.
+
+    Joins the PACKET_FANOUT group so the kernel delivers whole flows to this
+    worker, keeps its own flow table, and publishes snapshots to the
+    coordinator every options["snapshot_interval"] seconds.
+    """
+    global DEBUG
+    DEBUG = False
+    # The coordinator stops workers with SIGTERM, also on Ctrl+C, so a
+    # terminal's SIGINT to the whole group cannot interrupt the shutdown
+    stop = threading.Event()
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda sig, frame: stop.set())
+    # Everything is configured before the first packet arrives
+    configure_dns(**options["dns"])
+    configure_expiry(options["timeouts"])
+    configure_admission(**options["admission"])
+    if options["history"]:
+        configure_history(**options["history"])
+    if options["pcap_ring"]:
+        # One ring per worker, so each process owns its segments
+        ring = options["pcap_ring"]
+        configure_pcap_ring(os.path.join(ring["directory"], f"shard-{shard}"),
+                            ring["budget_mb"], ring["segment_mb"])
+    capture_thread = start_capture(
+        options["interface"], options["time"], "tpacket", options["filter"],
+        batch_size=options["batch_size"],
+        batch_interval=options["batch_interval"],
+        queue_size=options["queue_size"],
+        fanout_group=options["fanout_group"]
+    )
+    run_cleanup_thread()
+    while capture_thread.is_alive() and not stop.wait(options["snapshot_interval"]):
+        snapshot_queue.put(shard_snapshot(shard))
+    write_dns_cache(options["dns"]["cache_file"], merge=True)
+    close_history()
+    close_pcap_ring()
+    snapshot_queue.put(shard_snapshot(shard, final=True))
+
 def main():
     parser = argparse.ArgumentParser(description='Capture and analyze network traffic')
     parser.add_argument('--interface', '-i', help='Network interface to capture')
@@ -399,68 +1198,332 @@ def main():
     parser.add_argument('--time', '-t', type=int, help='Capture duration in seconds')
     parser.add_argument('--serve', '-s', action='store_true', help='Run HTTP server for realtime data')
     parser.add_argument('--port', '-p', type=int, default=8000, help='HTTP server port (default: 8000)')
+    parser.add_argument('--bind', help='HTTP server address (default: all interfaces, or 127.0.0.1 with --pcap-ring)')
     parser.add_argument('--simulate', action='store_true', help='Generate simulated traffic for testing')
     parser.add_argument('--debug', action='store_true', help='Enable debug mode')
+    parser.add_argument('--backend', choices=['scapy', 'tpacket'], default='scapy',
+                        help='Capture backend: scapy (default, portable) or tpacket (Linux mmap ring)')
+    parser.add_argument('--filter', '-f', default=DEFAULT_BPF_FILTER,
+                        help='BPF capture filter in tcpdump syntax, applied in the kernel '
+                             '(default: IP TCP/UDP/ICMP only; pass "" to capture everything)')
+    parser.add_argument('--batch-size', type=int, default=512, help='Packets applied to the flow table per batch (default: 512)')
+    parser.add_argument('--batch-interval', type=int, default=50, help='Maximum milliseconds before a partial batch is applied (default: 50)')
+    parser.add_argument('--queue-size', type=int, default=65536, help='Frames buffered between capture and aggregation before dropping (default: 65536)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Capture processes sharing the interface via PACKET_FANOUT (Linux, tpacket backend; default: 1)')
+    parser.add_argument('--tcp-timeout', type=int, default=900, help='Seconds before an idle TCP flow expires (default: 900)')
+    parser.add_argument('--udp-timeout', type=int, default=120, help='Seconds before an idle UDP flow expires (default: 120)')
+    parser.add_argument('--icmp-timeout', type=int, default=30, help='Seconds before an idle ICMP flow expires (default: 30)')
+    parser.add_argument('--tcp-linger', type=int, default=10, help='Seconds a TCP flow is kept after FIN/RST (default: 10)')
+    parser.add_argument('--syn-timeout', type=int, default=20, help='Seconds before a TCP flow with an unanswered handshake expires (default: 20)')
+    parser.add_argument('--snapshot-interval', type=float, default=1.0,
+                        help='Seconds between rebuilds of the served /connections snapshot, and between --workers snapshots (default: 1.0)')
+    parser.add_argument('--http-workers', type=int, default=32,
+                        help='HTTP worker threads; half may be used by /stream clients (default: 32)')
+    parser.add_argument('--stream-interval', type=float, default=1.0,
+                        help='Seconds between updates pushed to /stream clients (default: 1.0)')
+    parser.add_argument('--max-flows', type=int, default=200000, help='Maximum connections kept; least recently seen small flows are evicted beyond it (default: 200000)')
+    parser.add_argument('--flow-memory-mb', type=float, help='Cap the connection table at roughly this much memory (MiB)')
+    parser.add_argument('--source-flow-rate', type=float, default=100,
+                        help='New flows per second a single source may open before the rest are aggregated (default: 100, 0 disables)')
+    parser.add_argument('--source-flow-burst', type=int, default=500, help='Burst of new flows allowed per source (default: 500)')
+    parser.add_argument('--history-db', help='Record expired and checkpointed flows in this SQLite database')
+    parser.add_argument('--history-checkpoint', type=int, default=60,
+                        help='Seconds between checkpoints of live flows to the history database (default: 60)')
+    parser.add_argument('--pcap-ring', help='Record full packets to a ring of pcapng segments in this directory')
+    parser.add_argument('--pcap-ring-mb', type=float, default=1024,
+                        help='Disk budget of the pcapng ring; the oldest segments are deleted beyond it (default: 1024)')
+    parser.add_argument('--pcap-segment-mb', type=float, default=64, help='Size of each pcapng ring segment (default: 64)')
+    parser.add_argument('--expose-pcap', action='store_true',
+                        help='Serve /pcap (raw captured packets) when --bind is not a loopback address')
+    parser.add_argument('--dns-workers', type=int, default=4, help='Background reverse DNS threads (default: 4)')
+    parser.add_argument('--dns-cache-size', type=int, default=10000, help='Maximum cached DNS entries (default: 10000)')
+    parser.add_argument('--dns-ttl', type=int, default=3600, help='Seconds to cache resolved names (default: 3600)')
+    parser.add_argument('--dns-negative-ttl', type=int, default=300, help='Seconds to cache failed lookups (default: 300)')
+    parser.add_argument('--dns-cache-file', help='Persist the DNS cache to this file across restarts')
     args = parser.parse_args()
     
-    global DEBUG
+    global DEBUG, shard_coordinator, snapshot_publisher
     DEBUG = args.debug
+    timeouts = {
+        "TCP": args.tcp_timeout,
+        "UDP": args.udp_timeout,
+        "ICMP": args.icmp_timeout,
+        "TCP_CLOSED": args.tcp_linger,
+        "TCP_HALF_OPEN": args.syn_timeout
+    }
+    configure_expiry(timeouts)
+    admission = {
+        "max_flows": args.max_flows,
+        "memory_mb": args.flow_memory_mb,
+        "rate": args.source_flow_rate,
+        "burst": args.source_flow_burst
+    }
+    configure_admission(**admission)
+    dns = {
+        "workers": args.dns_workers,
+        "cache_size": args.dns_cache_size,
+        "ttl": args.dns_ttl,
+        "negative_ttl": args.dns_negative_ttl,
+        "cache_file": args.dns_cache_file
+    }
+    configure_dns(**dns)
+
+    def save_dns_cache():
+        # Workers save to the same file, so merge with what they wrote
+        write_dns_cache(args.dns_cache_file, merge=args.workers > 1)
     
     print("Starting network traffic capture...")
     
-    # Handle Ctrl+C
+    # Handle Ctrl+C and termination
     def signal_handler(sig, frame):
         print("\nStopping capture...")
+        if shard_coordinator is not None:
+            # Let the workers checkpoint and close before they are killed at exit
+            shard_coordinator.stop()
         if args.output:
             with open(args.output, 'w') as f:
                 f.write(get_connections_json())
-            print(f"Saved {len(connections)} connections to {args.output}")
+            print(f"Saved {get_stats()['connections']} connections to {args.output}")
+        save_dns_cache()
+        close_history()
+        close_pcap_ring()
         sys.exit(0)
     
     signal.signal(signal.SIGINT, signal_handler)
+    # The desktop app stops the backend with kill(), i.e. SIGTERM
+    signal.signal(signal.SIGTERM, signal_handler)
     
+    history = None
+    if args.history_db:
+        history = {"path": args.history_db, "checkpoint_interval": args.history_checkpoint}
+        if args.workers <= 1 or args.simulate:
+            configure_history(**history)
+
+    pcap = None
+    if args.pcap_ring:
+        pcap = {"directory": args.pcap_ring, "budget_mb": args.pcap_ring_mb, "segment_mb": args.pcap_segment_mb}
+        if args.workers <= 1 and not args.simulate:
+            configure_pcap_ring(**pcap)
+
     # Use simulated traffic if requested
     if args.simulate:
         generate_simulated_traffic()
+    elif args.workers > 1:
+        # One flow table per worker process; this process only merges and serves
+        shard_coordinator = ShardCoordinator(run_shard_worker, args.workers, {
+            "interface": args.interface,
+            "time": args.time,
+            "filter": args.filter,
+            "batch_size": args.batch_size,
+            "batch_interval": args.batch_interval / 1000.0,
+            "queue_size": args.queue_size,
+            "fanout_group": os.getpid() & 0xFFFF,
+            "timeouts": timeouts,
+            "dns": dns,
+            # Each worker gets an equal share of the flow table budget
+            "admission": dict(
+                admission,
+                max_flows=max(args.max_flows // args.workers, 1),
+                memory_mb=args.flow_memory_mb / args.workers if args.flow_memory_mb else None
+            ),
+            # Workers write to the same database; WAL serializes their batches
+            "history": history,
+            # Workers share the ring budget equally
+            "pcap_ring": dict(pcap, budget_mb=pcap["budget_mb"] / args.workers) if pcap else None,
+            "snapshot_interval": args.snapshot_interval
+        }).start()
     else:
         # Start capture thread
-        capture_thread = start_capture(args.interface, args.time)
+        capture_thread = start_capture(
+            args.interface, args.time, args.backend, args.filter,
+            batch_size=args.batch_size,
+            batch_interval=args.batch_interval / 1000.0,
+            queue_size=args.queue_size
+        )
     
-    # Start cleanup thread
-    run_cleanup_thread()
+    # Start cleanup thread (workers clean their own tables)
+    if shard_coordinator is None:
+        run_cleanup_thread()
     
     if args.serve:
+        # Handlers serve the latest published snapshot and never take connection_lock
+        snapshot_publisher = SnapshotPublisher(
+            get_connections_json, args.snapshot_interval, source_version=connections_version
+        ).start()
+
         # Simple HTTP server for debugging
-        from http.server import HTTPServer, BaseHTTPRequestHandler
+        max_streams = max(args.http_workers // 2, 1)
+
+        # /pcap hands out full packet payloads, unauthenticated: by default
+        # a server recording them listens on loopback only
+        bind = args.bind or ('127.0.0.1' if args.pcap_ring else '0.0.0.0')
+        try:
+            loopback = ipaddress.ip_address(bind).is_loopback
+        except ValueError:
+            loopback = bind == 'localhost'
+        serve_pcap = args.expose_pcap or loopback
+
+        # With --workers the database is written by the workers: query it read-only from here
+        history_store = flow_history or (FlowHistory(history["path"]) if history else None)
         
-        class SimpleHandler(BaseHTTPRequestHandler):
+        class SimpleHandler(JsonRequestHandler):
             def do_GET(self):
-                if self.path == '/connections':
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+                if url.path == '/connections' and 'since' in query:
+                    # Delta mode: only flows changed since the client's cursor
+                    try:
+                        since = int(query['since'][0])
+                    except ValueError:
+                        self.send_empty(400)
+                        return
+                    self.send_body(get_connections_delta(since).encode())
+                elif url.path == '/connections' and FlowQuery.requested(query):
+                    # ?protocol=&service=&ip=&port=&min_bytes=&active=&sort=&order=&limit=&offset=
+                    try:
+                        body = query_connections(query)
+                    except ValueError as e:
+                        self.send_response(400)
+                        self.send_header('Content-Type', 'text/plain')
+                        self.send_header('Content-Length', str(len(str(e).encode())))
+                        self.end_headers()
+                        self.wfile.write(str(e).encode())
+                        return
+                    self.send_body(body.encode())
+                elif url.path == '/connections':
+                    # If no connections and debug mode, generate simulated ones
+                    if len(connections) == 0 and DEBUG and shard_coordinator is None:
+                        generate_simulated_traffic()
+                        snapshot_publisher.publish()
+
+                    # Unchanged snapshots get a 304 via If-None-Match
+                    snapshot = snapshot_publisher.current
+                    self.send_body(snapshot.body, etag=snapshot.etag, encoded={
+                        'gzip': snapshot.gzip_body,
+                        'deflate': snapshot.deflate_body
+                    })
+                elif url.path == '/stream':
+                    # Server-Sent Events; ?since= resumes from a cursor, ?interval= overrides the rate
+                    try:
+                        since = int(query.get('since', ['0'])[0])
+                        interval = max(float(query.get('interval', [args.stream_interval])[0]), 0.1)
+                    except ValueError:
+                        self.send_empty(400)
+                        return
+                    if stream_clients >= max_streams:
+                        # Keep half the worker pool for ordinary requests
+                        self.send_empty(503)
+                        return
                     self.send_response(200)
-                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Type', 'text/event-stream')
+                    self.send_header('Cache-Control', 'no-cache')
                     self.send_header('Access-Control-Allow-Origin', '*')
+                    self.send_header('Connection', 'close')
                     self.end_headers()
-                    
-                    # If no connections and debug mode, generate simulated ones
-                    if len(connections) == 0 and DEBUG:
-                        generate_simulated_traffic()
-                    
-                    self.wfile.write(get_connections_json().encode())
-                elif self.path == '/stats':
-                    # Add a stats endpoint for diagnostics
+                    # A client that stops reading for this long is dropped
+                    self.connection.settimeout(30)
+                    self.close_connection = True
+                    stream_updates(self.wfile, interval, since)
+                elif url.path == '/top':
+                    # ?k=10&by=flows,sources,destinations,services
+                    try:
+                        k = min(int(query.get('k', ['10'])[0]), 256)
+                        dimensions = query['by'][0].split(',') if 'by' in query else None
+                        if dimensions and not set(dimensions) <= set(TopTalkers.DIMENSIONS):
+                            raise ValueError(dimensions)
+                    except ValueError:
+                        self.send_empty(400)
+                        return
+                    self.send_body(get_top(k, dimensions).encode())
+                elif url.path == '/timeseries':
+                    # ?key=global&resolution=1s|1m|1h&start=&end= (epoch seconds); ?keys lists the series
+                    if shard_coordinator is not None:
+                        # History lives in the worker processes
+                        self.send_empty(501)
+                        return
+                    # parse_qs drops blank values, so a bare ?keys is only seen with keep_blank_values
+                    if 'keys' in parse_qs(url.query, keep_blank_values=True):
+                        self.send_body(json.dumps({
+                            "keys": timeseries.keys(),
+                            "resolutions": [name for name, _, _ in RESOLUTIONS]
+                        }).encode())
+                        return
+                    try:
+                        body = get_timeseries(
+                            query.get('key', ['global'])[0],
+                            query.get('resolution', ['1s'])[0],
+                            float(query['start'][0]) if 'start' in query else None,
+                            float(query['end'][0]) if 'end' in query else None
+                        )
+                    except ValueError:
+                        self.send_empty(400)
+                        return
+                    if body is None:
+                        self.send_empty(404)
+                        return
+                    self.send_body(body.encode())
+                elif url.path == '/history':
+                    # ?start=&end= (epoch seconds) &ip=&service=&protocol=&limit=&offset=
+                    if history_store is None:
+                        self.send_empty(404)
+                        return
+                    try:
+                        rows = history_store.query(
+                            start=float(query['start'][0]) if 'start' in query else None,
+                            end=float(query['end'][0]) if 'end' in query else None,
+                            ip=query.get('ip', [None])[0],
+                            service=query.get('service', [None])[0],
+                            protocol=query.get('protocol', [None])[0],
+                            limit=min(int(query.get('limit', ['100'])[0]), 10000),
+                            offset=int(query.get('offset', ['0'])[0])
+                        )
+                    except ValueError:
+                        self.send_empty(400)
+                        return
+                    except sqlite3.Error:
+                        # No worker has created the database yet
+                        self.send_empty(503)
+                        return
+                    self.send_body(json.dumps(rows).encode())
+                elif url.path == '/pcap':
+                    # ?id=<flow id from /connections>&start=&end= (epoch seconds): the flow's packets as pcapng
+                    if not args.pcap_ring:
+                        self.send_empty(404)
+                        return
+                    if not serve_pcap:
+                        # Raw packets are not served beyond this host without --expose-pcap
+                        self.send_empty(403)
+                        return
+                    try:
+                        flow = int(query['id'][0])
+                        start = float(query['start'][0]) if 'start' in query else None
+                        end = float(query['end'][0]) if 'end' in query else None
+                    except (KeyError, ValueError):
+                        self.send_empty(400)
+                        return
+                    if pcap_ring is not None:
+                        pcap_ring.flush()
+                    locations = locate(args.pcap_ring, flow, start, end)
+                    if not locations:
+                        self.send_empty(404)
+                        return
+                    # Copied straight from the segments; no length known up front
                     self.send_response(200)
-                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Type', 'application/x-pcapng')
+                    self.send_header('Content-Disposition', f'attachment; filename="flow-{flow}.pcapng"')
                     self.send_header('Access-Control-Allow-Origin', '*')
+                    self.send_header('Connection', 'close')
                     self.end_headers()
-                    
-                    stats = {
-                        "connections": len(connections),
-                        "packets": packet_stats
-                    }
-                    self.wfile.write(json.dumps(stats).encode())
+                    self.close_connection = True
+                    extract(args.pcap_ring, flow, self.wfile, start, end, locations)
+                elif url.path == '/stats':
+                    # Add a stats endpoint for diagnostics
+                    stats = get_stats()
+                    stats['http'] = server.get_stats()
+                    self.send_body(json.dumps(stats).encode())
                 else:
-                    self.send_response(404)
-                    self.end_headers()
+                    self.send_empty(404)
                     
             def log_message(self, format, *args):
                 # Suppress excessive logging for cleaner output
@@ -468,9 +1531,10 @@ def main():
                     super().log_message(format, *args)
         
         try:
-            # Use 0.0.0.0 to listen on all interfaces (both IPv4 and IPv6)
-            server = HTTPServer(('0.0.0.0', args.port), SimpleHandler)
+            # A fixed pool of workers serves keep-alive clients concurrently
+            server = PooledHTTPServer((bind, args.port), SimpleHandler, workers=args.http_workers)
             print(f"HTTP server started at http://localhost:{args.port}/connections")
+            print(f"Live updates (Server-Sent Events) at http://localhost:{args.port}/stream")
             print(f"Diagnostic stats available at http://localhost:{args.port}/stats")
             server.serve_forever()
         except Exception as e:
@@ -478,16 +1542,21 @@ def main():
             sys.exit(1)
     else:
         # Wait for capture to complete
-        if not args.simulate:
+        if shard_coordinator is not None:
+            shard_coordinator.join()
+        elif not args.simulate:
             capture_thread.join()
         
         # Save output if specified
         if args.output:
             with open(args.output, 'w') as f:
                 f.write(get_connections_json())
-            print(f"Saved {len(connections)} connections to {args.output}")
+            print(f"Saved {get_stats()['connections']} connections to {args.output}")
         else:
             print(get_connections_json())
+        save_dns_cache()
+        close_history()
+        close_pcap_ring()
 
 if __name__ == "__main__":
     main()
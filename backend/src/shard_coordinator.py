@@ -0,0 +1,158 @@
+import multiprocessing
+import threading
+import time
+
+
+class ShardCoordinator:
+    """Runs capture worker processes and merges their flow table snapshots.
+
+    Each worker owns a disjoint set of flows (the kernel's PACKET_FANOUT
+    hash sends every packet of a flow to the same socket) and periodically
+    puts a snapshot dict on a shared queue:
+
+        {"shard": n, "version": v, "connections": [...], "stats": {...}, "final": bool}
+
+    The coordinator keeps the latest snapshot per shard and merges them on
+    request. version counts snapshots whose flow table changed (a worker's
+    v moved), so unchanged merges can be skipped.
+    """
+
+    def __init__(self, worker_target, worker_count, options):
+        self.worker_target = worker_target
+        self.worker_count = worker_count
+        self.options = options
+        self.processes = []
+        self._snapshots = {}
+        self._finished = set()
+        self._lock = threading.Lock()
+        self.version = 0
+        self._queue = None
+
+    def start(self):
+        # spawn, not fork: the parent already runs resolver and HTTP threads
+        context = multiprocessing.get_context("spawn")
+        self._queue = context.Queue()
+        for shard in range(self.worker_count):
+            process = context.Process(
+                target=self.worker_target,
+                args=(shard, self.options, self._queue),
+                name=f"capture-shard-{shard}"
+            )
+            process.daemon = True
+            process.start()
+            self.processes.append(process)
+
+        reader = threading.Thread(target=self._collect, name="shard-collector")
+        reader.daemon = True
+        reader.start()
+        print(f"Started {self.worker_count} capture workers in fanout group {self.options['fanout_group']}")
+        return self
+
+    def _collect(self):
+        while True:
+            snapshot = self._queue.get()
+            with self._lock:
+                previous = self._snapshots.get(snapshot["shard"])
+                if previous is None or previous["version"] != snapshot["version"]:
+                    self.version += 1
+                self._snapshots[snapshot["shard"]] = snapshot
+                if snapshot.get("final"):
+                    self._finished.add(snapshot["shard"])
+
+    def join(self, timeout=10):
+        """Wait for all workers to exit and for their final snapshots"""
+        for process in self.processes:
+            process.join()
+        self._wait_finished(time.time() + timeout)
+
+    def stop(self, timeout=10):
+        """Ask the workers to finish (SIGTERM) and wait up to timeout for them.
+
+        Workers are daemon processes: exiting without this kills them before
+        they checkpoint history, save the DNS cache and close their rings.
+        """
+        for process in self.processes:
+            if process.is_alive():
+                process.terminate()
+        deadline = time.time() + timeout
+        for process in self.processes:
+            process.join(max(deadline - time.time(), 0))
+        self._wait_finished(deadline)
+
+    def _wait_finished(self, deadline):
+        while time.time() < deadline:
+            with self._lock:
+                if len(self._finished) >= self.worker_count:
+                    return
+            time.sleep(0.1)
+
+    def connections(self):
+        """All shards' connections, most recently seen first"""
+        return self.connections_since(0)[1]
+
+    def connections_since(self, since):
+        """(version, connections), with connections None if nothing changed after version since"""
+        with self._lock:
+            version = self.version
+            if since > 0 and since == version:
+                return version, None
+            snapshots = list(self._snapshots.values())
+        merged = []
+        for snapshot in snapshots:
+            merged.extend(snapshot["connections"])
+        # lastSeen is a fixed-format ISO string, so it sorts chronologically
+        merged.sort(key=lambda conn: conn["lastSeen"], reverse=True)
+        return version, merged
+
+    def packet_stats(self):
+        """Packet counters summed over all shards"""
+        with self._lock:
+            snapshots = list(self._snapshots.values())
+        totals = {}
+        for snapshot in snapshots:
+            for key, value in snapshot["stats"]["packets"].items():
+                if key == "last_packet_time":
+                    if value is not None and (totals.get(key) is None or value > totals[key]):
+                        totals[key] = value
+                    else:
+                        totals.setdefault(key, None)
+                else:
+                    totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def top(self, k=10, dimensions=None):
+        """Top-k per dimension, summing each key's rates over the shards"""
+        with self._lock:
+            snapshots = list(self._snapshots.values())
+        merged = {}
+        for snapshot in snapshots:
+            for name, entries in snapshot.get("top", {}).items():
+                if dimensions and name not in dimensions:
+                    continue
+                totals = merged.setdefault(name, {})
+                for entry in entries:
+                    total = totals.get(entry["key"])
+                    if total is None:
+                        totals[entry["key"]] = dict(entry)
+                    else:
+                        for field in ("bytesPerSec", "packetsPerSec", "error"):
+                            total[field] += entry[field]
+        return {
+            name: sorted(totals.values(), key=lambda entry: entry["bytesPerSec"], reverse=True)[:k]
+            for name, totals in merged.items()
+        }
+
+    def stats(self):
+        """Merged totals plus each shard's own stats"""
+        with self._lock:
+            snapshots = sorted(self._snapshots.values(), key=lambda snapshot: snapshot["shard"])
+        return {
+            "connections": sum(snapshot["stats"]["connections"] for snapshot in snapshots),
+            "packets": self.packet_stats(),
+            "workers": self.worker_count,
+            "workers_alive": sum(1 for process in self.processes if process.is_alive()),
+            "shards": [
+                dict(snapshot["stats"], shard=snapshot["shard"], snapshot_time=snapshot["time"])
+                for snapshot in snapshots
+            ]
+        }
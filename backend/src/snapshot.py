@@ -0,0 +1,121 @@
+import struct
+import threading
+import time
+import zlib
+from collections import namedtuple
+
+from api_server import make_etag
+
+# One published /connections response. Never mutated after publication.
+Snapshot = namedtuple("Snapshot", ["body", "gzip_body", "deflate_body", "etag", "version", "built_at"])
+
+GZIP_HEADER = b"\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff"
+
+
+def compress_once(body, level):
+    """Return (gzip, zlib) encodings of body from a single deflate pass"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    deflated = compressor.compress(body) + compressor.flush()
+    gzip_body = GZIP_HEADER + deflated + struct.pack("<II", zlib.crc32(body), len(body) & 0xFFFFFFFF)
+    zlib_header = b"\x78\x01" if level <= 1 else b"\x78\x5e" if level <= 5 else b"\x78\x9c" if level == 6 else b"\x78\xda"
+    deflate_body = zlib_header + deflated + struct.pack(">I", zlib.adler32(body))
+    return gzip_body, deflate_body
+
+
+class SnapshotPublisher:
+    """Rebuilds a serialized snapshot at a fixed cadence for lock-free reads.
+
+    build() returns the response text; it runs on the publisher thread
+    only, so HTTP handlers never touch the flow table. Each build produces
+    a new immutable Snapshot (plain, gzip and deflate bytes plus an ETag) that
+    replaces the previous one with a single reference assignment: readers
+    hold whichever snapshot they fetched until they are done with it.
+
+    source_version, if given, returns a value that changes whenever build()
+    would return something new; while it stays the same the current
+    snapshot, its bytes and its ETag are kept instead of being rebuilt.
+    """
+
+    def __init__(self, build, interval=1.0, compress_level=5, source_version=None):
+        self.build = build
+        self.interval = interval
+        self.compress_level = compress_level
+        self.source_version = source_version
+        self.current = None
+        self._version = 0
+        self._source_version = None
+        self._build_lock = threading.Lock()
+        self._wake = threading.Event()
+        self.stats = {
+            "snapshots": 0,
+            "unchanged": 0,
+            "errors": 0,
+            "last_build_ms": 0.0,
+            "max_build_ms": 0.0,
+            "total_build_ms": 0.0,
+            "bytes": 0,
+            "gzip_bytes": 0
+        }
+
+    def start(self):
+        self.publish()
+        thread = threading.Thread(target=self._run, name="snapshot-publisher")
+        thread.daemon = True
+        thread.start()
+        return self
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.publish()
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"Snapshot build error: {str(e)}")
+
+    def request_publish(self):
+        """Ask the publisher thread for an early rebuild"""
+        self._wake.set()
+
+    def publish(self):
+        """Build and publish a new snapshot now, unless the source is unchanged; returns the current one"""
+        with self._build_lock:
+            # Read before building: a change made during the build is picked up next time
+            source_version = self.source_version() if self.source_version is not None else None
+            if self.current is not None and source_version is not None and source_version == self._source_version:
+                self.stats["unchanged"] += 1
+                return self.current
+            start = time.perf_counter()
+            body = self.build().encode()
+            gzip_body, deflate_body = compress_once(body, self.compress_level)
+            self._version += 1
+            snapshot = Snapshot(
+                body=body,
+                gzip_body=gzip_body,
+                deflate_body=deflate_body,
+                etag=make_etag(body),
+                version=self._version,
+                built_at=time.time()
+            )
+            self.current = snapshot
+            self._source_version = source_version
+
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            stats = self.stats
+            stats["snapshots"] += 1
+            stats["last_build_ms"] = round(elapsed_ms, 2)
+            stats["max_build_ms"] = round(max(stats["max_build_ms"], elapsed_ms), 2)
+            stats["total_build_ms"] += elapsed_ms
+            stats["bytes"] = len(body)
+            stats["gzip_bytes"] = len(gzip_body)
+            return snapshot
+
+    def get_stats(self):
+        stats = dict(self.stats, interval=self.interval)
+        total_ms = stats.pop("total_build_ms")
+        stats["avg_build_ms"] = round(total_ms / stats["snapshots"], 2) if stats["snapshots"] else 0.0
+        current = self.current
+        stats["version"] = current.version if current else 0
+        stats["age"] = round(time.time() - current.built_at, 3) if current else None
+        return stats
@@ -0,0 +1,76 @@
+# TCP header flag bits
+TCP_FIN = 0x01
+TCP_SYN = 0x02
+TCP_RST = 0x04
+TCP_ACK = 0x10
+
+# Per-flow state bits, from the local side's point of view
+SYN_SENT = 0x01       # SYN seen from the local side
+SYN_RECEIVED = 0x02   # SYN seen from the remote side
+ESTABLISHED = 0x04    # Handshake completed, or flow picked up mid-stream
+FIN_SENT = 0x08
+FIN_RECEIVED = 0x10
+CLOSED = 0x20         # RST, or FIN seen in both directions
+OPENED_LOCALLY = 0x40   # The local side sent the first SYN
+OPENED_REMOTELY = 0x80  # The remote side sent the first SYN
+
+STATE_NEW = 0
+
+
+def advance(state, flags, is_outgoing):
+    """Return the flow state after a packet with the given TCP flags"""
+    if flags & TCP_RST:
+        return state | CLOSED
+
+    if flags & TCP_SYN:
+        if state & CLOSED:
+            # Port reuse: a new SYN starts a fresh connection
+            state = STATE_NEW
+        state |= SYN_SENT if is_outgoing else SYN_RECEIVED
+        if flags & TCP_ACK:
+            # A SYN-ACK answers the other side's SYN, even if we missed it
+            state |= SYN_RECEIVED if is_outgoing else SYN_SENT
+        if not state & (OPENED_LOCALLY | OPENED_REMOTELY):
+            # A bare SYN comes from the opener, a SYN-ACK from the other side
+            opened_here = is_outgoing != bool(flags & TCP_ACK)
+            state |= OPENED_LOCALLY if opened_here else OPENED_REMOTELY
+        return state
+
+    if not state & (SYN_SENT | SYN_RECEIVED):
+        # No handshake seen: we joined an existing connection
+        state |= ESTABLISHED
+    elif (flags & TCP_ACK and state & SYN_SENT and state & SYN_RECEIVED
+          and bool(state & OPENED_LOCALLY) == is_outgoing):
+        # The opener's ACK of the SYN-ACK completes the handshake; until
+        # then (e.g. a SYN flood answered with SYN-ACKs) the flow is half-open
+        state |= ESTABLISHED
+
+    if flags & TCP_FIN:
+        state |= FIN_SENT if is_outgoing else FIN_RECEIVED
+        if state & FIN_SENT and state & FIN_RECEIVED:
+            state |= CLOSED
+
+    return state
+
+
+def is_closed(state):
+    return bool(state & CLOSED)
+
+
+def is_half_open(state):
+    """A SYN was seen but the handshake never completed"""
+    return bool(state & (SYN_SENT | SYN_RECEIVED)) and not state & (ESTABLISHED | CLOSED)
+
+
+def state_name(state):
+    if state & CLOSED:
+        return "CLOSED"
+    if state & (FIN_SENT | FIN_RECEIVED):
+        return "CLOSING"
+    if state & ESTABLISHED:
+        return "ESTABLISHED"
+    if state & OPENED_LOCALLY:
+        return "SYN_SENT"
+    if state & OPENED_REMOTELY:
+        return "SYN_RECEIVED"
+    return "NEW"
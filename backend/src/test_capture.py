@@ -6,6 +6,8 @@ import time
 import re
 import winreg
 
+from fast_parser import DEFAULT_BPF_FILTER
+
 def get_friendly_name(adapter_guid):
     """Get friendly name for a network adapter from Windows Registry"""
     try:
@@ -153,7 +155,7 @@ def get_protocol_name(proto):
     }
     return protocols.get(proto, str(proto))
 
-def capture_test(packet_count=5, interface=None):
+def capture_test(packet_count=5, interface=None, bpf_filter=DEFAULT_BPF_FILTER):
     """Capture and display network packets"""
     print_header()
     
@@ -163,6 +165,7 @@ def capture_test(packet_count=5, interface=None):
     print(f"\nStarting capture...")
     print(f"Interface: {interface or 'default'}")
     print(f"Packet count: {packet_count}")
+    print(f"Filter: {bpf_filter or 'none'}")
     print("-"*70)
     
     packets_captured = 0
@@ -191,6 +194,7 @@ def capture_test(packet_count=5, interface=None):
             count=packet_count,
             timeout=10,  # Shorter timeout
             iface=interface,
+            filter=bpf_filter or None,  # Compiled and attached in the kernel
             store=False  # Don't store packets in memory
         )
         
@@ -222,9 +226,11 @@ if __name__ == "__main__":
     parser.add_argument("--count", type=int, default=5, help="Number of packets to capture")
     parser.add_argument("--interface", type=str, help="Network interface to capture from")
     parser.add_argument("--list-interfaces", action="store_true", help="List available interfaces")
+    parser.add_argument("--filter", type=str, default=DEFAULT_BPF_FILTER,
+                        help='BPF capture filter in tcpdump syntax (pass "" to capture everything)')
     args = parser.parse_args()
     
     if args.list_interfaces:
         get_available_interfaces()
     else:
-        capture_test(args.count, args.interface)
+        capture_test(args.count, args.interface, args.filter)
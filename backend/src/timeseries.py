@@ -0,0 +1,162 @@
+import threading
+from array import array
+from collections import OrderedDict
+
+# (name, seconds per slot, slots kept): 5 minutes of seconds, a day of
+# minutes and 30 days of hours
+RESOLUTIONS = (
+    ("1s", 1, 300),
+    ("1m", 60, 1440),
+    ("1h", 3600, 720)
+)
+
+
+class Ring:
+    """Fixed-size ring of (bytes, packets) counters, one slot per step seconds.
+
+    Each slot remembers which time slot it holds, so slots left over from
+    an earlier lap read as zero and gaps in traffic need no catch-up work.
+    """
+
+    __slots__ = ("step", "size", "values", "slots")
+
+    def __init__(self, step, size):
+        self.step = step
+        self.size = size
+        self.values = array("d", [0.0]) * (size * 2)
+        self.slots = array("q", [-1]) * size
+
+    def add(self, timestamp, byte_count, packet_count):
+        slot = int(timestamp // self.step)
+        index = slot % self.size
+        if self.slots[index] != slot:
+            self.slots[index] = slot
+            self.values[index * 2] = 0.0
+            self.values[index * 2 + 1] = 0.0
+        self.values[index * 2] += byte_count
+        self.values[index * 2 + 1] += packet_count
+
+    def read(self, start, end):
+        """[[slot_start_time, bytes, packets], ...] for slots overlapping [start, end]"""
+        last = int(end // self.step)
+        first = max(int(start // self.step), last - self.size + 1)
+        points = []
+        for slot in range(first, last + 1):
+            index = slot % self.size
+            if self.slots[index] == slot:
+                points.append([slot * self.step, self.values[index * 2], self.values[index * 2 + 1]])
+            else:
+                points.append([slot * self.step, 0.0, 0.0])
+        return points
+
+
+class Series:
+    """One key's counters at every resolution"""
+
+    __slots__ = ("rings",)
+
+    def __init__(self):
+        self.rings = {name: Ring(step, size) for name, step, size in RESOLUTIONS}
+
+    def add(self, timestamp, byte_count, packet_count):
+        for ring in self.rings.values():
+            ring.add(timestamp, byte_count, packet_count)
+
+
+class TimeSeriesStore:
+    """RRD-style bandwidth history: global and per service, protocol and remote host.
+
+    Packets are summed per key for the current second; when a packet from
+    a later second arrives the finished second is written into every
+    resolution's ring (the coarser rings accumulate it, which is the
+    downsampling). Memory per key is fixed, and host keys are capped at
+    max_hosts with the least recently active host dropped first, so the
+    store stays the same size however long it runs.
+    """
+
+    def __init__(self, max_hosts=256):
+        self.max_hosts = max_hosts
+        self._series = {}
+        self._hosts = OrderedDict()
+        self._pending = {}
+        self._pending_second = None
+        self._lock = threading.Lock()
+        self.stats = {"flushes": 0, "hosts_dropped": 0}
+
+    def record(self, timestamp, byte_count, service, protocol, remote_ip):
+        """Count one packet"""
+        second = int(timestamp)
+        with self._lock:
+            if second != self._pending_second:
+                self._flush()
+                self._pending_second = second
+            pending = self._pending
+            for key in ("global", "service:" + service, "protocol:" + protocol, "host:" + remote_ip):
+                counter = pending.get(key)
+                if counter is None:
+                    pending[key] = [byte_count, 1]
+                else:
+                    counter[0] += byte_count
+                    counter[1] += 1
+
+    def _flush(self):
+        """Write the pending second into the rings; caller holds the lock"""
+        if self._pending_second is None or not self._pending:
+            return
+        timestamp = self._pending_second
+        for key, (byte_count, packet_count) in self._pending.items():
+            self._get_series(key).add(timestamp, byte_count, packet_count)
+        self._pending = {}
+        self.stats["flushes"] += 1
+
+    def _get_series(self, key):
+        series = self._series.get(key)
+        if key.startswith("host:"):
+            if series is not None:
+                self._hosts.move_to_end(key)
+                return series
+            if len(self._hosts) >= self.max_hosts:
+                dropped, _ = self._hosts.popitem(last=False)
+                del self._series[dropped]
+                self.stats["hosts_dropped"] += 1
+            self._hosts[key] = True
+        if series is None:
+            series = self._series[key] = Series()
+        return series
+
+    def query(self, key="global", resolution="1s", start=None, end=None, now=None):
+        """Points for key between start and end (epoch seconds), oldest first.
+
+        Defaults to the whole retained window. Returns None for an unknown
+        key; raises ValueError for an unknown resolution.
+        """
+        steps = {name: (step, size) for name, step, size in RESOLUTIONS}
+        if resolution not in steps:
+            raise ValueError(f"unknown resolution {resolution}")
+        step, size = steps[resolution]
+
+        with self._lock:
+            if now is not None and self._pending_second is not None and self._pending_second < int(now):
+                # No packet has arrived since that second ended
+                self._flush()
+                self._pending_second = None
+            series = self._series.get(key)
+            if series is None:
+                return None
+            if end is None:
+                end = now if now is not None else self._latest(series.rings[resolution])
+            if start is None:
+                start = end - step * (size - 1)
+            return series.rings[resolution].read(start, end)
+
+    @staticmethod
+    def _latest(ring):
+        return max(ring.slots) * ring.step
+
+    def keys(self):
+        with self._lock:
+            return sorted(self._series)
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats, series=len(self._series), hosts=len(self._hosts), max_hosts=self.max_hosts)
@@ -0,0 +1,145 @@
+import heapq
+import math
+import time
+
+# Rescale forward-decayed counters before exp() gets anywhere near overflow
+RESCALE_AFTER = 60  # half-lives
+
+
+class DecayedSpaceSaving:
+    """Space-Saving heavy-hitter sketch with exponentially decaying counts.
+
+    Tracks at most capacity keys. Counts use forward decay: an item seen
+    at time t is added with weight 2^((t - landmark) / half_life), so old
+    traffic fades without touching every counter on each update, and the
+    value divided by the current weight is a decayed byte (or packet)
+    total. Dividing that by the mean lifetime gives a rate per second.
+
+    When the sketch is full, a new key replaces the key with the smallest
+    count and inherits that count as its error bound (standard
+    Space-Saving). The minimum is found through a heap holding one entry
+    per key; entries go stale as counts grow and are refreshed lazily.
+    """
+
+    def __init__(self, capacity=256, half_life=10.0):
+        self.capacity = capacity
+        self.half_life = half_life
+        self._lambda = math.log(2) / half_life
+        self._landmark = None
+        self._counts = {}  # key -> [bytes, packets, error_bytes]
+        self._heap = []    # (bytes, key) with one entry per tracked key
+        self._sorted = None
+        self._sorted_at = 0.0
+        self.replacements = 0
+
+    def _weight(self, now):
+        if self._landmark is None:
+            self._landmark = now
+        elif now - self._landmark > RESCALE_AFTER * self.half_life:
+            self._rescale(now)
+        return math.exp(self._lambda * (now - self._landmark))
+
+    def _rescale(self, now):
+        factor = math.exp(-self._lambda * (now - self._landmark))
+        for counter in self._counts.values():
+            counter[0] *= factor
+            counter[1] *= factor
+            counter[2] *= factor
+        self._heap = [(counter[0], key) for key, counter in self._counts.items()]
+        heapq.heapify(self._heap)
+        self._landmark = now
+
+    def add(self, key, size, now):
+        weight = self._weight(now)
+        counter = self._counts.get(key)
+        if counter is not None:
+            counter[0] += size * weight
+            counter[1] += weight
+            return
+
+        if len(self._counts) < self.capacity:
+            counter = [size * weight, weight, 0.0]
+        else:
+            victim_bytes = self._evict_min()
+            counter = [victim_bytes + size * weight, weight, victim_bytes]
+            self.replacements += 1
+        self._counts[key] = counter
+        heapq.heappush(self._heap, (counter[0], key))
+
+    def _evict_min(self):
+        heap = self._heap
+        while True:
+            count, key = heapq.heappop(heap)
+            counter = self._counts[key]
+            if counter[0] == count:
+                del self._counts[key]
+                return count
+            # Stale entry: the key has grown since it was pushed
+            heapq.heappush(heap, (counter[0], key))
+
+    def top(self, k, now=None, max_age=1.0):
+        """The k heaviest keys as (key, bytes_per_sec, packets_per_sec, error_bytes_per_sec).
+
+        The ranking is cached for max_age seconds, so a lookup is a slice
+        of at most k entries.
+        """
+        if now is None:
+            now = time.time()
+        if self._sorted is None or now - self._sorted_at > max_age:
+            self._sorted = sorted(self._counts.items(), key=lambda item: item[1][0], reverse=True)
+            self._sorted_at = now
+        if self._landmark is None:
+            return []
+
+        # Decayed total / mean lifetime = rate per second
+        scale = math.exp(-self._lambda * (now - self._landmark)) * self._lambda
+        return [
+            (key, counter[0] * scale, counter[1] * scale, counter[2] * scale)
+            for key, counter in self._sorted[:k]
+        ]
+
+    def __len__(self):
+        return len(self._counts)
+
+
+class TopTalkers:
+    """Heavy-hitter sketches per flow, source IP, destination IP and service"""
+
+    DIMENSIONS = ("flows", "sources", "destinations", "services")
+
+    def __init__(self, capacity=256, half_life=10.0):
+        self.half_life = half_life
+        self.sketches = {name: DecayedSpaceSaving(capacity, half_life) for name in self.DIMENSIONS}
+
+    def record(self, conn_id, src_ip, dst_ip, service, size, now):
+        """Account one packet; src_ip/dst_ip are the packet's, not the flow's"""
+        sketches = self.sketches
+        sketches["flows"].add(conn_id, size, now)
+        sketches["sources"].add(src_ip, size, now)
+        sketches["destinations"].add(dst_ip, size, now)
+        sketches["services"].add(service, size, now)
+
+    def top(self, k=10, dimensions=None, now=None):
+        """{dimension: [{"key", "bytesPerSec", "packetsPerSec", "error"}]}"""
+        result = {}
+        for name in dimensions or self.DIMENSIONS:
+            result[name] = [
+                {
+                    "key": key,
+                    "bytesPerSec": round(bytes_rate, 1),
+                    "packetsPerSec": round(packet_rate, 2),
+                    "error": round(error, 1)
+                }
+                for key, bytes_rate, packet_rate, error in self.sketches[name].top(k, now)
+            ]
+        return result
+
+    def get_stats(self):
+        return {
+            name: {
+                "tracked": len(sketch),
+                "capacity": sketch.capacity,
+                "replacements": sketch.replacements
+            }
+            for name, sketch in self.sketches.items()
+        }
@@ -0,0 +1,208 @@
+import mmap
+import select
+import socket
+import struct
+import time
+
+from fast_parser import LINKTYPE_ETHERNET, LINKTYPE_RAW
+
+# Linux <linux/if_packet.h> constants
+SOL_PACKET = 263
+PACKET_RX_RING = 5
+PACKET_STATISTICS = 6
+PACKET_ADD_MEMBERSHIP = 1
+PACKET_MR_PROMISC = 1
+PACKET_VERSION = 10
+PACKET_FANOUT = 18
+PACKET_FANOUT_HASH = 0
+PACKET_FANOUT_FLAG_DEFRAG = 0x8000
+TPACKET_V3 = 2
+ETH_P_ALL = 0x0003
+
+TP_STATUS_KERNEL = 0
+TP_STATUS_USER = 1
+
+# ARPHRD_* hardware types whose frames start with an Ethernet header
+ETHERNET_HATYPES = (1, 772)  # ARPHRD_ETHER, ARPHRD_LOOPBACK
+
+# struct tpacket_req3
+_tpacket_req3 = struct.Struct("IIIIIII")
+# struct tpacket_stats_v3
+_tpacket_stats_v3 = struct.Struct("III")
+# struct tpacket_block_desc: version, offset_to_priv, then tpacket_hdr_v1
+# (block_status, num_pkts, offset_to_first_pkt, ...)
+_block_status = struct.Struct("I")
+_block_header = struct.Struct("III")
+BLOCK_STATUS_OFFSET = 8
+# struct tpacket3_hdr: tp_next_offset, tp_sec, tp_nsec, tp_snaplen, tp_len,
+# tp_status, tp_mac, tp_net
+_frame_header = struct.Struct("IIIIIIHH")
+# sll_hatype inside the struct sockaddr_ll that follows the aligned tpacket3_hdr
+_sll_hatype = struct.Struct("H")
+SLL_HATYPE_OFFSET = 48 + 8
+
+
+def attach_bpf_filter(sock, bpf_filter, iface=None):
+    """Compile a tcpdump-syntax filter with libpcap and attach it to sock"""
+    from scapy.arch.linux import attach_filter
+    from scapy.config import conf
+
+    attach_filter(sock, bpf_filter, iface or conf.iface)
+
+
+class TPacketRing:
+    """Linux AF_PACKET capture through a memory-mapped TPACKET_V3 ring.
+
+    The kernel fills whole blocks of frames; each block is walked in place
+    and handed to the caller as a batch of memoryviews into the ring, so no
+    per-packet recv or copy happens. The views are only valid until the
+    batch callback returns, after which the block goes back to the kernel.
+    """
+
+    def __init__(self, iface=None, block_size=1 << 20, block_count=64,
+                 frame_size=2048, block_timeout_ms=64, promisc=True, bpf_filter=None,
+                 fanout_group=None):
+        self.iface = iface
+        self.fanout_group = fanout_group
+        self.promisc = promisc
+        self.bpf_filter = bpf_filter
+        self.block_size = block_size
+        self.block_count = block_count
+        self.frame_size = frame_size
+        self.block_timeout_ms = block_timeout_ms
+        self.sock = None
+        self.ring = None
+        self.stats = {
+            "packets": 0,
+            "drops": 0,
+            "freezes": 0,
+            "blocks": 0,
+            "frames": 0
+        }
+
+    def open(self):
+        """Create the socket, configure TPACKET_V3 and map the ring"""
+        # With an interface, protocol 0 receives nothing until bind(), so no
+        # frame slips in before the BPF filter is attached. Without one the
+        # socket listens everywhere at once; anything queued before the ring
+        # exists stays on the plain receive queue and is never read.
+        protocol = 0 if self.iface else socket.htons(ETH_P_ALL)
+        sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, protocol)
+        try:
+            if self.bpf_filter:
+                attach_bpf_filter(sock, self.bpf_filter, self.iface)
+            sock.setsockopt(SOL_PACKET, PACKET_VERSION, TPACKET_V3)
+            frame_count = (self.block_size // self.frame_size) * self.block_count
+            request = _tpacket_req3.pack(
+                self.block_size, self.block_count, self.frame_size, frame_count,
+                self.block_timeout_ms, 0, 0
+            )
+            sock.setsockopt(SOL_PACKET, PACKET_RX_RING, request)
+            if self.iface:
+                sock.bind((self.iface, ETH_P_ALL))
+            if self.iface and self.promisc:
+                # struct packet_mreq: ifindex, type, alen, address
+                mreq = struct.pack("iHH8s", socket.if_nametoindex(self.iface), PACKET_MR_PROMISC, 0, b"")
+                sock.setsockopt(SOL_PACKET, PACKET_ADD_MEMBERSHIP, mreq)
+            if self.fanout_group is not None:
+                # Flow-hash fanout: the kernel's symmetric flow hash keeps both
+                # directions of a flow on the same socket of the group
+                mode = PACKET_FANOUT_HASH | PACKET_FANOUT_FLAG_DEFRAG
+                fanout_arg = (self.fanout_group & 0xFFFF) | (mode << 16)
+                sock.setsockopt(SOL_PACKET, PACKET_FANOUT, struct.pack("I", fanout_arg))
+            self.ring = mmap.mmap(
+                sock.fileno(), self.block_size * self.block_count,
+                mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE
+            )
+        except Exception:
+            sock.close()
+            raise
+        self.sock = sock
+        return self
+
+    def close(self):
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def _walk_block(self, view, block_offset):
+        """Return [(frame view, timestamp, linktype, length), ...] for one user-owned block.
+
+        The view holds the tp_snaplen captured bytes; length is the frame's
+        length on the wire (tp_len), which is larger for truncated frames.
+        """
+        num_packets, first_offset = _block_header.unpack_from(view, block_offset + 12)[0:2]
+        frames = []
+        offset = block_offset + first_offset
+        for _ in range(num_packets):
+            next_offset, sec, nsec, snaplen, length, _, mac, _ = _frame_header.unpack_from(view, offset)
+            hatype = _sll_hatype.unpack_from(view, offset + SLL_HATYPE_OFFSET)[0]
+            linktype = LINKTYPE_ETHERNET if hatype in ETHERNET_HATYPES else LINKTYPE_RAW
+            start = offset + mac
+            frames.append((view[start:start + snaplen], sec + nsec * 1e-9, linktype, length))
+            offset += next_offset
+        return frames
+
+    def run(self, callback, timeout=None, stop_event=None):
+        """Deliver batches to callback(frames) until timeout or stop_event.
+
+        Each batch is one ring block: a list of (frame, timestamp, linktype,
+        length) where frame is a memoryview into the ring and length the
+        frame's length on the wire. Callers must copy any
+        frame they keep after the callback returns.
+        """
+        if self.sock is None:
+            self.open()
+
+        poller = select.poll()
+        poller.register(self.sock.fileno(), select.POLLIN | select.POLLERR)
+        deadline = time.time() + timeout if timeout else None
+        view = memoryview(self.ring)
+        block = 0
+        try:
+            while stop_event is None or not stop_event.is_set():
+                block_offset = block * self.block_size
+                status = _block_status.unpack_from(view, block_offset + BLOCK_STATUS_OFFSET)[0]
+                if not status & TP_STATUS_USER:
+                    wait_ms = 1000
+                    if deadline is not None:
+                        remaining = deadline - time.time()
+                        if remaining <= 0:
+                            break
+                        wait_ms = min(wait_ms, int(remaining * 1000) + 1)
+                    poller.poll(wait_ms)
+                    continue
+
+                frames = self._walk_block(view, block_offset)
+                try:
+                    callback(frames)
+                finally:
+                    for frame, _, _, _ in frames:
+                        frame.release()
+                    _block_status.pack_into(view, block_offset + BLOCK_STATUS_OFFSET, TP_STATUS_KERNEL)
+
+                self.stats["blocks"] += 1
+                self.stats["frames"] += len(frames)
+                block = (block + 1) % self.block_count
+        finally:
+            view.release()
+
+    def get_stats(self):
+        """Return cumulative ring statistics (kernel counters reset on each read)"""
+        if self.sock is not None:
+            try:
+                raw = self.sock.getsockopt(SOL_PACKET, PACKET_STATISTICS, _tpacket_stats_v3.size)
+                packets, drops, freezes = _tpacket_stats_v3.unpack(raw)
+                self.stats["packets"] += packets
+                self.stats["drops"] += drops
+                self.stats["freezes"] += freezes
+            except OSError:
+                pass
+        return dict(self.stats, ring_bytes=self.block_size * self.block_count)
+
@@ -0,0 +1,20 @@
+import sys
+
+import pytest
+
+
+class NoReverseDNS:
+    """Stands in for the module's DNSResolver: tests never query real DNS"""
+
+    def resolve(self, ip, callback):
+        pass
+
+    def get_stats(self):
+        return {}
+
+
+@pytest.fixture(autouse=True)
+def no_reverse_dns(monkeypatch):
+    rtc = sys.modules.get("real_traffic_capture")
+    if rtc is not None:
+        monkeypatch.setattr(rtc, "dns_resolver", NoReverseDNS())
@@ -0,0 +1,15 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from api_server import negotiate_encoding
+
+
+def test_negotiate_encoding_follows_q_values():
+    assert negotiate_encoding("gzip;q=0.1, deflate;q=1") == "deflate"
+    assert negotiate_encoding("deflate, gzip") == "gzip"
+    assert negotiate_encoding("deflate;q=0.5, *;q=0.5") == "gzip"
+    assert negotiate_encoding("deflate") == "deflate"
+    assert negotiate_encoding("gzip;q=0, deflate;q=0") is None
+    assert negotiate_encoding("br") is None
+    assert negotiate_encoding(None) is None
@@ -0,0 +1,60 @@
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+import real_traffic_capture as rtc
+
+CONN_ID = ("192.168.1.5", "9.9.9.9", 5353, 53, "UDP")
+
+
+def apply(timestamp):
+    # (conn_id, is_outgoing, packet_size, timestamp, sni, tcp_flags)
+    with rtc.connection_lock:
+        rtc.apply_record((CONN_ID, True, 100, timestamp, None, 0))
+
+
+def test_recreated_flow_is_changed_not_removed():
+    now = time.time()
+    apply(now)
+    cursor = rtc.connections_delta(0)["cursor"]
+    flow = rtc.connections[CONN_ID].id
+
+    with rtc.connection_lock:
+        rtc.remove_connection(CONN_ID, "expired")
+    apply(now + 1)
+
+    delta = rtc.connections_delta(cursor)
+    assert not delta["reset"]
+    assert [conn["id"] for conn in delta["connections"]] == [flow]
+    assert delta["removed"] == []
+
+    # Removed and not recreated: reported as removed
+    cursor = delta["cursor"]
+    with rtc.connection_lock:
+        rtc.remove_connection(CONN_ID, "expired")
+    delta = rtc.connections_delta(cursor)
+    assert delta["connections"] == []
+    assert delta["removed"] == [flow]
+
+
+def test_late_change_keeps_last_seen_order():
+    now = time.time()
+    other = ("192.168.1.5", "1.1.1.1", 5354, 53, "UDP")
+    apply(now)
+    with rtc.connection_lock:
+        rtc.apply_record((other, True, 100, now + 1, None, 0))
+    cursor = rtc.connections_delta(0)["cursor"]
+
+    # A domain resolving for the idle flow is a change, but not a packet
+    conn = rtc.connections[CONN_ID]
+    rtc.mark_changed(conn)
+    assert list(rtc.connections)[-2:] == [CONN_ID, other]
+
+    delta = rtc.connections_delta(cursor)
+    assert not delta["reset"]
+    assert [c["id"] for c in delta["connections"]] == [conn.id]
+
+    for conn_id in (CONN_ID, other):
+        with rtc.connection_lock:
+            rtc.remove_connection(conn_id, "expired")
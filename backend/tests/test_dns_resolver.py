@@ -0,0 +1,16 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from dns_resolver import DNSResolver
+
+
+def test_dropped_lookup_calls_back_with_none():
+    resolver = DNSResolver(workers=0, max_pending=1)
+    answers = []
+    resolver.resolve("192.0.2.1", lambda ip, domain: answers.append((ip, domain)))
+    # No workers: the queue stays full, so the next lookup is dropped
+    resolver.resolve("192.0.2.2", lambda ip, domain: answers.append((ip, domain)))
+    assert answers == [("192.0.2.2", None)]
+    assert resolver.get_stats()["dropped"] == 1
+    assert resolver.get_stats()["in_flight"] == 1
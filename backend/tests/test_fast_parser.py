@@ -0,0 +1,68 @@
+import os
+import socket
+import struct
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from fast_parser import (
+    IPPROTO_ICMP, IPPROTO_TCP, IPPROTO_UDP, LINKTYPE_ETHERNET, LINKTYPE_LINUX_SLL, LINKTYPE_RAW, parse_frame
+)
+
+ETHERNET = b"\x00" * 12
+
+
+def ipv4(proto, payload, src="192.168.1.5", dst="93.184.216.34", fragment=0):
+    header = struct.pack("!BBHHHBBH4s4s", 0x45, 0, 20 + len(payload), 0, fragment, 64, proto, 0,
+                         socket.inet_aton(src), socket.inet_aton(dst))
+    return header + payload
+
+
+def ipv6(proto, payload, src="2001:db8::1", dst="2001:db8::2"):
+    header = struct.pack("!IHBB16s16s", 6 << 28, len(payload), proto, 64,
+                         socket.inet_pton(socket.AF_INET6, src), socket.inet_pton(socket.AF_INET6, dst))
+    return header + payload
+
+
+def tcp(sport, dport, flags, payload=b""):
+    return struct.pack("!HHIIBBHHH", sport, dport, 0, 0, 5 << 4, flags, 65535, 0, 0) + payload
+
+
+def udp(sport, dport, payload=b""):
+    return struct.pack("!HHHH", sport, dport, 8 + len(payload), 0) + payload
+
+
+def test_ipv4_tcp_over_ethernet():
+    frame = ETHERNET + b"\x08\x00" + ipv4(IPPROTO_TCP, tcp(50000, 443, 0x12, b"hello"))
+    assert parse_frame(frame, LINKTYPE_ETHERNET) == (
+        IPPROTO_TCP, "192.168.1.5", "93.184.216.34", 50000, 443, len(frame), len(frame) - 5, 0x12
+    )
+
+
+def test_vlan_tagged_frame():
+    frame = ETHERNET + b"\x81\x00\x00\x05\x08\x00" + ipv4(IPPROTO_UDP, udp(5353, 53))
+    parsed = parse_frame(frame, LINKTYPE_ETHERNET)
+    assert parsed[:5] == (IPPROTO_UDP, "192.168.1.5", "93.184.216.34", 5353, 53)
+
+
+def test_ipv6_udp_raw_and_sll():
+    packet = ipv6(IPPROTO_UDP, udp(40000, 53, b"q"))
+    parsed = parse_frame(packet, LINKTYPE_RAW)
+    assert parsed[:5] == (IPPROTO_UDP, "2001:db8::1", "2001:db8::2", 40000, 53)
+    assert parsed[6] == len(packet) - 1
+
+    sll = b"\x00" * 14 + b"\x86\xdd" + packet
+    assert parse_frame(sll, LINKTYPE_LINUX_SLL)[:5] == parsed[:5]
+
+
+def test_icmp_has_no_ports():
+    frame = ETHERNET + b"\x08\x00" + ipv4(IPPROTO_ICMP, b"\x08\x00\x00\x00\x00\x01\x00\x01")
+    assert parse_frame(frame, LINKTYPE_ETHERNET)[:5] == (IPPROTO_ICMP, "192.168.1.5", "93.184.216.34", 0, 0)
+
+
+def test_frames_left_to_scapy():
+    # Non-IP, truncated headers and non-first fragments are not parsed
+    assert parse_frame(ETHERNET + b"\x08\x06" + b"\x00" * 28, LINKTYPE_ETHERNET) is None
+    assert parse_frame(ETHERNET + b"\x08\x00" + ipv4(IPPROTO_TCP, b"\x00" * 10), LINKTYPE_ETHERNET) is None
+    fragment = ipv4(IPPROTO_UDP, udp(1, 2), fragment=185)
+    assert parse_frame(ETHERNET + b"\x08\x00" + fragment, LINKTYPE_ETHERNET) is None
+    assert parse_frame(b"\x45", 9999) is None
@@ -0,0 +1,45 @@
+import os
+import sys
+from collections import OrderedDict
+from types import SimpleNamespace
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from flow_admission import FLOW_RECORD_BYTES, FlowAdmission
+
+
+def test_source_over_its_rate_overflows():
+    admission = FlowAdmission(rate=10, burst=3)
+    assert [admission.admit("10.0.0.1", 100.0) for _ in range(4)] == [True, True, True, False]
+    # Other sources have their own bucket
+    assert admission.admit("10.0.0.2", 100.0)
+    # Tokens refill at rate per second
+    assert [admission.admit("10.0.0.1", 100.25) for _ in range(3)] == [True, True, False]
+    assert admission.stats["overflowed"] == 2
+
+
+def test_zero_rate_admits_everything():
+    admission = FlowAdmission(rate=0)
+    assert all(admission.admit("10.0.0.1", 100.0) for _ in range(1000))
+
+
+def test_source_buckets_are_bounded():
+    admission = FlowAdmission(rate=1, burst=1, max_sources=2)
+    admission.admit("10.0.0.1", 100.0)
+    admission.admit("10.0.0.2", 100.0)
+    admission.admit("10.0.0.3", 100.0)
+    # The least recently seen source was forgotten, so it gets a fresh burst
+    assert admission.admit("10.0.0.1", 100.0)
+
+
+def test_victim_is_smallest_of_least_recently_seen():
+    table = OrderedDict()
+    for key, packets in (("a", 50), ("b", 2), ("c", 1)):
+        table[key] = SimpleNamespace(packets_sent=packets, packets_received=0)
+    assert FlowAdmission(sample_size=2).pick_victim(table) == "b"
+    assert FlowAdmission(sample_size=8).pick_victim(table) == "c"
+    assert FlowAdmission().pick_victim(OrderedDict()) is None
+
+
+def test_memory_budget_caps_flows():
+    admission = FlowAdmission.from_budget(10**9, memory_mb=1)
+    assert admission.max_flows == 2**20 // FLOW_RECORD_BYTES
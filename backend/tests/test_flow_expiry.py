@@ -0,0 +1,69 @@
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from flow_expiry import FlowExpiry
+from tcp_state import CLOSED, ESTABLISHED
+
+
+def flow(protocol, last_seen, tcp_state=ESTABLISHED):
+    return SimpleNamespace(protocol=protocol, last_seen=last_seen, tcp_state=tcp_state)
+
+
+def test_idle_flow_expires_at_its_deadline():
+    expiry = FlowExpiry({"UDP": 120})
+    conn = flow("UDP", 1000)
+    table = {"a": conn}
+    expiry.schedule("a", conn)
+    assert expiry.expire(table, 1119) == []
+    assert expiry.expire(table, 1120) == [("a", conn)]
+    assert len(expiry) == 0
+
+
+def test_active_flow_is_pushed_back():
+    expiry = FlowExpiry({"UDP": 120})
+    conn = flow("UDP", 1000)
+    table = {"a": conn}
+    expiry.schedule("a", conn)
+    # Traffic since scheduling: the entry comes due but is rescheduled
+    conn.last_seen = 1100
+    assert expiry.expire(table, 1150) == []
+    assert expiry.stats["rescheduled"] == 1
+    assert expiry.expire(table, 1220) == [("a", conn)]
+
+
+def test_removed_or_replaced_flows_are_dropped():
+    expiry = FlowExpiry({"UDP": 120})
+    old = flow("UDP", 1000)
+    expiry.schedule("a", old)
+    expiry.schedule("b", flow("UDP", 1000))
+    table = {"a": flow("UDP", 1000)}
+    assert expiry.expire(table, 2000) == []
+    assert len(expiry) == 0
+
+
+def test_closed_tcp_lingers_briefly():
+    expiry = FlowExpiry()
+    conn = flow("TCP", 1000)
+    table = {"a": conn}
+    expiry.schedule("a", conn)
+    conn.tcp_state |= CLOSED
+    expiry.schedule("a", conn)
+    assert expiry.expire(table, 1010) == [("a", conn)]
+    assert expiry.stats["expired_closed"] == 1
+    # The caller removes it; the stale long-timeout entry is discarded later
+    del table["a"]
+    assert expiry.expire(table, 2000) == []
+
+
+def test_expire_works_in_bounded_slices():
+    expiry = FlowExpiry({"ICMP": 30})
+    table = {}
+    for i in range(5):
+        table[i] = flow("ICMP", 1000)
+        expiry.schedule(i, table[i])
+    assert len(expiry.expire(table, 1100, budget=2)) == 2
+    assert expiry.has_due(1100)
+    assert len(expiry.expire(table, 1100, budget=10)) == 3
+    assert not expiry.has_due(1100)
@@ -0,0 +1,29 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from storage.flow_history import FlowHistory
+
+ROW = (1, 100.0, 160.0, '192.168.1.5', 50000, '93.184.216.34', 443,
+       'TCP', 'HTTPS', 'example.com', 1200, 5400, 10, 12, 'CLOSED', 'expired')
+
+
+def test_query_before_the_database_exists(tmp_path):
+    path = tmp_path / 'history.db'
+    reader = FlowHistory(path)
+    with pytest.raises(sqlite3.Error):
+        reader.query()
+    # Read-only: querying must not create the database
+    assert not path.exists()
+
+    writer = FlowHistory(path).start()
+    writer.record(ROW)
+    writer.close()
+
+    # The same reader works once the schema exists
+    rows = reader.query(ip='93.184.216.34')
+    assert [row['domain'] for row in rows] == ['example.com']
+    reader.close()
@@ -0,0 +1,24 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from storage.pcap_ring import PcapRing, segment_files
+
+FRAME = bytes(60)
+
+
+def test_segments_ordered_past_zero_padding(tmp_path):
+    for number in (99998, 99999, 100000):
+        (tmp_path / f"ring_{number:05d}.pcapng").write_bytes(b"\0" * 100)
+
+    assert [p.name for p in segment_files(tmp_path)] == [
+        "ring_99998.pcapng", "ring_99999.pcapng", "ring_100000.pcapng"
+    ]
+
+    # Room for the new segment plus two old ones: the oldest goes first
+    ring = PcapRing(tmp_path, budget_bytes=1250, segment_bytes=1000)
+    ring.write(FRAME, 1.0, 1, flow=7)
+    ring.close()
+    assert [p.name for p in segment_files(tmp_path)] == [
+        "ring_99999.pcapng", "ring_100000.pcapng", "ring_100001.pcapng"
+    ]
@@ -0,0 +1,71 @@
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from shard_coordinator import ShardCoordinator
+
+
+class SnapshotQueue:
+    """Feeds snapshots to _collect, then stops it"""
+
+    def __init__(self, snapshots):
+        self.snapshots = list(snapshots)
+
+    def get(self):
+        if not self.snapshots:
+            raise StopIteration
+        return self.snapshots.pop(0)
+
+
+def collect(coordinator, *snapshots):
+    coordinator._queue = SnapshotQueue(snapshots)
+    try:
+        coordinator._collect()
+    except StopIteration:
+        pass
+
+
+def snapshot(shard, version, last_seen):
+    return {"shard": shard, "version": version, "connections": [{"id": shard, "lastSeen": last_seen}],
+            "stats": {}, "final": False}
+
+
+def test_unchanged_snapshots_keep_the_version():
+    coordinator = ShardCoordinator(None, 2, {})
+    collect(coordinator, snapshot(0, 5, "2026-01-01T00:00:01"), snapshot(1, 3, "2026-01-01T00:00:02"))
+    version, merged = coordinator.connections_since(0)
+    assert [conn["id"] for conn in merged] == [1, 0]
+
+    # Periodic snapshots of unchanged tables: nothing new for the cursor
+    collect(coordinator, snapshot(0, 5, "2026-01-01T00:00:01"), snapshot(1, 3, "2026-01-01T00:00:02"))
+    assert coordinator.connections_since(version) == (version, None)
+
+    collect(coordinator, snapshot(1, 4, "2026-01-01T00:00:03"))
+    new_version, merged = coordinator.connections_since(version)
+    assert new_version > version
+    assert len(merged) == 2
+
+
+def stoppable_worker(shard, options, snapshot_queue):
+    # Shuts down the way run_shard_worker does: SIGTERM ends the loop
+    import signal
+    import threading
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda sig, frame: stop.set())
+    snapshot_queue.put(snapshot(shard, 1, "2026-01-01T00:00:01"))
+    while not stop.wait(0.05):
+        pass
+    snapshot_queue.put(dict(snapshot(shard, 2, "2026-01-01T00:00:02"), final=True))
+
+
+def test_stop_waits_for_final_snapshots():
+    coordinator = ShardCoordinator(stoppable_worker, 2, {"fanout_group": 0}).start()
+    # Running: their SIGTERM handlers are installed
+    deadline = time.time() + 30
+    while len(coordinator.connections()) < 2:
+        assert time.time() < deadline
+        time.sleep(0.05)
+    coordinator.stop(timeout=30)
+    assert not any(process.is_alive() for process in coordinator.processes)
+    assert coordinator._finished == {0, 1}
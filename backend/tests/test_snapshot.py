@@ -0,0 +1,88 @@
+import http.client
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+import real_traffic_capture as rtc
+from api_server import JsonRequestHandler, PooledHTTPServer
+from snapshot import SnapshotPublisher
+
+CONN_ID = ("192.168.1.5", "93.184.216.34", 50000, 443, "TCP")
+
+
+def test_idle_table_keeps_its_etag(monkeypatch):
+    now = time.time()
+    with rtc.connection_lock:
+        rtc.apply_record((CONN_ID, True, 1500, now, None, 0))
+    try:
+        publisher = SnapshotPublisher(rtc.get_connections_json)
+        first = publisher.publish()
+        # No traffic, but the clock moves on
+        monkeypatch.setattr(time, "time", lambda: now + 5)
+        second = publisher.publish()
+        assert second.etag == first.etag
+        assert second.body == first.body
+    finally:
+        with rtc.connection_lock:
+            rtc.remove_connection(CONN_ID)
+
+
+def test_unchanged_source_is_not_rebuilt():
+    builds = []
+    version = [1]
+
+    def build():
+        builds.append(version[0])
+        return f'{{"version": {version[0]}}}'
+
+    publisher = SnapshotPublisher(build, source_version=lambda: version[0])
+    first = publisher.publish()
+    assert publisher.publish() is first
+    assert builds == [1]
+
+    version[0] = 2
+    second = publisher.publish()
+    assert builds == [1, 2]
+    assert second.etag != first.etag
+
+
+def test_unchanged_snapshot_answers_304():
+    body = '[%s]' % ', '.join(['{"id": 1, "service": "HTTPS"}'] * 100)
+    publisher = SnapshotPublisher(lambda: body)
+    publisher.publish()
+
+    class Handler(JsonRequestHandler):
+        def do_GET(self):
+            snapshot = publisher.current
+            self.send_body(snapshot.body, etag=snapshot.etag, encoded={
+                'gzip': snapshot.gzip_body,
+                'deflate': snapshot.deflate_body
+            })
+
+        def log_message(self, format, *args):
+            pass
+
+    server = PooledHTTPServer(('127.0.0.1', 0), Handler, workers=2)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        client = http.client.HTTPConnection('127.0.0.1', server.server_address[1], timeout=5)
+        for accept in ('gzip', 'deflate;q=1, gzip;q=0.5', 'identity'):
+            client.request('GET', '/connections', headers={'Accept-Encoding': accept})
+            response = client.getresponse()
+            response.read()
+            assert response.status == 200
+            etag = response.getheader('ETag')
+
+            # A rebuild with nothing new keeps the ETag
+            publisher.publish()
+            client.request('GET', '/connections', headers={'Accept-Encoding': accept, 'If-None-Match': etag})
+            response = client.getresponse()
+            assert response.status == 304
+            assert response.read() == b''
+            assert response.getheader('ETag') == etag
+        client.close()
+    finally:
+        server.shutdown()
+        server.server_close()
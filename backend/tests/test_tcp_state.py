@@ -0,0 +1,86 @@
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from flow_expiry import FlowExpiry
+from tcp_state import (
+    STATE_NEW, TCP_ACK, TCP_FIN, TCP_RST, TCP_SYN,
+    advance, is_closed, is_half_open, state_name
+)
+
+OUT = True
+IN = False
+
+
+def run(*packets):
+    state = STATE_NEW
+    for flags, is_outgoing in packets:
+        state = advance(state, flags, is_outgoing)
+    return state
+
+
+def timeout(state):
+    return FlowExpiry().timeout_for(SimpleNamespace(protocol="TCP", tcp_state=state))
+
+
+def test_outgoing_handshake_establishes_on_final_ack():
+    state = run((TCP_SYN, OUT), (TCP_SYN | TCP_ACK, IN))
+    assert state_name(state) == "SYN_SENT"
+    assert is_half_open(state)
+    state = advance(state, TCP_ACK, OUT)
+    assert state_name(state) == "ESTABLISHED"
+    assert not is_half_open(state)
+    assert timeout(state) == 900
+
+
+def test_incoming_handshake_establishes_on_final_ack():
+    state = run((TCP_SYN, IN), (TCP_SYN | TCP_ACK, OUT), (TCP_ACK, IN))
+    assert state_name(state) == "ESTABLISHED"
+
+
+def test_syn_flood_answered_with_syn_ack_stays_half_open():
+    state = run((TCP_SYN, IN), (TCP_SYN | TCP_ACK, OUT))
+    assert state_name(state) == "SYN_RECEIVED"
+    assert is_half_open(state)
+    assert timeout(state) == 20
+    # Retransmitted SYN-ACKs don't complete the handshake either
+    state = run((TCP_SYN, IN), (TCP_SYN | TCP_ACK, OUT), (TCP_SYN | TCP_ACK, OUT), (TCP_ACK, OUT))
+    assert is_half_open(state)
+
+
+def test_handshake_seen_from_syn_ack():
+    # Capture started after the SYN: the SYN-ACK sender is the responder
+    state = run((TCP_SYN | TCP_ACK, IN), (TCP_ACK, OUT))
+    assert state_name(state) == "ESTABLISHED"
+
+
+def test_mid_stream_flow_is_established():
+    assert state_name(run((TCP_ACK, IN))) == "ESTABLISHED"
+
+
+def test_rst_closes():
+    state = run((TCP_SYN, OUT), (TCP_RST | TCP_ACK, IN))
+    assert is_closed(state)
+    assert timeout(state) == 10
+
+
+def test_fin_in_both_directions_closes():
+    established = run((TCP_SYN, OUT), (TCP_SYN | TCP_ACK, IN), (TCP_ACK, OUT))
+    state = advance(established, TCP_FIN | TCP_ACK, OUT)
+    assert state_name(state) == "CLOSING"
+    assert not is_closed(state)
+    state = advance(state, TCP_FIN | TCP_ACK, IN)
+    assert is_closed(state)
+
+    state = run((TCP_ACK, IN), (TCP_FIN | TCP_ACK, IN), (TCP_FIN | TCP_ACK, OUT))
+    assert is_closed(state)
+
+
+def test_port_reuse_starts_a_new_connection():
+    closed = run((TCP_SYN, OUT), (TCP_SYN | TCP_ACK, IN), (TCP_ACK, OUT), (TCP_RST, IN))
+    state = advance(closed, TCP_SYN, IN)
+    assert not is_closed(state)
+    assert state_name(state) == "SYN_RECEIVED"
+    state = advance(advance(state, TCP_SYN | TCP_ACK, OUT), TCP_ACK, IN)
+    assert state_name(state) == "ESTABLISHED"
@@ -0,0 +1,30 @@
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+import real_traffic_capture as rtc
+from flow_admission import FlowAdmission
+from top_talkers import TopTalkers
+
+
+def test_overflow_flow_keeps_packet_endpoints(monkeypatch):
+    # burst=1: the remote's first flow is admitted, the second overflows
+    monkeypatch.setattr(rtc, "flow_admission", FlowAdmission(rate=0.001, burst=1))
+    monkeypatch.setattr(rtc, "top_talkers", TopTalkers())
+    now = time.time()
+    admitted = ("192.168.1.5", "203.0.113.9", 443, 50000, "TCP")
+    overflowed = ("192.168.1.5", "203.0.113.9", 443, 50001, "TCP")
+    with rtc.connection_lock:
+        # Incoming: the remote is the packet's source
+        rtc.apply_record((admitted, False, 100, now, None, 0))
+        rtc.apply_record((overflowed, False, 1000, now, None, 0))
+        assert ("203.0.113.9", rtc.OVERFLOW_ADDR, 0, 0, "TCP") in rtc.connections
+
+    top = rtc.top_talkers.top(dimensions=["sources", "destinations"], now=now)
+    assert {entry["key"] for entry in top["sources"]} == {"203.0.113.9"}
+    assert {entry["key"] for entry in top["destinations"]} == {"192.168.1.5"}
+
+    with rtc.connection_lock:
+        for conn_id in list(rtc.connections):
+            rtc.remove_connection(conn_id, "expired")
@@ -0,0 +1,28 @@
+import os
+import struct
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from fast_parser import LINKTYPE_ETHERNET
+from tpacket_ring import SLL_HATYPE_OFFSET, TPacketRing, _frame_header
+
+FIRST_FRAME = 48
+MAC_OFFSET = 80
+
+
+def test_walk_block_reports_wire_length():
+    block = bytearray(4096)
+    struct.pack_into("III", block, 12, 1, FIRST_FRAME, 0)
+    # 96 of the frame's 1514 bytes were captured
+    _frame_header.pack_into(block, FIRST_FRAME, 0, 10, 500000000, 96, 1514, 1, MAC_OFFSET, MAC_OFFSET + 14)
+    struct.pack_into("H", block, FIRST_FRAME + SLL_HATYPE_OFFSET, 1)
+    block[FIRST_FRAME + MAC_OFFSET:FIRST_FRAME + MAC_OFFSET + 96] = b"\xab" * 96
+
+    frames = TPacketRing()._walk_block(memoryview(block), 0)
+    assert len(frames) == 1
+    frame, timestamp, linktype, length = frames[0]
+    assert bytes(frame) == b"\xab" * 96
+    assert timestamp == 10.5
+    assert linktype == LINKTYPE_ETHERNET
+    assert length == 1514
+    frame.release()
@@ -209,9 +209,9 @@ function startRealTrafficCapture() {
       realTrafficCaptureProcess = null;
     });
 
-    // Wait a bit for the server to start before polling
+    // Wait a bit for the server to start before subscribing to updates
     setTimeout(() => {
-      pollRealConnectionData(serverPort);
+      streamRealConnectionData(serverPort);
     }, 2000);
   } catch (error) {
     console.error('Failed to start real traffic capture:', error);
@@ -231,6 +231,89 @@ function stopRealTrafficCapture() {
   }
 }
 
+// Subscribe to pushed connection updates (Server-Sent Events), falling back to polling
+function streamRealConnectionData(port = 8000) {
+  const http = require('http');
+  const connectionsById = new Map();
+  let buffer = '';
+
+  function applyDelta(delta) {
+    if (delta.reset) {
+      connectionsById.clear();
+    }
+    // Removals first: a flow removed and recreated keeps its id
+    for (const id of delta.removed) {
+      connectionsById.delete(id);
+    }
+    for (const conn of delta.connections) {
+      connectionsById.set(conn.id, conn);
+    }
+    // Most recently seen first, as /connections returns them
+    realConnectionsData = Array.from(connectionsById.values())
+      .sort((a, b) => b.lastSeen.localeCompare(a.lastSeen));
+    lastConnectionUpdate = Date.now();
+  }
+
+  function handleEvent(block) {
+    let event = 'message';
+    let data = '';
+    for (const line of block.split('\n')) {
+      if (line.startsWith('event:')) {
+        event = line.slice(6).trim();
+      } else if (line.startsWith('data:')) {
+        data += line.slice(5).trim();
+      }
+    }
+    if (!data) {
+      return;
+    }
+    if (event === 'connections') {
+      applyDelta(JSON.parse(data));
+    } else if (event === 'stats') {
+      lastConnectionUpdate = Date.now();
+    }
+  }
+
+  const req = http.get({
+    hostname: '127.0.0.1',
+    port: port,
+    path: '/stream'
+  }, (res) => {
+    if (res.statusCode !== 200) {
+      console.error(`Stream HTTP error: ${res.statusCode}, falling back to polling`);
+      res.resume();
+      pollRealConnectionData(port);
+      return;
+    }
+
+    console.log('Receiving live connection updates');
+    res.setEncoding('utf8');
+    res.on('data', (chunk) => {
+      buffer += chunk;
+      let boundary;
+      while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+        const block = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+        try {
+          handleEvent(block);
+        } catch (error) {
+          console.error('Error parsing streamed update:', error);
+        }
+      }
+    });
+
+    res.on('end', () => {
+      console.log('Update stream closed, falling back to polling');
+      pollRealConnectionData(port);
+    });
+  });
+
+  req.on('error', (err) => {
+    console.error('Error opening update stream:', err.message);
+    pollRealConnectionData(port);
+  });
+}
+
 // Poll for real connection data
 function pollRealConnectionData(port = 8000) {
   const http = require('http');
@@ -546,11 +629,18 @@ ipcMain.on('start-capture', async (event, options) => {
 });
 
 // Storage handling
-ipcMain.handle('list-captures', async () => {
-  const pythonProcess = spawn('python', [
+// Resolves to [{ name, created, size_bytes, packets, total_bytes, first_time,
+// last_time, protocols, ... }]; options: { sort, order, protocol, match, from,
+// to, offset, limit }
+ipcMain.handle('list-captures', async (event, options = {}) => {
+  const args = [
     path.join(__dirname, '../../backend/src/packet_capture.py'),
     '--list-captures'
-  ]);
+  ];
+  for (const option of ['sort', 'order', 'protocol', 'match', 'from', 'to', 'offset', 'limit']) {
+    if (options[option] !== undefined) args.push(`--${option}`, String(options[option]));
+  }
+  const pythonProcess = spawn('python', args);
 
   return new Promise((resolve, reject) => {
     let data = '';
@@ -567,11 +657,17 @@ ipcMain.handle('list-captures', async () => {
   });
 });
 
-ipcMain.handle('load-capture', async (event, filename) => {
-  const pythonProcess = spawn('python', [
+// options: { from, to, offset, limit } to load only a time range or page of a capture
+ipcMain.handle('load-capture', async (event, filename, options = {}) => {
+  const args = [
     path.join(__dirname, '../../backend/src/packet_capture.py'),
     '--load', filename
-  ]);
+  ];
+  if (options.from !== undefined) args.push('--from', String(options.from));
+  if (options.to !== undefined) args.push('--to', String(options.to));
+  if (options.offset !== undefined) args.push('--offset', String(options.offset));
+  if (options.limit !== undefined) args.push('--limit', String(options.limit));
+  const pythonProcess = spawn('python', args);
 
   return new Promise((resolve, reject) => {
     let data = '';
@@ -0,0 +1,125 @@
+import gzip
+import json
+import mmap
+from pathlib import Path
+
+from .capture_writer import (
+    COMPRESSED_SUFFIXES, INDEX_ENTRY, index_path, record_time, segment_paths, zstandard
+)
+
+
+class Segment:
+    """One segment file and its index entries, mapped into memory on first use"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.entries = list(INDEX_ENTRY.iter_unpack(index_path(path).read_bytes()))
+        if self.path.name.endswith(COMPRESSED_SUFFIXES['gzip']):
+            self.decompress = gzip.decompress
+        elif self.path.name.endswith(COMPRESSED_SUFFIXES['zstd']):
+            if zstandard is None:
+                raise RuntimeError(f"{self.path.name} is zstd-compressed but zstandard is not installed")
+            self.decompress = zstandard.ZstdDecompressor().decompress
+        else:
+            self.decompress = None
+        self._file = None
+        self._map = None
+
+    def block(self, offset, length):
+        """The decoded lines of the block at offset"""
+        if self._map is None:
+            self._file = open(self.path, 'rb')
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        data = self._map[offset:offset + length]
+        if self.decompress is not None:
+            data = self.decompress(data)
+        return data.splitlines()
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._file.close()
+            self._map = None
+            self._file = None
+
+
+class CaptureReader:
+    """Random access to a capture written by CaptureWriter.
+
+    Queries use the segment indexes to pick the blocks that can contain
+    matching records and read only those byte ranges through mmap, so the
+    cost depends on the size of the answer, not of the capture.
+    """
+
+    def __init__(self, capture_dir):
+        paths = segment_paths(capture_dir)
+        self.indexed = bool(paths) and all(index_path(path).exists() for path in paths)
+        self.segments = [Segment(path) for path in paths] if self.indexed else []
+
+    def count(self):
+        """Number of records in the capture"""
+        return sum(entry[3] for segment in self.segments for entry in segment.entries)
+
+    def time_span(self):
+        """(first, last) record time in epoch seconds, or None if no record has one"""
+        times = [(entry[4], entry[5]) for segment in self.segments for entry in segment.entries
+                 if entry[4] <= entry[5]]
+        if not times:
+            return None
+        return min(t[0] for t in times), max(t[1] for t in times)
+
+    def read(self, start=None, end=None, first=None, last=None, offset=0, limit=None):
+        """Records with start <= time <= end and first <= record number < last.
+
+        Times are epoch seconds and record numbers count from 0; any bound
+        may be None. offset and limit page through the matches. Yields
+        record dicts in capture order.
+        """
+        if limit is not None and limit <= 0:
+            return
+        timed = start is not None or end is not None
+        first = first or 0
+        if not timed:
+            # Without a time filter the nth match is record first + n
+            first += offset
+            offset = 0
+        if limit is not None and not timed:
+            last = first + limit if last is None else min(last, first + limit)
+        low = float('-inf') if start is None else start
+        high = float('inf') if end is None else end
+
+        remaining = limit
+        for segment in self.segments:
+            for block_first, block_offset, length, count, min_time, max_time in segment.entries:
+                if block_first + count <= first or (last is not None and block_first >= last):
+                    continue
+                if timed and (max_time < low or min_time > high):
+                    continue
+                for number, line in enumerate(segment.block(block_offset, length), block_first):
+                    if number < first:
+                        continue
+                    if last is not None and number >= last:
+                        break
+                    record = json.loads(line)
+                    if timed:
+                        timestamp = record_time(record)
+                        if timestamp is None or not low <= timestamp <= high:
+                            continue
+                        if offset:
+                            offset -= 1
+                            continue
+                    yield record
+                    if remaining is not None:
+                        remaining -= 1
+                        if remaining <= 0:
+                            return
+
+    def close(self):
+        for segment in self.segments:
+            segment.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,266 @@
+import gzip
+import io
+import json
+import os
+import struct
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from .packet_records import RECORDS_FILE, pack_record
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+SEGMENT_PREFIX = 'segment_'
+PLAIN_SUFFIX = '.ndjson'
+COMPRESSED_SUFFIXES = {'gzip': '.ndjson.gz', 'zstd': '.ndjson.zst'}
+INDEX_SUFFIX = '.idx'
+# One entry per written block: first record number in the capture, byte
+# offset and length in the segment file, record count, min and max time
+INDEX_ENTRY = struct.Struct('<QQIIdd')
+
+
+def record_time(record):
+    """A record's time as epoch seconds, or None if it has none"""
+    return parse_time(record.get('time'))
+
+
+def parse_time(value):
+    """Epoch seconds from a number, numeric string or ISO 8601 string"""
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        pass
+    try:
+        return datetime.fromisoformat(str(value)).timestamp()
+    except ValueError:
+        return None
+
+
+def index_path(segment_path):
+    """Sidecar index for a segment file"""
+    segment_path = Path(segment_path)
+    return segment_path.with_name(segment_path.name + INDEX_SUFFIX)
+
+
+def default_compression():
+    """zstd when the zstandard package is installed, gzip otherwise"""
+    return 'zstd' if zstandard is not None else 'gzip'
+
+
+def segment_paths(capture_dir):
+    """A capture's segment files in write order.
+
+    While a closed segment is being compressed both versions can exist for
+    a moment; the finished compressed file is preferred.
+    """
+    segments = {}
+    for path in Path(capture_dir).iterdir():
+        name = path.name
+        if (not name.startswith(SEGMENT_PREFIX) or '.ndjson' not in name
+                or name.endswith('.tmp') or name.endswith(INDEX_SUFFIX)):
+            continue
+        number = name[len(SEGMENT_PREFIX):].split('.', 1)[0]
+        if number not in segments or not name.endswith(PLAIN_SUFFIX):
+            segments[number] = path
+    return [segments[number] for number in sorted(segments)]
+
+
+def open_segment(path):
+    """Open a segment for reading text lines, whatever its compression"""
+    path = Path(path)
+    if path.name.endswith(COMPRESSED_SUFFIXES['gzip']):
+        return gzip.open(path, 'rt')
+    if path.name.endswith(COMPRESSED_SUFFIXES['zstd']):
+        if zstandard is None:
+            raise RuntimeError(f"{path.name} is zstd-compressed but zstandard is not installed")
+        reader = zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), read_across_frames=True)
+        return io.TextIOWrapper(reader)
+    return open(path, 'r')
+
+
+class CaptureSummary:
+    """Running totals kept for the capture catalog"""
+
+    __slots__ = ('packets', 'bytes', 'first_time', 'last_time', 'protocols')
+
+    def __init__(self):
+        self.packets = 0
+        self.bytes = 0
+        self.first_time = None
+        self.last_time = None
+        self.protocols = {}
+
+    def add(self, record):
+        """Count one record; returns its time (see record_time)"""
+        self.packets += 1
+        self.bytes += record.get('length') or 0
+        protocol = str(record.get('protocol'))
+        self.protocols[protocol] = self.protocols.get(protocol, 0) + 1
+        timestamp = record_time(record)
+        if timestamp is not None:
+            if self.first_time is None or timestamp < self.first_time:
+                self.first_time = timestamp
+            if self.last_time is None or timestamp > self.last_time:
+                self.last_time = timestamp
+        return timestamp
+
+
+class CaptureWriter:
+    """Append-only NDJSON capture writer with batching, rotation and compression.
+
+    A capture is a directory of numbered segments. Records are buffered and
+    written one JSON object per line every batch_size records or
+    flush_interval seconds, so memory use doesn't grow with the capture.
+    A segment is closed once it reaches max_segment_bytes or is
+    max_segment_seconds old; closed segments are compressed in the
+    background while writing continues into the next one.
+
+    Every flush is one block, and each segment has a sidecar index
+    (INDEX_ENTRY per block) giving the block's record numbers, byte range
+    and time range. Compression keeps the blocks independent (one gzip
+    member or zstd frame each), so a reader can seek straight to the
+    blocks a query needs; see capture_reader.py.
+
+    With records, every packet is also appended to packets.rec as a
+    fixed-width binary record for vectorized analysis (packet_records.py).
+    """
+
+    def __init__(self, capture_dir, batch_size=1000, flush_interval=1.0,
+                 max_segment_bytes=64 * 2**20, max_segment_seconds=3600, compression=None,
+                 records=True, on_close=None):
+        self.capture_dir = Path(capture_dir)
+        self.capture_dir.mkdir(parents=True, exist_ok=True)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segment_seconds = max_segment_seconds
+        self.compression = compression if compression is not None else default_compression()
+        if self.compression == 'zstd' and zstandard is None:
+            raise ValueError('zstd compression requires the zstandard package')
+        self._buffer = []
+        self._file = None
+        self._index = None
+        self._segment_path = None
+        self._segment_number = 0
+        self._segment_opened = 0.0
+        self._last_flush = time.monotonic()
+        self._compressors = []
+        self._records = open(self.capture_dir / RECORDS_FILE, 'ab') if records else None
+        self.on_close = on_close
+        self.summary = CaptureSummary()
+        self.stats = {
+            'records': 0,
+            'bytes_written': 0,
+            'segments': 0,
+            'flushes': 0
+        }
+
+    def write(self, record):
+        """Buffer one record; flushes and rotates as needed"""
+        self._buffer.append(record)
+        if len(self._buffer) >= self.batch_size or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Write buffered records to the current segment"""
+        self._last_flush = time.monotonic()
+        if not self._buffer:
+            return
+        if self._file is None:
+            self._open_segment()
+
+        records = self._buffer
+        first = self.stats['records']
+        self._buffer = []
+        times = list(map(self.summary.add, records))
+        if self._records is not None:
+            self._records.write(b''.join(map(pack_record, records, times)))
+            self._records.flush()
+        times = [t for t in times if t is not None]
+        data = ''.join(json.dumps(record, default=str) + '\n' for record in records).encode()
+        offset = self._file.tell()
+        self._file.write(data)
+        self._file.flush()
+        # Index after data, so an entry never points past the end of the file
+        self._index.write(INDEX_ENTRY.pack(
+            first, offset, len(data), len(records),
+            min(times) if times else float('inf'), max(times) if times else float('-inf')
+        ))
+        self._index.flush()
+        self.stats['records'] += len(records)
+        self.stats['bytes_written'] += len(data)
+        self.stats['flushes'] += 1
+
+        if (self._file.tell() >= self.max_segment_bytes
+                or time.monotonic() - self._segment_opened >= self.max_segment_seconds):
+            self._close_segment()
+
+    def _open_segment(self):
+        self._segment_number += 1
+        self._segment_path = self.capture_dir / f"{SEGMENT_PREFIX}{self._segment_number:05d}{PLAIN_SUFFIX}"
+        self._file = open(self._segment_path, 'wb')
+        self._index = open(index_path(self._segment_path), 'wb')
+        self._segment_opened = time.monotonic()
+        self.stats['segments'] += 1
+
+    def _close_segment(self):
+        self._file.close()
+        self._index.close()
+        self._file = None
+        self._index = None
+        path = self._segment_path
+        if self.compression:
+            self._compressors = [thread for thread in self._compressors if thread.is_alive()]
+            thread = threading.Thread(target=self._compress, args=(path,), name=f"compress-{path.name}")
+            thread.start()
+            self._compressors.append(thread)
+
+    def _compress(self, path):
+        target = path.with_name(path.name[:-len(PLAIN_SUFFIX)] + COMPRESSED_SUFFIXES[self.compression])
+        partial = target.with_name(target.name + '.tmp')
+        partial_index = index_path(partial)
+        compress = (zstandard.ZstdCompressor().compress if self.compression == 'zstd'
+                    else gzip.compress)
+        entries = INDEX_ENTRY.iter_unpack(index_path(path).read_bytes())
+        with open(path, 'rb') as source, open(partial, 'wb') as out, open(partial_index, 'wb') as index:
+            for first, offset, length, count, min_time, max_time in entries:
+                source.seek(offset)
+                block = compress(source.read(length))
+                index.write(INDEX_ENTRY.pack(first, out.tell(), len(block), count, min_time, max_time))
+                out.write(block)
+        # Index first: readers use the compressed segment as soon as it
+        # exists, and then they need its index
+        os.replace(partial_index, index_path(target))
+        os.replace(partial, target)
+        path.unlink()
+        index_path(path).unlink()
+
+    def close(self):
+        """Flush, close and compress the last segment, and wait for compression.
+
+        on_close, if given, is then called with the writer.
+        """
+        self.flush()
+        if self._file is not None:
+            self._close_segment()
+        if self._records is not None:
+            self._records.close()
+            self._records = None
+        for thread in self._compressors:
+            thread.join()
+        self._compressors = []
+        if self.on_close is not None:
+            self.on_close(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
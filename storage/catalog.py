@@ -0,0 +1,122 @@
+import threading
+from pathlib import Path
+
+from .database import open_database
+
+COLUMNS = (
+    'name', 'format', 'created', 'size_bytes', 'packets', 'total_bytes',
+    'first_time', 'last_time', 'segments', 'compression'
+)
+
+UPSERT_SQL = (
+    f"INSERT INTO captures ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))}) "
+    "ON CONFLICT (name) DO UPDATE SET "
+    + ', '.join(f'{column} = excluded.{column}' for column in COLUMNS[1:])
+)
+
+SORT_COLUMNS = {
+    'name': 'name',
+    'created': 'created',
+    'size': 'size_bytes',
+    'packets': 'packets',
+    'bytes': 'total_bytes',
+    'start': 'first_time',
+    'end': 'last_time'
+}
+
+PROTOCOL_NUMBERS = {'icmp': '1', 'tcp': '6', 'udp': '17', 'icmpv6': '58'}
+
+
+class CaptureCatalog:
+    """SQLite catalog of stored captures and their summary statistics.
+
+    Rows are written when a capture is closed (see StorageManager), so
+    listing, sorting and filtering captures never opens the captures
+    themselves.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = open_database(self.path, 'catalog')
+        self._lock = threading.Lock()
+
+    def record(self, entry):
+        """Insert or replace a capture's row; entry has COLUMNS plus 'protocols'"""
+        with self._lock, self._conn:
+            self._conn.execute(UPSERT_SQL, [entry.get(column) for column in COLUMNS])
+            self._conn.execute('DELETE FROM capture_protocols WHERE name = ?', (entry['name'],))
+            self._conn.executemany(
+                'INSERT INTO capture_protocols (name, protocol, packets) VALUES (?, ?, ?)',
+                [(entry['name'], protocol, count) for protocol, count in entry.get('protocols', {}).items()]
+            )
+
+    def remove(self, names):
+        with self._lock, self._conn:
+            for name in names:
+                self._conn.execute('DELETE FROM captures WHERE name = ?', (name,))
+                self._conn.execute('DELETE FROM capture_protocols WHERE name = ?', (name,))
+
+    def names(self):
+        with self._lock:
+            return {row[0] for row in self._conn.execute('SELECT name FROM captures')}
+
+    def query(self, match=None, protocol=None, start=None, end=None, min_packets=None,
+              sort='created', order='desc', limit=None, offset=0):
+        """Catalog rows as dicts with a 'protocols' mix, sorted and paged.
+
+        match is a substring of the name; protocol a number or name (tcp,
+        udp, ...) the capture must contain; start and end (epoch seconds)
+        keep captures whose time span overlaps them. Raises ValueError for
+        an unknown sort key or order.
+        """
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"unknown sort key {sort}")
+        if order not in ('asc', 'desc'):
+            raise ValueError(f"order must be asc or desc, not {order}")
+
+        clauses = []
+        params = []
+        if match:
+            clauses.append("name LIKE ? ESCAPE '\\'")
+            escaped = match.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            params.append(f'%{escaped}%')
+        if protocol is not None:
+            clauses.append('name IN (SELECT name FROM capture_protocols WHERE protocol = ?)')
+            params.append(PROTOCOL_NUMBERS.get(str(protocol).lower(), str(protocol)))
+        if start is not None:
+            clauses.append('last_time >= ?')
+            params.append(start)
+        if end is not None:
+            clauses.append('first_time <= ?')
+            params.append(end)
+        if min_packets is not None:
+            clauses.append('packets >= ?')
+            params.append(min_packets)
+
+        sql = f"SELECT {', '.join(COLUMNS)} FROM captures"
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        sql += f' ORDER BY {SORT_COLUMNS[sort]} {order.upper()}, name LIMIT ? OFFSET ?'
+        params.extend((-1 if limit is None else limit, offset))
+
+        with self._lock:
+            captures = [dict(zip(COLUMNS, row)) for row in self._conn.execute(sql, params)]
+            by_name = {capture['name']: capture for capture in captures}
+            for capture in captures:
+                capture['protocols'] = {}
+            names = list(by_name)
+            # One lookup per 500 names keeps under SQLite's variable limit
+            for i in range(0, len(names), 500):
+                chunk = names[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT name, protocol, packets FROM capture_protocols "
+                    f"WHERE name IN ({', '.join('?' * len(chunk))})", chunk
+                )
+                for name, protocol, count in rows:
+                    by_name[name]['protocols'][protocol] = count
+        return captures
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,33 @@
+import sqlite3
+from pathlib import Path
+
+MIGRATIONS_DIR = Path(__file__).parent / 'migrations'
+
+
+def open_database(path, name, timeout=5.0):
+    """Open a SQLite database in WAL mode and bring its schema up to date.
+
+    Migrations are the files in migrations/<name>/, applied in filename
+    order ("0001_create_flows.sql", ...). The database's user_version
+    records how many have been applied, so each runs exactly once.
+    schemas/<name>.sql shows the resulting schema for reference.
+    """
+    conn = sqlite3.connect(str(path), timeout=timeout, check_same_thread=False)
+    conn.execute('PRAGMA journal_mode=WAL')
+    # WAL keeps committed transactions durable across crashes at NORMAL
+    conn.execute('PRAGMA synchronous=NORMAL')
+    apply_migrations(conn, name)
+    return conn
+
+
+def apply_migrations(conn, name):
+    """Run any migrations for database name newer than its user_version"""
+    migrations = sorted((MIGRATIONS_DIR / name).glob('*.sql'))
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    for number, migration in enumerate(migrations, start=1):
+        if number <= version:
+            continue
+        with conn:
+            conn.executescript(migration.read_text())
+            conn.execute(f'PRAGMA user_version = {number}')
+    return len(migrations)
@@ -0,0 +1,158 @@
+import sqlite3
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+from .database import open_database
+
+COLUMNS = (
+    'flow_id', 'first_seen', 'last_seen', 'src_ip', 'src_port', 'dst_ip', 'dst_port',
+    'protocol', 'service', 'domain', 'bytes_sent', 'bytes_received',
+    'packets_sent', 'packets_received', 'state', 'end_reason'
+)
+
+# Checkpointed flows are written again when they change or end: same row
+UPSERT_SQL = (
+    f"INSERT INTO flows ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))}) "
+    "ON CONFLICT (flow_id, first_seen) DO UPDATE SET "
+    + ', '.join(f'{column} = excluded.{column}' for column in COLUMNS[2:])
+)
+
+
+class FlowHistory:
+    """SQLite store of finished and checkpointed flows.
+
+    record() only appends a row tuple (in COLUMNS order) to a bounded
+    in-memory queue and never blocks; a background thread writes queued
+    rows in batches, one transaction per batch, to a WAL-mode database.
+    If the writer falls behind and the queue fills, rows are dropped and
+    counted rather than slowing capture down.
+    """
+
+    def __init__(self, path=None, batch_size=1000, flush_interval=1.0, max_queue=100000):
+        if path is None:
+            path = Path(__file__).parent / 'data' / 'flow_history.db'
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self._queue = deque()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._writer = None
+        self._reader = None
+        self._read_lock = threading.Lock()
+        self.stats = {
+            'queued': 0,
+            'written': 0,
+            'dropped': 0,
+            'batches': 0,
+            'errors': 0,
+            'last_batch_ms': 0.0
+        }
+
+    def start(self):
+        # Create or migrate the schema before anything is queued
+        open_database(self.path, 'flow_history').close()
+        self._stopping.clear()
+        self._writer = threading.Thread(target=self._run, name='flow-history-writer')
+        self._writer.daemon = True
+        self._writer.start()
+        return self
+
+    def record(self, row):
+        """Queue one flow row for writing; returns False if it was dropped"""
+        if len(self._queue) >= self.max_queue:
+            self.stats['dropped'] += 1
+            return False
+        self._queue.append(row)
+        self.stats['queued'] += 1
+        if len(self._queue) >= self.batch_size:
+            self._wake.set()
+        return True
+
+    def close(self, timeout=10):
+        """Write everything still queued, then stop the writer"""
+        self._stopping.set()
+        self._wake.set()
+        if self._writer is not None:
+            self._writer.join(timeout)
+            self._writer = None
+        with self._read_lock:
+            if self._reader is not None:
+                self._reader.close()
+                self._reader = None
+
+    def _run(self):
+        conn = open_database(self.path, 'flow_history')
+        try:
+            while True:
+                self._wake.wait(self.flush_interval)
+                self._wake.clear()
+                while self._queue:
+                    self._write_batch(conn)
+                if self._stopping.is_set() and not self._queue:
+                    return
+        finally:
+            conn.close()
+
+    def _write_batch(self, conn):
+        queue = self._queue
+        popleft = queue.popleft
+        batch = [popleft() for _ in range(min(len(queue), self.batch_size))]
+        start = time.perf_counter()
+        try:
+            with conn:
+                conn.executemany(UPSERT_SQL, batch)
+        except sqlite3.Error as e:
+            self.stats['errors'] += 1
+            print(f"Flow history write error: {str(e)}")
+            return
+        self.stats['written'] += len(batch)
+        self.stats['batches'] += 1
+        self.stats['last_batch_ms'] = round((time.perf_counter() - start) * 1000, 2)
+
+    def query(self, start=None, end=None, ip=None, service=None, protocol=None, limit=100, offset=0):
+        """Past flows active between start and end (epoch seconds), newest first.
+
+        ip matches either end of the flow. Returns a list of dicts keyed by
+        column name. Raises sqlite3.Error if the database or its schema does
+        not exist yet.
+        """
+        clauses = []
+        params = []
+        if start is not None:
+            clauses.append('last_seen >= ?')
+            params.append(start)
+        if end is not None:
+            clauses.append('first_seen <= ?')
+            params.append(end)
+        if ip:
+            clauses.append('(src_ip = ? OR dst_ip = ?)')
+            params.extend((ip, ip))
+        if service:
+            clauses.append('service = ?')
+            params.append(service)
+        if protocol:
+            clauses.append('protocol = ?')
+            params.append(protocol)
+
+        sql = f"SELECT {', '.join(COLUMNS)} FROM flows"
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        sql += ' ORDER BY last_seen DESC LIMIT ? OFFSET ?'
+        params.extend((limit, offset))
+
+        # Queries share one read-only connection (never creating the
+        # database); WAL lets it read alongside the writer
+        with self._read_lock:
+            if self._reader is None:
+                self._reader = sqlite3.connect(f'{self.path.resolve().as_uri()}?mode=ro', uri=True,
+                                               timeout=5.0, check_same_thread=False)
+            rows = self._reader.execute(sql, params).fetchall()
+        return [dict(zip(COLUMNS, row)) for row in rows]
+
+    def get_stats(self):
+        return dict(self.stats, pending=len(self._queue), path=str(self.path))
@@ -0,0 +1,28 @@
+-- One row per stored capture, written when the capture is closed
+CREATE TABLE IF NOT EXISTS captures (
+    name TEXT PRIMARY KEY,
+    format TEXT NOT NULL,
+    created REAL NOT NULL,
+    size_bytes INTEGER NOT NULL DEFAULT 0,
+    packets INTEGER NOT NULL DEFAULT 0,
+    total_bytes INTEGER NOT NULL DEFAULT 0,
+    first_time REAL,
+    last_time REAL,
+    segments INTEGER NOT NULL DEFAULT 0,
+    compression TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_captures_created ON captures (created);
+CREATE INDEX IF NOT EXISTS idx_captures_first_time ON captures (first_time);
+CREATE INDEX IF NOT EXISTS idx_captures_packets ON captures (packets);
+CREATE INDEX IF NOT EXISTS idx_captures_size ON captures (size_bytes);
+
+-- Packet count per IP protocol number for each capture
+CREATE TABLE IF NOT EXISTS capture_protocols (
+    name TEXT NOT NULL,
+    protocol TEXT NOT NULL,
+    packets INTEGER NOT NULL,
+    PRIMARY KEY (name, protocol)
+);
+
+CREATE INDEX IF NOT EXISTS idx_capture_protocols_protocol ON capture_protocols (protocol, name);
@@ -0,0 +1,96 @@
+import socket
+import struct
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+RECORDS_FILE = 'packets.rec'
+
+FLAG_IP = 1
+FLAG_PORTS = 2
+
+# Little-endian, packed: time, length, protocol, flags, ports, then both
+# addresses as 128-bit integers split into (hi, lo). IPv4 addresses are
+# stored IPv4-mapped (::ffff:a.b.c.d), so hi is 0 for all of IPv4.
+RECORD = struct.Struct('<dIBBHHQQQQ')
+
+FIELDS = (
+    ('time', '<f8'),
+    ('length', '<u4'),
+    ('protocol', 'u1'),
+    ('flags', 'u1'),
+    ('src_port', '<u2'),
+    ('dst_port', '<u2'),
+    ('src_hi', '<u8'),
+    ('src_lo', '<u8'),
+    ('dst_hi', '<u8'),
+    ('dst_lo', '<u8')
+)
+PACKET_DTYPE = np.dtype(list(FIELDS)) if np is not None else None
+
+IPV4_MAPPED = 0xffff << 32
+_NAN = float('nan')
+_unpack_pair = struct.Struct('>QQ').unpack
+_pack_pair = struct.Struct('>QQ').pack
+
+
+def ip_to_int(address):
+    """(hi, lo) for an IPv4 or IPv6 address string"""
+    if ':' in address:
+        return _unpack_pair(socket.inet_pton(socket.AF_INET6, address))
+    return 0, IPV4_MAPPED | int.from_bytes(socket.inet_aton(address), 'big')
+
+
+def int_to_ip(hi, lo):
+    """Address string for (hi, lo); IPv4-mapped addresses come back as IPv4"""
+    hi = int(hi)
+    lo = int(lo)
+    if hi == 0 and lo >> 32 == 0xffff:
+        return socket.inet_ntoa((lo & 0xffffffff).to_bytes(4, 'big'))
+    return socket.inet_ntop(socket.AF_INET6, _pack_pair(hi, lo))
+
+
+def pack_record(record, timestamp=None):
+    """One packet dict (as produced by PacketCapture) as a RECORD.
+
+    timestamp is the record's time in epoch seconds if already known;
+    packets without a time are stored as NaN.
+    """
+    flags = 0
+    src_hi = src_lo = dst_hi = dst_lo = 0
+    src_ip = record.get('src_ip')
+    dst_ip = record.get('dst_ip')
+    if src_ip and dst_ip:
+        try:
+            src_hi, src_lo = ip_to_int(src_ip)
+            dst_hi, dst_lo = ip_to_int(dst_ip)
+            flags |= FLAG_IP
+        except OSError:
+            src_hi = src_lo = dst_hi = dst_lo = 0
+    src_port = record.get('src_port')
+    dst_port = record.get('dst_port')
+    if src_port is not None and dst_port is not None:
+        flags |= FLAG_PORTS
+    else:
+        src_port = dst_port = 0
+    return RECORD.pack(
+        _NAN if timestamp is None else timestamp,
+        record.get('length') or 0,
+        record.get('protocol') or 0,
+        flags,
+        src_port, dst_port,
+        src_hi, src_lo, dst_hi, dst_lo
+    )
+
+
+def open_records(path):
+    """A records file as a read-only structured array backed by np.memmap"""
+    if np is None:
+        raise RuntimeError('Reading packet records requires numpy')
+    # The writer may have a partial record at the end while it is running
+    count = path.stat().st_size // RECORD.size
+    if count == 0:
+        return np.zeros(0, dtype=PACKET_DTYPE)
+    return np.memmap(path, dtype=PACKET_DTYPE, mode='r', shape=(count,))
@@ -0,0 +1,324 @@
+import json
+import os
+import struct
+import threading
+import time
+from array import array
+from pathlib import Path
+
+SEGMENT_PREFIX = 'ring_'
+SEGMENT_SUFFIX = '.pcapng'
+# While a segment is open its index is an append-only log; when it is
+# closed the log is replaced by an index grouped by flow
+LOG_SUFFIX = '.log'
+INDEX_SUFFIX = '.idx'
+
+BLOCK_SHB = 0x0A0D0D0A
+BLOCK_IDB = 0x00000001
+BLOCK_EPB = 0x00000006
+BYTE_ORDER_MAGIC = 0x1A2B3C4D
+
+BLOCK_HEADER = struct.Struct('<II')
+# Section header: type, length, magic, version 1.0, section length unknown
+SHB = struct.Struct('<IIIHHqI').pack(BLOCK_SHB, 28, BYTE_ORDER_MAGIC, 1, 0, -1, 28)
+# Interface description: type, length, linktype, reserved, snaplen, length
+IDB = struct.Struct('<IIHHII')
+# Enhanced packet header: type, length, interface, timestamp high/low
+# (microseconds), captured length, original length
+EPB_HEADER = struct.Struct('<IIIIIII')
+EPB_TRAILER = struct.Struct('<I')
+# Log entry: flow id, packet time, offset of its block in the segment
+LOG_ENTRY = struct.Struct('<QdQ')
+
+SNAPLEN = 262144
+_PADDING = (b'', b'\0\0\0', b'\0\0', b'\0')
+
+
+def segment_number(path):
+    """The sequence number in a segment's name (names outgrow their zero padding)"""
+    try:
+        return int(path.name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)])
+    except ValueError:
+        return -1
+
+
+def segment_files(directory):
+    """Ring segments under directory (and per-worker subdirectories), oldest first per directory"""
+    directory = Path(directory)
+    if not directory.is_dir():
+        return []
+    return sorted(directory.rglob(f'{SEGMENT_PREFIX}*{SEGMENT_SUFFIX}'), key=lambda p: (p.parent, segment_number(p)))
+
+
+def _sidecar(path, suffix):
+    return path.with_name(path.name + suffix)
+
+
+def read_index(path):
+    """{flow id: (offsets, first time, last time)} for one segment.
+
+    Uses the closed segment's grouped index, or scans the open segment's
+    log. Returns {} if the segment has neither.
+    """
+    index_path = _sidecar(path, INDEX_SUFFIX)
+    try:
+        with open(index_path, 'rb') as f:
+            header = json.loads(f.readline())
+            offsets = array('Q')
+            offsets.frombytes(f.read())
+    except FileNotFoundError:
+        pass
+    else:
+        return {
+            int(flow): (offsets[start:start + count], first, last)
+            for flow, (start, count, first, last) in header['flows'].items()
+        }
+
+    flows = {}
+    try:
+        data = _sidecar(path, LOG_SUFFIX).read_bytes()
+    except FileNotFoundError:
+        return flows
+    # The writer may be partway through an entry
+    data = data[:len(data) - len(data) % LOG_ENTRY.size]
+    for flow, timestamp, offset in LOG_ENTRY.iter_unpack(data):
+        entry = flows.get(flow)
+        if entry is None:
+            flows[flow] = [array('Q', [offset]), timestamp, timestamp]
+        else:
+            entry[0].append(offset)
+            entry[2] = timestamp
+    return {flow: tuple(entry) for flow, entry in flows.items()}
+
+
+def _interfaces(f, needed):
+    """Linktypes of the first needed interfaces declared in a segment"""
+    linktypes = []
+    f.seek(0)
+    while len(linktypes) < needed:
+        header = f.read(BLOCK_HEADER.size)
+        if len(header) < BLOCK_HEADER.size:
+            break
+        block_type, length = BLOCK_HEADER.unpack(header)
+        if block_type == BLOCK_IDB:
+            linktypes.append(struct.unpack('<H', f.read(2))[0])
+            f.seek(length - BLOCK_HEADER.size - 2, os.SEEK_CUR)
+        else:
+            f.seek(length - BLOCK_HEADER.size, os.SEEK_CUR)
+    return linktypes
+
+
+def locate(directory, flow, start=None, end=None):
+    """[(segment path, offsets)] holding a flow's packets, oldest first.
+
+    Only the segment indexes are read. start and end (epoch seconds) skip
+    segments where the flow has no packets in that range.
+    """
+    found = []
+    for path in segment_files(directory):
+        entry = read_index(path).get(flow)
+        if entry is None:
+            continue
+        offsets, first, last = entry
+        if (start is not None and last < start) or (end is not None and first > end):
+            continue
+        found.append((path, offsets))
+    return found
+
+
+def extract(directory, flow, out, start=None, end=None, locations=None):
+    """Copy one flow's packets into out (a binary file) as a pcapng stream.
+
+    Each packet is a seek and a copy of its block; interface ids are
+    renumbered so packets from different segments share one section.
+    Returns the number of packets written.
+    """
+    if locations is None:
+        locations = locate(directory, flow, start, end)
+    low = None if start is None else int(start * 1e6)
+    high = None if end is None else int(end * 1e6)
+    out.write(SHB)
+    out_interfaces = {}
+    written = 0
+    for path, offsets in locations:
+        try:
+            f = open(path, 'rb')
+        except FileNotFoundError:
+            # Rotated out of the ring since it was located
+            continue
+        with f:
+            linktypes = []
+            for offset in offsets:
+                f.seek(offset)
+                header = f.read(EPB_HEADER.size)
+                if len(header) < EPB_HEADER.size:
+                    break
+                block_type, length, interface, ts_high, ts_low, _, _ = EPB_HEADER.unpack(header)
+                if block_type != BLOCK_EPB:
+                    continue
+                timestamp = (ts_high << 32) | ts_low
+                if (low is not None and timestamp < low) or (high is not None and timestamp > high):
+                    continue
+                if interface >= len(linktypes):
+                    position = f.tell()
+                    linktypes = _interfaces(f, interface + 1)
+                    f.seek(position)
+                    if interface >= len(linktypes):
+                        continue
+                linktype = linktypes[interface]
+                if linktype not in out_interfaces:
+                    out_interfaces[linktype] = len(out_interfaces)
+                    out.write(IDB.pack(BLOCK_IDB, 20, linktype, 0, SNAPLEN, 20))
+                out.write(header[:8] + struct.pack('<I', out_interfaces[linktype]) + header[12:])
+                out.write(f.read(length - EPB_HEADER.size))
+                written += 1
+    return written
+
+
+class PcapRing:
+    """Full-packet recorder writing a ring of pcapng segments, like dumpcap's ring mode.
+
+    Segments are closed at segment_bytes (or after segment_seconds) and the
+    oldest are deleted so the ring never uses more than budget_bytes. For
+    each segment the offsets of every packet are indexed by flow id, so a
+    flow's packets can be copied out with one seek each (see extract).
+    """
+
+    def __init__(self, directory, budget_bytes=1024 * 2**20, segment_bytes=64 * 2**20,
+                 segment_seconds=None, flush_interval=1.0):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.segment_bytes = min(segment_bytes, budget_bytes)
+        self.budget_bytes = budget_bytes
+        self.segment_seconds = segment_seconds
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._file = None
+        self._log = None
+        self._path = None
+        self._flows = {}
+        self._interfaces = {}
+        self._opened = 0.0
+        self._last_flush = 0.0
+        # Continue numbering, and count the space used, from an earlier run
+        self._segments = [path for path in segment_files(self.directory) if path.parent == self.directory]
+        self._number = max([0] + [segment_number(path) for path in self._segments])
+        self._closed_bytes = sum(path.stat().st_size for path in self._segments)
+        self.stats = {
+            'packets': 0,
+            'bytes': 0,
+            'segments_written': 0,
+            'segments_deleted': 0
+        }
+
+    def write(self, data, timestamp, linktype, flow=None, original_length=None):
+        """Append one frame; flow (a flow id) indexes it for extraction.
+
+        original_length is the frame's length on the wire when data was
+        truncated by the capture.
+        """
+        micros = int(timestamp * 1e6)
+        length = len(data)
+        with self._lock:
+            if self._file is None:
+                self._open_segment()
+            interface = self._interfaces.get(linktype)
+            if interface is None:
+                interface = self._interfaces[linktype] = len(self._interfaces)
+                self._file.write(IDB.pack(BLOCK_IDB, 20, linktype, 0, SNAPLEN, 20))
+            offset = self._file.tell()
+            block_length = EPB_HEADER.size + length + (-length % 4) + EPB_TRAILER.size
+            self._file.write(b''.join((
+                EPB_HEADER.pack(BLOCK_EPB, block_length, interface, micros >> 32, micros & 0xFFFFFFFF,
+                                length, length if original_length is None else original_length),
+                data, _PADDING[length % 4], EPB_TRAILER.pack(block_length)
+            )))
+            if flow is not None:
+                self._log.write(LOG_ENTRY.pack(flow, timestamp, offset))
+                entry = self._flows.get(flow)
+                if entry is None:
+                    self._flows[flow] = [array('Q', [offset]), timestamp, timestamp]
+                else:
+                    entry[0].append(offset)
+                    entry[2] = timestamp
+            self.stats['packets'] += 1
+            self.stats['bytes'] += block_length
+
+            now = time.monotonic()
+            if offset + block_length >= self.segment_bytes or (
+                    self.segment_seconds is not None and now - self._opened >= self.segment_seconds):
+                self._close_segment()
+            elif now - self._last_flush >= self.flush_interval:
+                self._flush()
+
+    def _flush(self):
+        # Packets before the log entries that point at them
+        self._file.flush()
+        self._log.flush()
+        self._last_flush = time.monotonic()
+
+    def _open_segment(self):
+        # Make room first, so the ring stays within its budget
+        while self._segments and self._closed_bytes + self.segment_bytes > self.budget_bytes:
+            self._delete(self._segments.pop(0))
+        self._number += 1
+        self._path = self.directory / f"{SEGMENT_PREFIX}{self._number:05d}{SEGMENT_SUFFIX}"
+        self._file = open(self._path, 'wb', buffering=1 << 20)
+        self._log = open(_sidecar(self._path, LOG_SUFFIX), 'wb', buffering=1 << 16)
+        self._file.write(SHB)
+        self._interfaces = {}
+        self._flows = {}
+        self._opened = self._last_flush = time.monotonic()
+
+    def _close_segment(self):
+        self._file.close()
+        self._log.close()
+        # Grouped index: a JSON directory of flows, then their offsets
+        flows = {}
+        offsets = array('Q')
+        for flow, (flow_offsets, first, last) in self._flows.items():
+            flows[str(flow)] = [len(offsets), len(flow_offsets), first, last]
+            offsets.extend(flow_offsets)
+        index_path = _sidecar(self._path, INDEX_SUFFIX)
+        partial = _sidecar(self._path, INDEX_SUFFIX + '.tmp')
+        with open(partial, 'wb') as f:
+            f.write(json.dumps({'flows': flows}).encode() + b'\n')
+            offsets.tofile(f)
+        os.replace(partial, index_path)
+        _sidecar(self._path, LOG_SUFFIX).unlink()
+
+        self._segments.append(self._path)
+        self._closed_bytes += self._path.stat().st_size
+        self.stats['segments_written'] += 1
+        self._file = None
+        self._log = None
+        self._flows = {}
+
+    def _delete(self, path):
+        self._closed_bytes -= path.stat().st_size
+        for suffix in (INDEX_SUFFIX, LOG_SUFFIX):
+            _sidecar(path, suffix).unlink(missing_ok=True)
+        path.unlink()
+        self.stats['segments_deleted'] += 1
+
+    def flush(self):
+        """Make everything written so far visible to readers"""
+        with self._lock:
+            if self._file is not None:
+                self._flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._close_segment()
+
+    def get_stats(self):
+        with self._lock:
+            open_bytes = self._file.tell() if self._file is not None else 0
+            return dict(
+                self.stats,
+                segments=len(self._segments) + (self._file is not None),
+                disk_bytes=self._closed_bytes + open_bytes,
+                budget_bytes=self.budget_bytes,
+                directory=str(self.directory)
+            )
@@ -0,0 +1,195 @@
+from .packet_records import FLAG_IP, FLAG_PORTS, IPV4_MAPPED, int_to_ip, np
+
+# Aggregations over packet records (see packet_records.py). Each works a
+# column at a time in numpy, so captures of a hundred million packets are
+# summarised in seconds.
+
+SIDES = ('src', 'dst')
+
+
+def _require_numpy():
+    if np is None:
+        raise RuntimeError('Packet record analysis requires numpy')
+
+
+def _top(counts, top):
+    """Indices of the largest counts, largest first"""
+    if top is None or top >= len(counts):
+        return np.argsort(counts, kind='stable')[::-1]
+    best = np.argpartition(counts, len(counts) - top)[len(counts) - top:]
+    return best[np.argsort(counts[best], kind='stable')[::-1]]
+
+
+def _mask(records, flag):
+    """Which records have flag set, or None if all of them do"""
+    mask = (records['flags'] & flag) != 0
+    return None if mask.all() else mask
+
+
+def _column(records, name, mask):
+    # Selecting columns before rows keeps copies to the columns used
+    column = np.asarray(records[name])
+    return column if mask is None else column[mask]
+
+
+def _distinct(values):
+    """Sorted distinct values and how often each occurs.
+
+    Sort-based: for mostly-distinct 64-bit keys this is much faster than
+    np.unique, which may hash.
+    """
+    values = np.sort(values)
+    starts = np.empty(len(values), dtype=bool)
+    starts[:1] = True
+    np.not_equal(values[1:], values[:-1], out=starts[1:])
+    first = np.flatnonzero(starts)
+    return values[first], np.diff(np.append(first, len(values)))
+
+
+def _unique_ips(records, side, mask):
+    """(hi, lo) of each distinct address on one side, and each record's index into them"""
+    hi = _column(records, side + '_hi', mask)
+    lo = _column(records, side + '_lo', mask)
+    if not hi.any():
+        # All IPv4 (the usual case): one 64-bit column is enough
+        values, inverse = np.unique(lo, return_inverse=True)
+        return np.zeros_like(values), values, inverse
+    pairs = np.empty(len(lo), dtype=[('hi', '<u8'), ('lo', '<u8')])
+    pairs['hi'] = hi
+    pairs['lo'] = lo
+    values, inverse = np.unique(pairs, return_inverse=True)
+    return values['hi'], values['lo'], inverse
+
+
+def bytes_per_ip(records, side='src', top=100):
+    """[{'ip', 'bytes', 'packets'}] per source or destination address, most bytes first"""
+    _require_numpy()
+    if side not in SIDES:
+        raise ValueError(f"side must be one of {SIDES}")
+    mask = _mask(records, FLAG_IP)
+    if len(records) == 0 or (mask is not None and not mask.any()):
+        return []
+    hi, lo, inverse = _unique_ips(records, side, mask)
+    byte_counts = np.bincount(inverse, weights=_column(records, 'length', mask), minlength=len(lo))
+    packet_counts = np.bincount(inverse, minlength=len(lo))
+    return [
+        {'ip': int_to_ip(hi[i], lo[i]), 'bytes': int(byte_counts[i]), 'packets': int(packet_counts[i])}
+        for i in _top(byte_counts, top)
+    ]
+
+
+def bytes_per_port(records, side='dst', top=100):
+    """[{'port', 'bytes', 'packets'}] for TCP/UDP ports, most bytes first"""
+    _require_numpy()
+    if side not in SIDES:
+        raise ValueError(f"side must be one of {SIDES}")
+    mask = _mask(records, FLAG_PORTS)
+    ports = _column(records, side + '_port', mask)
+    byte_counts = np.bincount(ports, weights=_column(records, 'length', mask), minlength=65536)
+    packet_counts = np.bincount(ports, minlength=65536)
+    used = np.flatnonzero(packet_counts)
+    return [
+        {'port': int(used[i]), 'bytes': int(byte_counts[used[i]]), 'packets': int(packet_counts[used[i]])}
+        for i in _top(byte_counts[used], top)
+    ]
+
+
+def bytes_per_protocol(records):
+    """[{'protocol', 'bytes', 'packets'}] per IP protocol number, most bytes first"""
+    _require_numpy()
+    protocols = np.asarray(records['protocol'])
+    byte_counts = np.bincount(protocols, weights=np.asarray(records['length']), minlength=256)
+    packet_counts = np.bincount(protocols, minlength=256)
+    used = np.flatnonzero(packet_counts)
+    return [
+        {'protocol': int(used[i]), 'bytes': int(byte_counts[used[i]]), 'packets': int(packet_counts[used[i]])}
+        for i in _top(byte_counts[used], None)
+    ]
+
+
+def time_histogram(records, bin_seconds=1.0, start=None, end=None):
+    """{'start', 'bin_seconds', 'bytes', 'packets'}: totals per time bin.
+
+    Bins run from start (default: the first packet) to end (default: the
+    last); packets outside that range or without a time are left out.
+    """
+    _require_numpy()
+    if bin_seconds <= 0:
+        raise ValueError('bin_seconds must be positive')
+    times = np.asarray(records['time'])
+    keep = ~np.isnan(times)
+    if start is not None:
+        keep &= times >= start
+    if end is not None:
+        keep &= times <= end
+    times = times[keep]
+    if len(times) == 0:
+        return {'start': start, 'bin_seconds': bin_seconds, 'bytes': [], 'packets': []}
+    if start is None:
+        start = float(times.min())
+    if end is None:
+        end = float(times.max())
+    bins = ((times - start) // bin_seconds).astype(np.int64)
+    size = int((end - start) // bin_seconds) + 1
+    byte_counts = np.bincount(bins, weights=np.asarray(records['length'])[keep], minlength=size)
+    packet_counts = np.bincount(bins, minlength=size)
+    return {
+        'start': start,
+        'bin_seconds': bin_seconds,
+        'bytes': byte_counts.astype(np.int64).tolist(),
+        'packets': packet_counts.tolist()
+    }
+
+
+def unique_peers(records, side='src', top=100):
+    """[{'ip', 'peers'}]: distinct addresses each address exchanged packets with, most first.
+
+    side chooses whose peers are counted: 'src' counts, for each sender,
+    the distinct destinations it sent to.
+    """
+    _require_numpy()
+    if side not in SIDES:
+        raise ValueError(f"side must be one of {SIDES}")
+    other = 'dst' if side == 'src' else 'src'
+    mask = _mask(records, FLAG_IP)
+    if len(records) == 0 or (mask is not None and not mask.any()):
+        return []
+    lo = _column(records, side + '_lo', mask)
+    peer_lo = _column(records, other + '_lo', mask)
+    if (not _column(records, side + '_hi', mask).any() and not _column(records, other + '_hi', mask).any()
+            and ((lo >> np.uint64(32)) == 0xffff).all() and ((peer_lo >> np.uint64(32)) == 0xffff).all()):
+        # All IPv4: each (address, peer) pair packs into one 64-bit key, and
+        # the sorted distinct keys come out grouped by address
+        low32 = np.uint64(0xffffffff)
+        pairs, _ = _distinct(((lo & low32) << np.uint64(32)) | (peer_lo & low32))
+        addresses, peer_counts = _distinct(pairs >> np.uint64(32))
+        return [
+            {'ip': int_to_ip(0, IPV4_MAPPED | int(addresses[i])), 'peers': int(peer_counts[i])}
+            for i in _top(peer_counts, top)
+        ]
+
+    hi, lo, inverse = _unique_ips(records, side, mask)
+    _, peer_lo, peer_inverse = _unique_ips(records, other, mask)
+    # Distinct (address, peer) pairs as one integer each, then count per address
+    base = np.uint64(len(peer_lo))
+    pairs, _ = _distinct(inverse.astype(np.uint64) * base + peer_inverse.astype(np.uint64))
+    peer_counts = np.bincount((pairs // base).astype(np.int64), minlength=len(lo))
+    return [
+        {'ip': int_to_ip(hi[i], lo[i]), 'peers': int(peer_counts[i])}
+        for i in _top(peer_counts, top)
+    ]
+
+
+def summarize(records, top=10, bin_seconds=60.0):
+    """The aggregations above in one dict, for reports and the CLI"""
+    _require_numpy()
+    return {
+        'packets': int(len(records)),
+        'bytes': int(np.asarray(records['length']).sum(dtype=np.uint64)),
+        'protocols': bytes_per_protocol(records),
+        'sources': bytes_per_ip(records, 'src', top),
+        'destinations': bytes_per_ip(records, 'dst', top),
+        'ports': bytes_per_port(records, 'dst', top),
+        'peers': unique_peers(records, 'src', top),
+        'histogram': time_histogram(records, bin_seconds)
+    }
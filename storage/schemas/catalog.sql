@@ -0,0 +1,29 @@
+-- Capture catalog database (storage/data/catalog.db)
+-- Current schema after all migrations in migrations/catalog/
+
+CREATE TABLE captures (
+    name TEXT PRIMARY KEY,
+    format TEXT NOT NULL,            -- 'segments' (streamed NDJSON) or 'json' (legacy single file)
+    created REAL NOT NULL,
+    size_bytes INTEGER NOT NULL DEFAULT 0,
+    packets INTEGER NOT NULL DEFAULT 0,
+    total_bytes INTEGER NOT NULL DEFAULT 0,
+    first_time REAL,
+    last_time REAL,
+    segments INTEGER NOT NULL DEFAULT 0,
+    compression TEXT
+);
+
+CREATE INDEX idx_captures_created ON captures (created);
+CREATE INDEX idx_captures_first_time ON captures (first_time);
+CREATE INDEX idx_captures_packets ON captures (packets);
+CREATE INDEX idx_captures_size ON captures (size_bytes);
+
+CREATE TABLE capture_protocols (
+    name TEXT NOT NULL,
+    protocol TEXT NOT NULL,          -- IP protocol number as text ('6', '17', ...)
+    packets INTEGER NOT NULL,
+    PRIMARY KEY (name, protocol)
+);
+
+CREATE INDEX idx_capture_protocols_protocol ON capture_protocols (protocol, name);
@@ -0,0 +1,28 @@
+-- Flow history database (storage/data/flow_history.db)
+-- Current schema after all migrations in migrations/flow_history/
+
+CREATE TABLE flows (
+    flow_id INTEGER NOT NULL,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    src_ip TEXT NOT NULL,
+    src_port INTEGER NOT NULL,
+    dst_ip TEXT NOT NULL,
+    dst_port INTEGER NOT NULL,
+    protocol TEXT NOT NULL,
+    service TEXT NOT NULL,
+    domain TEXT NOT NULL DEFAULT '',
+    bytes_sent INTEGER NOT NULL DEFAULT 0,
+    bytes_received INTEGER NOT NULL DEFAULT 0,
+    packets_sent INTEGER NOT NULL DEFAULT 0,
+    packets_received INTEGER NOT NULL DEFAULT 0,
+    state TEXT,
+    end_reason TEXT,
+    PRIMARY KEY (flow_id, first_seen)
+);
+
+CREATE INDEX idx_flows_last_seen ON flows (last_seen);
+CREATE INDEX idx_flows_first_seen ON flows (first_seen);
+CREATE INDEX idx_flows_src_ip ON flows (src_ip, last_seen);
+CREATE INDEX idx_flows_dst_ip ON flows (dst_ip, last_seen);
+CREATE INDEX idx_flows_service ON flows (service, last_seen);
@@ -1,40 +1,188 @@
 import json
 import os
+import time
+from itertools import islice
 from datetime import datetime
 from pathlib import Path
 
+from .capture_reader import CaptureReader
+from .capture_writer import (
+    COMPRESSED_SUFFIXES, CaptureSummary, CaptureWriter, open_segment, record_time, segment_paths
+)
+from .catalog import CaptureCatalog
+from .packet_records import RECORDS_FILE, open_records, pack_record
+
 class StorageManager:
     def __init__(self, storage_dir='data'):
         self.storage_dir = Path(__file__).parent / storage_dir
         self.storage_dir.mkdir(parents=True, exist_ok=True)
+        self._catalog = None
+
+    @property
+    def catalog(self):
+        """The capture catalog (catalog.db in the storage directory), opened on first use"""
+        if self._catalog is None:
+            self._catalog = CaptureCatalog(self.storage_dir / 'catalog.db')
+        return self._catalog
+
+    def open_capture_writer(self, name=None, **options):
+        """Start a streaming capture; returns a CaptureWriter (see capture_writer.py).
+
+        The capture is added to the catalog when the writer is closed.
+        """
+        if name is None:
+            name = f"capture_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        created = time.time()
+        def catalog_capture(writer):
+            self.catalog.record(self._catalog_entry(writer.capture_dir, writer.summary, created))
+        return CaptureWriter(self.storage_dir / self._capture_name(name), on_close=catalog_capture, **options)
 
     def save_capture(self, packets, filename=None):
-        """Save captured packets to JSON file"""
-        if filename is None:
-            filename = f"capture_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        
-        filepath = self.storage_dir / filename
-        
-        # Convert packet data to serializable format
-        packet_data = [self._prepare_packet(p) for p in packets]
-        
-        with open(filepath, 'w') as f:
-            json.dump(packet_data, f, indent=2, default=str)
-        
-        return str(filepath)
-
-    def load_capture(self, filename):
-        """Load captured packets from JSON file"""
+        """Save captured packets as a streamed NDJSON capture"""
+        with self.open_capture_writer(filename) as writer:
+            for packet in packets:
+                writer.write(self._prepare_packet(packet))
+        return str(writer.capture_dir)
+
+    def iter_capture(self, filename):
+        """Yield a capture's packets one at a time, without loading the whole file"""
         filepath = self.storage_dir / filename
-        try:
+        if filepath.suffix == '.json' and filepath.is_file():
+            # Captures saved before streaming storage: one JSON document
             with open(filepath, 'r') as f:
-                return json.load(f)
+                yield from json.load(f)
+            return
+        filepath = self.storage_dir / self._capture_name(filename)
+        if not filepath.is_dir():
+            raise FileNotFoundError(filename)
+        for segment in segment_paths(filepath):
+            with open_segment(segment) as f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+
+    def load_capture(self, filename, start=None, end=None, offset=0, limit=None):
+        """Load captured packets from storage, optionally a time range or page of them"""
+        try:
+            return list(self.read_capture(filename, start=start, end=end, offset=offset, limit=limit))
         except FileNotFoundError:
             return None
 
-    def list_captures(self):
-        """List all capture files"""
-        return [f.name for f in self.storage_dir.glob('*.json')]
+    def read_capture(self, filename, start=None, end=None, first=None, last=None, offset=0, limit=None):
+        """Yield the packets matching a query (see CaptureReader.read).
+
+        Indexed captures read only the blocks the query needs; legacy .json
+        captures and captures without indexes are scanned.
+        """
+        capture_dir = self.storage_dir / self._capture_name(filename)
+        if capture_dir.is_dir():
+            with CaptureReader(capture_dir) as reader:
+                if reader.indexed:
+                    yield from reader.read(start, end, first, last, offset, limit)
+                    return
+
+        packets = enumerate(self.iter_capture(filename))
+        if start is not None or end is not None:
+            low = float('-inf') if start is None else start
+            high = float('inf') if end is None else end
+            packets = (
+                (number, packet) for number, packet in packets
+                if record_time(packet) is not None and low <= record_time(packet) <= high
+            )
+        if first is not None or last is not None:
+            packets = (
+                (number, packet) for number, packet in packets
+                if (first is None or number >= first) and (last is None or number < last)
+            )
+        stop = None if limit is None else offset + limit
+        for _, packet in islice(packets, offset, stop):
+            yield packet
+
+    def load_records(self, filename):
+        """A capture's packets as a memory-mapped numpy record array.
+
+        Captures written before the binary format (or with records off)
+        are converted once and the records file is kept next to them.
+        """
+        capture_dir = self.storage_dir / self._capture_name(filename)
+        if capture_dir.is_dir():
+            records_path = capture_dir / RECORDS_FILE
+        else:
+            # Legacy .json captures keep theirs alongside: capture_x.rec
+            records_path = capture_dir.with_name(capture_dir.name + '.rec')
+        if not records_path.exists():
+            if not capture_dir.is_dir() and not (self.storage_dir / filename).is_file():
+                raise FileNotFoundError(filename)
+            partial = records_path.with_name(records_path.name + '.tmp')
+            with open(partial, 'wb') as f:
+                for packet in self.iter_capture(filename):
+                    f.write(pack_record(packet, record_time(packet)))
+            os.replace(partial, records_path)
+        return open_records(records_path)
+
+    def list_captures(self, **query):
+        """Stored captures with their summary statistics, newest first.
+
+        Answered from the catalog; query takes CaptureCatalog.query's
+        filter, sort and paging arguments.
+        """
+        self.sync_catalog()
+        return self.catalog.query(**query)
+
+    def sync_catalog(self):
+        """Drop deleted captures from the catalog and add uncatalogued ones.
+
+        Only a directory listing unless something changed: captures saved
+        before the catalog existed are read once here and then remembered.
+        """
+        on_disk = {}
+        with os.scandir(self.storage_dir) as entries:
+            for entry in entries:
+                if entry.is_dir() or (entry.is_file() and entry.name.endswith('.json')):
+                    on_disk[entry.name] = Path(entry.path)
+        known = self.catalog.names()
+        self.catalog.remove(known - on_disk.keys())
+        for name in on_disk.keys() - known:
+            path = on_disk[name]
+            if path.is_dir() and not segment_paths(path):
+                continue
+            summary = CaptureSummary()
+            try:
+                for packet in self.iter_capture(name):
+                    summary.add(packet)
+            except (OSError, ValueError, RuntimeError) as e:
+                print(f"Could not catalog capture {name}: {str(e)}")
+                continue
+            self.catalog.record(self._catalog_entry(path, summary, path.stat().st_mtime))
+
+    def _catalog_entry(self, path, summary, created):
+        entry = {
+            'name': path.name,
+            'created': created,
+            'packets': summary.packets,
+            'total_bytes': summary.bytes,
+            'first_time': summary.first_time,
+            'last_time': summary.last_time,
+            'protocols': summary.protocols
+        }
+        if path.is_dir():
+            segments = segment_paths(path)
+            compression = [codec for codec, suffix in COMPRESSED_SUFFIXES.items()
+                           if any(segment.name.endswith(suffix) for segment in segments)]
+            entry.update(
+                format='segments',
+                size_bytes=sum(f.stat().st_size for f in path.iterdir() if f.is_file()),
+                segments=len(segments),
+                compression=compression[0] if compression else None
+            )
+        else:
+            entry.update(format='json', size_bytes=path.stat().st_size, segments=0, compression=None)
+        return entry
+
+    @staticmethod
+    def _capture_name(filename):
+        # "capture_x.json" and "capture_x" name the same streamed capture
+        return filename[:-len('.json')] if filename.endswith('.json') else filename
 
     def _prepare_packet(self, packet_data):
         """Prepare packet data for JSON serialization"""